@@ -14,6 +14,7 @@ class AccountCategory(MyEnum):
 
 
 class Account:
+    __slots__ = ("account_id", "status", "open_date", "close_date", "category")
 
     def __init__(self,
                  account_id: str,
@@ -1,17 +1,59 @@
+import asyncio
+import os
 import time
+from concurrent.futures import Future
 
 from account import AccountStatus, Account
+from bulkoperations import BulkReport, apply_operations, read_operations
 from deposit import DepositType, Deposit
-from filedatabase import FileDatabase
+from depositquery import DepositQuery
+from durability import Durability
+from pagination import PAGE_SIZE, Page
+from parallelreports import ReportEngine
+from storage import open_database
+from transfers import apply_transfers
 from transaction import TransactionType, Transaction
 from client import Client
+from portfoliostats import ClientTotals
+from reportcache import MAX_CACHED_STATEMENT_ROWS, REPORT_TABLES, ReportCache
+from reportexport import WRITERS, write_report, format_client_line, format_deposit_line
 
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 
 class BankingSystem:
-    def __init__(self):
-        self.db = FileDatabase("data")
+    def __init__(self, backend: Optional[str] = None, data_dir: Optional[str] = None, background_writer: bool = False,
+                 durability: Optional[Durability] = None):
+        # background_writer — файлы пишутся в отдельном потоке, операции не ждут диска (см. wait_durable);
+        # durability — политика синхронизации с диском (по умолчанию из BANK_DURABILITY)
+        self.db = open_database(backend, data_dir, background_writer, durability)
+        # Готовые отчёты; сбрасываются при изменении таблиц, из которых построены
+        self.report_cache = ReportCache(self.db)
+        # Отчёты по всему портфелю, формируемые в пуле процессов
+        self.reports = ReportEngine(self)
+
+    # Сохранение
+    def flush(self):
+        self.db.flush()
+
+    def batch(self):
+        return self.db.batch()
+
+    def durable(self) -> Future:
+        return self.db.durable()
+
+    async def wait_durable(self):
+        """
+        Ждёт, пока все сохранённые изменения окажутся на диске, не блокируя цикл событий.
+        """
+        await asyncio.wrap_future(self.db.durable())
+
+    def checkpoint(self):
+        self.db.checkpoint()
+
+    def close(self):
+        self.reports.close()
+        self.db.close()
 
     # Клиенты
     def add_client(self, full_name: str) -> bool:
@@ -30,9 +72,24 @@ class BankingSystem:
     def get_all_clients(self) -> List[Client]:
         return self.db.clients
 
+    def count_clients(self) -> int:
+        return self.db.count_clients()
+
+    def get_clients_page(self, cursor: Optional[str] = None, page_size: int = PAGE_SIZE) -> Page[Client]:
+        return self.db.clients_page(page_size, cursor)
+
     def get_client(self, client_id: str) -> Optional[Client]:
         return self.db.get_client(client_id)
 
+    def get_clients_with_totals(self) -> Iterator[Tuple[Client, ClientTotals]]:
+        return self.db.clients_with_totals()
+
+    def search_clients(self, query: str, limit: Optional[int] = None, prefix: bool = False) -> List[Client]:
+        return self.db.search_clients(query, limit, prefix)
+
+    def get_client_totals(self, client_id: str) -> ClientTotals:
+        return self.db.client_totals(client_id)
+
     # Вклады
     def add_deposit(self, client_id: str, dep_type: DepositType, initial_balance: float, interest_rate: float) -> bool:
         return self.db.add_deposit(client_id, dep_type, initial_balance, interest_rate)
@@ -43,9 +100,21 @@ class BankingSystem:
     def withdraw_funds(self, deposit_id: str, amount: float) -> bool:
         return self.db.withdraw_funds(deposit_id, amount)
 
+    def transfer(self, from_deposit_id: str, to_deposit_id: str, amount: float) -> bool:
+        """
+        Переводит amount с одного вклада на другой: обе стороны и их транзакции сохраняются одним коммитом.
+        """
+        return self.apply_transfers([(from_deposit_id, to_deposit_id, amount)]).applied == 1
+
+    def apply_transfers(self, transfers: Iterable[Tuple[str, str, float]]) -> BulkReport:
+        return apply_transfers(self.db, transfers)
+
     def calculate_interest(self, deposit_id: str, to_date: float) -> bool:
         return self.db.calculate_and_add_interest(deposit_id, to_date)
 
+    def accrue_interest(self, to_date: float, dep_type: Optional[DepositType] = None) -> Dict[str, float]:
+        return self.db.accrue_interest(to_date, dep_type)
+
     def close_deposit(self, deposit_id: str) -> bool:
         return self.db.close_deposit(deposit_id)
 
@@ -58,6 +127,39 @@ class BankingSystem:
     def get_all_deposits(self) -> List[Deposit]:
         return self.db.deposits
 
+    def find_deposits(self, **criteria) -> List[Deposit]:
+        """
+        Вклады, удовлетворяющие условиям (см. DepositQuery), например
+        find_deposits(deposit_type=DepositType.SAVINGS, closed=False, order_by="balance", descending=True, limit=100).
+        """
+        return self.db.query_deposits(DepositQuery(**criteria))
+
+    def get_deposit_balance_as_of(self, deposit_id: str, date: float) -> Optional[float]:
+        # По всем счетам, которые были у вклада (см. add_account)
+        return self.db.deposit_balance_as_of(deposit_id, date)
+
+    # Пакетные операции
+    def apply_operations(self, operations: Iterable[dict]) -> BulkReport:
+        return apply_operations(self.db, operations)
+
+    def import_operations(self, file_path: str) -> BulkReport:
+        return apply_operations(self.db, read_operations(file_path))
+
+    def export_report(self, file_path: str, report: str, *args) -> int:
+        """
+        Потоково записывает отчёт в файл: .csv и .jsonl — построчные данные отчёта, иначе — текст отчёта.
+        report — client, all_clients, deposit_type, top_deposits, transaction, balance_as_of или system_summary;
+        args — параметры отчёта.
+        Возвращает число записанных строк.
+        """
+        if report not in REPORT_TABLES:
+            raise ValueError(f"Неизвестный отчет: {report}")
+        writer = WRITERS.get(os.path.splitext(file_path)[1].lower().lstrip("."))
+        with open(file_path, 'w', newline='', encoding='utf-8') as file:
+            if writer:
+                return writer(getattr(self, f"{report}_rows")(*args), file)
+            return write_report(getattr(self, f"iter_{report}_report")(*args), file)
+
     # Счета
     def get_account(self, account_id: str) -> Optional[Account]:
         return self.db.get_account(account_id)
@@ -69,119 +171,245 @@ class BankingSystem:
     def get_account_transactions(self, account_id: str) -> List[Transaction]:
         return self.db.get_account_transactions(account_id)
 
-    # Отчёты
+    def get_account_transactions_page(self,
+                                      account_id: str,
+                                      cursor: Optional[str] = None,
+                                      page_size: int = PAGE_SIZE,
+                                      from_date: Optional[float] = None,
+                                      to_date: Optional[float] = None) -> Page[Transaction]:
+        return self.db.account_transactions_page(account_id, page_size, cursor, from_date, to_date)
+
+    def get_transactions_page(self, cursor: Optional[str] = None, page_size: int = PAGE_SIZE) -> Page[Transaction]:
+        return self.db.transactions_page(page_size, cursor)
+
+    def query_account_transactions(self,
+                                   account_id: str,
+                                   from_date: Optional[float] = None,
+                                   to_date: Optional[float] = None,
+                                   reverse: bool = True,
+                                   limit: Optional[int] = None) -> List[Transaction]:
+        return self.db.query_account_transactions(account_id, from_date, to_date, reverse, limit)
+
+    # Отчёты. Каждый отчёт строится генератором iter_*_report построчно, поэтому большой отчёт
+    # можно сразу выводить или записывать в файл (см. reportexport.write_report), не держа его в памяти
     def generate_client_report(self, client_id: str) -> str:
+        return self.report_cache.get_or_render(("client", client_id), REPORT_TABLES["client"],
+                                               lambda: "".join(self.iter_client_report(client_id)))
+
+    def iter_client_report(self, client_id: str) -> Iterator[str]:
         client = self.db.get_client(client_id)
         if not client:
-            return f"Клиент с ID {client_id} не найден."
+            yield f"Клиент с ID {client_id} не найден."
+            return
         deposits = self.db.get_client_deposits(client_id)
-        report = []
-        report.append("ОТЧЕТ ПО КЛИЕНТУ\n================\n")
-        report.append(f"ID клиента: {client.client_id}\nФИО: {client.full_name}\nКоличество вкладов: {len(deposits)}\n")
+        yield "ОТЧЕТ ПО КЛИЕНТУ\n================\n"
+        yield f"ID клиента: {client.client_id}\nФИО: {client.full_name}\nКоличество вкладов: {len(deposits)}\n"
         if not deposits:
-            report.append("У клиента нет открытых вкладов.\n")
+            yield "У клиента нет открытых вкладов.\n"
         else:
-            report.append("Список вкладов:\n")
-            report.append("ID    | Тип               | Дата открытия | Баланс       | Ставка % | Статус\n")
+            yield "Список вкладов:\n"
+            yield "ID    | Тип               | Дата открытия | Баланс       | Ставка % | Статус\n"
             total_balance = 0.0
             for d in deposits:
                 status = "Закрыт" if d.closed else "Активен"
-                report.append(f"{d.deposit_id:5} | {str(d.deposit_type):17} | {time.strftime('%d.%m.%Y', time.localtime(d.open_date)):13} | {d.balance:12.2f} | {d.interest_rate:8.2f} | {status}\n")
+                yield f"{d.deposit_id:5} | {str(d.deposit_type):17} | {time.strftime('%d.%m.%Y', time.localtime(d.open_date)):13} | {d.balance:12.2f} | {d.interest_rate:8.2f} | {status}\n"
                 if not d.closed:
                     total_balance += d.balance
-            report.append(f"Итого по активным вкладам: {total_balance:.2f}\n")
-        return "".join(report)
+            yield f"Итого по активным вкладам: {total_balance:.2f}\n"
+
+    def client_rows(self, client_id: str) -> Iterator[dict]:
+        for d in self.db.get_client_deposits(client_id):
+            yield {"deposit_id": d.deposit_id, "deposit_type": str(d.deposit_type), "open_date": d.open_date,
+                   "balance": d.balance, "interest_rate": d.interest_rate, "closed": d.closed}
 
     def generate_all_clients_report(self) -> str:
-        clients = self.db.clients
-        deposits = self.db.deposits
-        report = []
-        report.append("ОТЧЕТ ПО ВСЕМ КЛИЕНТАМ\n=====================\n")
-        report.append(f"Всего клиентов: {len(clients)}\n")
-        if not clients:
-            report.append("В системе нет зарегистрированных клиентов.\n")
+        return self.report_cache.get_or_render(("all_clients",), REPORT_TABLES["all_clients"],
+                                               lambda: "".join(self.iter_all_clients_report()))
+
+    def iter_all_clients_report(self, body: Optional[Iterable[str]] = None) -> Iterator[str]:
+        """
+        body — уже сформированные строки таблицы (см. ReportEngine); по умолчанию строки формируются здесь же.
+        """
+        stats = self.db.portfolio_stats()
+        yield "ОТЧЕТ ПО ВСЕМ КЛИЕНТАМ\n=====================\n"
+        yield f"Всего клиентов: {stats.clients}\n"
+        if not stats.clients:
+            yield "В системе нет зарегистрированных клиентов.\n"
         else:
-            report.append("ID    | ФИО                            | Кол-во вкладов | Общий баланс\n")
-            for client in clients:
-                client_deps = [d for d in deposits if d.client_id == client.client_id and not d.closed]
-                total_balance = sum(d.balance for d in client_deps)
-                report.append(f"{client.client_id:5} | {client.full_name:30} | {len(client_deps):14} | {total_balance:12.2f}\n")
-        return "".join(report)
+            yield "ID    | ФИО                            | Кол-во вкладов | Общий баланс\n"
+            if body is not None:
+                yield from body
+            else:
+                for fields in self.all_clients_fields():
+                    yield format_client_line(*fields)
+
+    def all_clients_fields(self) -> Iterator[tuple]:
+        for client, totals in self.db.clients_with_totals():
+            yield client.client_id, client.full_name, totals.active, totals.balance
+
+    def all_clients_rows(self) -> Iterator[dict]:
+        for client, totals in self.db.clients_with_totals():
+            yield {"client_id": client.client_id, "full_name": client.full_name,
+                   "active_deposits": totals.active, "active_balance": totals.balance}
 
     def generate_deposit_type_report(self, dep_type: DepositType) -> str:
-        deposits = [d for d in self.db.deposits if d.deposit_type == dep_type and not d.closed]
-        clients = {c.client_id: c.full_name for c in self.db.clients}
-        report = []
-        report.append(f"ОТЧЕТ ПО ТИПУ ВКЛАДА: {dep_type}\n==============================\n")
-        report.append(f"Всего вкладов данного типа: {len(deposits)}\n")
-        if not deposits:
-            report.append("Нет активных вкладов данного типа.\n")
+        return self.report_cache.get_or_render(("deposit_type", dep_type), REPORT_TABLES["deposit_type"],
+                                               lambda: "".join(self.iter_deposit_type_report(dep_type)))
+
+    def iter_deposit_type_report(self, dep_type: DepositType, body: Optional[Iterable[str]] = None) -> Iterator[str]:
+        stats = self.db.portfolio_stats()
+        yield f"ОТЧЕТ ПО ТИПУ ВКЛАДА: {dep_type}\n==============================\n"
+        yield f"Всего вкладов данного типа: {stats.count[dep_type]}\n"
+        if not stats.count[dep_type]:
+            yield "Нет активных вкладов данного типа.\n"
         else:
-            report.append("ID    | ФИО клиента                    | Дата открытия | Баланс       | Ставка %\n")
-            total_balance = 0.0
-            avg_interest = 0.0
-            for d in deposits:
-                client_name = clients.get(d.client_id, "Неизвестно")
-                report.append(f"{d.deposit_id:5} | {client_name:30} | {time.strftime('%d.%m.%Y', time.localtime(d.open_date)):13} | {d.balance:12.2f} | {d.interest_rate:8.2f}\n")
-                total_balance += d.balance
-                avg_interest += d.interest_rate
-            avg_interest /= len(deposits)
-            report.append(f"Итого по всем вкладам: {total_balance:.2f}\n")
-            report.append(f"Средняя процентная ставка: {avg_interest:.2f}%\n")
-        return "".join(report)
+            yield "ID    | ФИО клиента                    | Дата открытия | Баланс       | Ставка %\n"
+            if body is not None:
+                yield from body
+            else:
+                for fields in self.deposit_type_fields(dep_type):
+                    yield format_deposit_line(*fields)
+            yield f"Итого по всем вкладам: {stats.balance[dep_type]:.2f}\n"
+            yield f"Средняя процентная ставка: {stats.average_rate(dep_type):.2f}%\n"
+
+    def deposit_type_fields(self, dep_type: DepositType) -> Iterator[tuple]:
+        for d in self.db.iter_open_deposits(dep_type):
+            client = self.db.get_client(d.client_id)
+            client_name = client.full_name if client else "Неизвестно"
+            yield d.deposit_id, client_name, d.open_date, d.balance, d.interest_rate
+
+    def generate_top_deposits_report(self, dep_type: DepositType, limit: int) -> str:
+        return self.report_cache.get_or_render(("top_deposits", dep_type, limit), REPORT_TABLES["top_deposits"],
+                                               lambda: "".join(self.iter_top_deposits_report(dep_type, limit)))
+
+    def iter_top_deposits_report(self, dep_type: DepositType, limit: int) -> Iterator[str]:
+        deposits = self.find_deposits(deposit_type=dep_type, closed=False, order_by="balance", descending=True,
+                                      limit=limit)
+        yield f"КРУПНЕЙШИЕ ВКЛАДЫ ТИПА: {dep_type}\n==============================\n"
+        if not deposits:
+            yield "Нет активных вкладов данного типа.\n"
+            return
+        yield "ID    | ФИО клиента                    | Дата открытия | Баланс       | Ставка %\n"
+        for d in deposits:
+            client = self.db.get_client(d.client_id)
+            yield format_deposit_line(d.deposit_id, client.full_name if client else "Неизвестно", d.open_date,
+                                      d.balance, d.interest_rate)
+        yield f"Итого по этим вкладам: {sum(d.balance for d in deposits):.2f}\n"
+
+    def top_deposits_rows(self, dep_type: DepositType, limit: int) -> Iterator[dict]:
+        for d in self.find_deposits(deposit_type=dep_type, closed=False, order_by="balance", descending=True,
+                                    limit=limit):
+            client = self.db.get_client(d.client_id)
+            yield {"deposit_id": d.deposit_id, "client_id": d.client_id,
+                   "full_name": client.full_name if client else "Неизвестно", "open_date": d.open_date,
+                   "balance": d.balance, "interest_rate": d.interest_rate}
+
+    def deposit_type_rows(self, dep_type: DepositType) -> Iterator[dict]:
+        for d in self.db.iter_open_deposits(dep_type):
+            yield {"deposit_id": d.deposit_id, "client_id": d.client_id, "deposit_type": str(d.deposit_type),
+                   "open_date": d.open_date, "balance": d.balance, "interest_rate": d.interest_rate}
 
     def generate_transaction_report(self, account_id: str, from_date: float, to_date: float) -> str:
+        if self._large_statement(account_id, from_date, to_date):
+            return "".join(self.iter_transaction_report(account_id, from_date, to_date))
+        return self.report_cache.get_or_render(("transaction", account_id, from_date, to_date),
+                                               REPORT_TABLES["transaction"],
+                                               lambda: "".join(self.iter_transaction_report(account_id, from_date, to_date)))
+
+    def transaction_report_lines(self, account_id: str, from_date: float, to_date: float) -> Iterable[str]:
+        """
+        Выписка для вывода по мере формирования (см. reportexport.write_report): большая формируется построчно
+        мимо кэша отчётов, небольшая берётся из кэша.
+        """
+        if self._large_statement(account_id, from_date, to_date):
+            return self.iter_transaction_report(account_id, from_date, to_date)
+        return (self.generate_transaction_report(account_id, from_date, to_date),)
+
+    def _large_statement(self, account_id: str, from_date: float, to_date: float) -> bool:
+        return self.db.count_account_transactions(account_id, from_date, to_date) > MAX_CACHED_STATEMENT_ROWS
+
+    def iter_transaction_report(self, account_id: str, from_date: float, to_date: float) -> Iterator[str]:
         account = self.db.get_account(account_id)
         if not account:
-            return f"Счет с ID {account_id} не найден."
-        txs = [t for t in self.db.get_account_transactions(account_id) if from_date <= t.date <= to_date]
-        report = []
-        report.append("ОТЧЕТ ПО ОПЕРАЦИЯМ СО СЧЕТОМ\n===========================\n")
-        report.append(f"ID счета: {account_id}\nСтатус счета: {'Открыт' if account.status == AccountStatus.OPEN else 'Закрыт'}\n")
-        report.append(f"Дата открытия: {time.strftime('%d.%m.%Y', time.localtime(account.open_date))}\n")
+            yield f"Счет с ID {account_id} не найден."
+            return
+        count = self.db.count_account_transactions(account_id, from_date, to_date)
+        yield "ОТЧЕТ ПО ОПЕРАЦИЯМ СО СЧЕТОМ\n===========================\n"
+        yield f"ID счета: {account_id}\nСтатус счета: {'Открыт' if account.status == AccountStatus.OPEN else 'Закрыт'}\n"
+        yield f"Дата открытия: {time.strftime('%d.%m.%Y', time.localtime(account.open_date))}\n"
         if account.status == AccountStatus.CLOSED:
-            report.append(f"Дата закрытия: {time.strftime('%d.%m.%Y', time.localtime(account.close_date))}\n")
-        report.append(f"Категория счета: {account.category}\n")
-        report.append(f"Период отчета: с {time.strftime('%d.%m.%Y', time.localtime(from_date))} по {time.strftime('%d.%m.%Y', time.localtime(to_date))}\n")
-        report.append(f"Количество операций за период: {len(txs)}\n")
-        if not txs:
-            report.append("За указанный период операций не производилось.\n")
+            yield f"Дата закрытия: {time.strftime('%d.%m.%Y', time.localtime(account.close_date))}\n"
+        yield f"Категория счета: {account.category}\n"
+        yield f"Период отчета: с {time.strftime('%d.%m.%Y', time.localtime(from_date))} по {time.strftime('%d.%m.%Y', time.localtime(to_date))}\n"
+        yield f"Количество операций за период: {count}\n"
+        if not count:
+            yield "За указанный период операций не производилось.\n"
         else:
-            report.append("ID Транзакции  | Дата       | Операция     | Сумма\n")
+            yield "ID Транзакции  | Дата       | Операция     | Сумма\n"
             total_deposit = total_withdraw = total_interest = 0.0
-            for t in txs:
-                report.append(f"{t.transaction_id:14} | {time.strftime('%d.%m.%Y', time.localtime(t.date))} | {t.transaction_type:12} | {t.amount:10.2f}\n")
+            for t in self.db.iter_account_transactions(account_id, from_date, to_date):
+                yield f"{t.transaction_id:14} | {time.strftime('%d.%m.%Y', time.localtime(t.date))} | {t.transaction_type:12} | {t.amount:10.2f}\n"
                 if t.transaction_type == TransactionType.DEPOSIT:
                     total_deposit += t.amount
                 elif t.transaction_type == TransactionType.WITHDRAW:
                     total_withdraw += t.amount
                 elif t.transaction_type == TransactionType.INTEREST:
                     total_interest += t.amount
-            report.append(f"Итого пополнений: {total_deposit:.2f}\n")
-            report.append(f"Итого снятий: {total_withdraw:.2f}\n")
-            report.append(f"Итого начислено процентов: {total_interest:.2f}\n")
-            report.append(f"Общий оборот: {(total_deposit - total_withdraw + total_interest):.2f}\n")
-        return "".join(report)
+            yield f"Итого пополнений: {total_deposit:.2f}\n"
+            yield f"Итого снятий: {total_withdraw:.2f}\n"
+            yield f"Итого начислено процентов: {total_interest:.2f}\n"
+            yield f"Общий оборот: {(total_deposit - total_withdraw + total_interest):.2f}\n"
+
+    def transaction_rows(self,
+                         account_id: str,
+                         from_date: Optional[float] = None,
+                         to_date: Optional[float] = None) -> Iterator[dict]:
+        for t in self.db.iter_account_transactions(account_id, from_date, to_date):
+            yield {"transaction_id": t.transaction_id, "date": t.date, "transaction_type": str(t.transaction_type),
+                   "amount": t.amount, "account_id": t.account_id}
 
     def generate_system_summary_report(self) -> str:
-        clients = self.db.clients
-        deposits = self.db.deposits
-        accounts = self.db.accounts
-        demand = [d for d in deposits if d.deposit_type == DepositType.DEMAND and not d.closed]
-        term = [d for d in deposits if d.deposit_type == DepositType.TERM and not d.closed]
-        savings = [d for d in deposits if d.deposit_type == DepositType.SAVINGS and not d.closed]
-        total_balance = sum(d.balance for d in deposits if not d.closed)
-        report = ["СВОДНЫЙ ОТЧЕТ ПО БАНКОВСКОЙ СИСТЕМЕ\n==================================\n",
-                  f"Всего клиентов: {len(clients)}\n",
-                  f"Всего вкладов: {len(deposits)} (активных: {len(demand) + len(term) + len(savings)})\n",
-                  f"Всего счетов: {len(accounts)}\n", "Распределение вкладов по типам:\n",
-                  f"До востребования: {len(demand)} на сумму {sum(d.balance for d in demand):.2f}\n",
-                  f"Срочные: {len(term)} на сумму {sum(d.balance for d in term):.2f}\n",
-                  f"Накопительные: {len(savings)} на сумму {sum(d.balance for d in savings):.2f}\n",
-                  f"Итого по всем вкладам: {total_balance:.2f}\n"]
+        return self.report_cache.get_or_render(("system_summary",), REPORT_TABLES["system_summary"],
+                                               lambda: "".join(self.iter_system_summary_report()))
+
+    def generate_balance_as_of_report(self, date: float) -> str:
+        return self.report_cache.get_or_render(("balance_as_of", date), REPORT_TABLES["balance_as_of"],
+                                               lambda: "".join(self.iter_balance_as_of_report(date)))
+
+    def iter_balance_as_of_report(self, date: float) -> Iterator[str]:
+        balance = self.db.book_balance_as_of(date)
+        yield f"ОСТАТКИ ПО ВКЛАДАМ НА {time.strftime('%d.%m.%Y', time.localtime(date))}\n==============================\n"
+        yield f"До востребования: {balance[DepositType.DEMAND]:.2f}\n"
+        yield f"Срочные: {balance[DepositType.TERM]:.2f}\n"
+        yield f"Накопительные: {balance[DepositType.SAVINGS]:.2f}\n"
+        yield f"Итого по всем вкладам: {sum(balance.values()):.2f}\n"
+
+    def balance_as_of_rows(self, date: float) -> Iterator[dict]:
+        for dep_type, balance in self.db.book_balance_as_of(date).items():
+            yield {"date": date, "deposit_type": str(dep_type), "balance": balance}
+
+    def iter_system_summary_report(self) -> Iterator[str]:
+        stats = self.db.portfolio_stats()
+        count = stats.count
+        balance = stats.balance
+        total_balance = stats.total_balance
+        yield "СВОДНЫЙ ОТЧЕТ ПО БАНКОВСКОЙ СИСТЕМЕ\n==================================\n"
+        yield f"Всего клиентов: {stats.clients}\n"
+        yield f"Всего вкладов: {stats.deposits} (активных: {stats.open_count})\n"
+        yield f"Всего счетов: {stats.accounts}\n"
+        yield "Распределение вкладов по типам:\n"
+        yield f"До востребования: {count[DepositType.DEMAND]} на сумму {balance[DepositType.DEMAND]:.2f}\n"
+        yield f"Срочные: {count[DepositType.TERM]} на сумму {balance[DepositType.TERM]:.2f}\n"
+        yield f"Накопительные: {count[DepositType.SAVINGS]} на сумму {balance[DepositType.SAVINGS]:.2f}\n"
+        yield f"Итого по всем вкладам: {total_balance:.2f}\n"
         if total_balance > 0:
-            report.append("Структура портфеля вкладов:\n")
-            report.append(f"До востребования: {sum(d.balance for d in demand)/total_balance*100:.2f}%\n")
-            report.append(f"Срочные: {sum(d.balance for d in term)/total_balance*100:.2f}%\n")
-            report.append(f"Накопительные: {sum(d.balance for d in savings)/total_balance*100:.2f}%\n")
-        return "".join(report)
+            yield "Структура портфеля вкладов:\n"
+            yield f"До востребования: {balance[DepositType.DEMAND]/total_balance*100:.2f}%\n"
+            yield f"Срочные: {balance[DepositType.TERM]/total_balance*100:.2f}%\n"
+            yield f"Накопительные: {balance[DepositType.SAVINGS]/total_balance*100:.2f}%\n"
+
+    def system_summary_rows(self) -> Iterator[dict]:
+        stats = self.db.portfolio_stats()
+        for dep_type in DepositType:
+            yield {"deposit_type": str(dep_type), "active_deposits": stats.count[dep_type],
+                   "balance": stats.balance[dep_type], "average_rate": stats.average_rate(dep_type)}
@@ -0,0 +1,201 @@
+import csv
+import json
+import math
+import os
+from typing import Iterable, Iterator
+
+from deposit import Deposit
+from transaction import TransactionType
+from utils import parse_date
+
+
+# Сколько отклонённых строк показывать в текстовой сводке
+MAX_SHOWN_ERRORS = 20
+# Название операции в нижнем регистре -> (тип транзакции, название для отчёта)
+_OPERATIONS = {str(item).lower(): (item, str(item)) for item in TransactionType}
+
+class OperationResult:
+    __slots__ = ("line", "operation", "deposit_id", "amount", "ok", "error")
+
+    def __init__(self,
+                 line: int,
+                 operation: str,
+                 deposit_id: str,
+                 amount: float,
+                 ok: bool,
+                 error: str = ""):
+        self.line = line
+        self.operation = operation
+        self.deposit_id = deposit_id
+        self.amount = amount
+        self.ok = ok
+        self.error = error
+
+
+class BulkReport:
+    """
+    Результат пакетной обработки: построчные результаты и сводка по ним.
+    """
+
+    def __init__(self, results: list[OperationResult]):
+        self.results = results
+        self.applied = sum(1 for r in results if r.ok)
+        self.failed = len(results) - self.applied
+        # Тип операции -> (количество, сумма) по успешно проведённым операциям
+        self.totals: dict[str, tuple[int, float]] = {}
+        for r in results:
+            if r.ok:
+                count, amount = self.totals.get(r.operation, (0, 0.0))
+                self.totals[r.operation] = (count + 1, amount + r.amount)
+
+    def errors(self) -> list[OperationResult]:
+        return [r for r in self.results if not r.ok]
+
+    def __str__(self) -> str:
+        report = [f"Всего операций: {len(self.results)}\n",
+                  f"Проведено: {self.applied}\n",
+                  f"Отклонено: {self.failed}\n"]
+        for operation, (count, amount) in self.totals.items():
+            report.append(f"{operation}: {count} на сумму {amount:.2f}\n")
+        errors = self.errors()
+        for r in errors[:MAX_SHOWN_ERRORS]:
+            report.append(f"Строка {r.line}: {r.operation} {r.deposit_id} — {r.error}\n")
+        if len(errors) > MAX_SHOWN_ERRORS:
+            report.append(f"... и ещё {len(errors) - MAX_SHOWN_ERRORS} отклонённых операций\n")
+        return "".join(report)
+
+
+class MalformedOperation:
+    """
+    Строка файла операций, которую не удалось разобрать; в отчёте она становится отклонённой операцией.
+    """
+    __slots__ = ("error",)
+
+    def __init__(self, error: str):
+        self.error = error
+
+
+def read_operations(file_path: str) -> Iterator[dict | MalformedOperation]:
+    """
+    Читает файл операций: CSV с заголовком operation,deposit_id,amount,date или JSONL
+    с теми же полями. Дата нужна только для начисления процентов (дд.мм.гггг или timestamp).
+    Строки JSONL с ошибкой разбора возвращаются как MalformedOperation и не прерывают чтение.
+    """
+    if os.path.splitext(file_path)[1].lower() in (".jsonl", ".json"):
+        with open(file_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError as e:
+                        yield MalformedOperation(f"Некорректная строка JSON: {e}")
+    else:
+        with open(file_path, 'r', newline='', encoding='utf-8') as file:
+            yield from csv.DictReader(file)
+
+
+def apply_operations(db, operations: Iterable[dict]) -> BulkReport:
+    """
+    Проверяет и проводит операции в памяти по индексам хранилища и сохраняет их одним коммитом.
+    Пополнения и снятия проверяются по балансам с учётом предыдущих строк и записываются пачкой
+    (db.post_operations); перед закрытием вклада и начислением процентов накопленная пачка записывается,
+    чтобы эти операции видели актуальный баланс. Ошибочные строки не прерывают обработку, а попадают в отчёт.
+    """
+    results = []
+    postings = _Postings(db)
+    with db.batch():
+        for line, op in enumerate(operations, start=1):
+            results.append(_apply(db, postings, line, op))
+        postings.post()
+    return BulkReport(results)
+
+
+class _Postings:
+    """
+    Проверенные, но ещё не записанные пополнения и снятия, и балансы вкладов с их учётом.
+    """
+    __slots__ = ("db", "deposits", "balances", "postings")
+
+    def __init__(self, db):
+        self.db = db
+        # Открытые вклады пачки (None — вклад не найден или закрыт)
+        self.deposits: dict[str, Deposit | None] = {}
+        self.balances: dict[str, float] = {}
+        self.postings: list[tuple[Deposit, TransactionType, float]] = []
+
+    def deposit(self, deposit_id: str) -> Deposit | None:
+        try:
+            return self.deposits[deposit_id]
+        except KeyError:
+            deposit = self.db.get_deposit(deposit_id)
+            deposit = self.deposits[deposit_id] = deposit if deposit and not deposit.closed else None
+            return deposit
+
+    def post(self):
+        if self.postings:
+            self.db.post_operations(self.postings, self.balances)
+        self.deposits, self.balances, self.postings = {}, {}, []
+
+
+def _apply(db, postings: _Postings, line: int, op: dict | MalformedOperation) -> OperationResult:
+    if isinstance(op, MalformedOperation):
+        return OperationResult(line, "", "", 0.0, False, op.error)
+    if not isinstance(op, dict):
+        return OperationResult(line, "", "", 0.0, False, "Операция должна быть объектом")
+    name = str(op.get("operation", "")).strip()
+    deposit_id = str(op.get("deposit_id", "")).strip()
+    known = _OPERATIONS.get(name.lower())
+    if known is None:
+        return OperationResult(line, name, deposit_id, 0.0, False, "Неизвестная операция")
+    tx_type, operation = known
+
+    if tx_type == TransactionType.CLOSE or tx_type == TransactionType.INTEREST:
+        postings.post()
+        deposit = db.get_deposit(deposit_id)
+        if not deposit or deposit.closed:
+            return OperationResult(line, operation, deposit_id, 0.0, False, "Вклад не найден или закрыт")
+        if tx_type == TransactionType.CLOSE:
+            amount = deposit.balance
+            ok = db.close_deposit(deposit_id)
+        else:
+            try:
+                to_date = _parse_date(op.get("date"))
+            except ValueError as e:
+                return OperationResult(line, operation, deposit_id, 0.0, False, str(e))
+            amount = deposit.calculate_interest(to_date)
+            ok = db.calculate_and_add_interest(deposit_id, to_date)
+        return OperationResult(line, operation, deposit_id, amount, ok, "" if ok else "Операция отклонена")
+
+    deposit = postings.deposit(deposit_id)
+    if deposit is None:
+        return OperationResult(line, operation, deposit_id, 0.0, False, "Вклад не найден или закрыт")
+    try:
+        amount = float(op.get("amount"))
+        # nan и inf проходят сравнения с балансом неверно, поэтому отсекаются до проверок
+        if not math.isfinite(amount):
+            raise ValueError(amount)
+    except (TypeError, ValueError):
+        return OperationResult(line, operation, deposit_id, 0.0, False, "Некорректная сумма")
+    if amount <= 0:
+        return OperationResult(line, operation, deposit_id, amount, False, "Некорректная сумма")
+    balance = postings.balances.get(deposit_id, deposit.balance)
+    if tx_type == TransactionType.WITHDRAW:
+        if amount > balance:
+            return OperationResult(line, operation, deposit_id, amount, False, "Недостаточно средств")
+        postings.balances[deposit_id] = balance - amount
+    else:
+        postings.balances[deposit_id] = balance + amount
+    postings.postings.append((deposit, tx_type, amount))
+    return OperationResult(line, operation, deposit_id, amount, True)
+
+
+def _parse_date(value) -> float:
+    if value is None or value == "":
+        raise ValueError("Не указана дата начисления процентов")
+    try:
+        date = float(value)
+    except (TypeError, ValueError):
+        return parse_date(value)
+    if not math.isfinite(date):
+        raise ValueError("Некорректная дата начисления процентов")
+    return date
@@ -1,4 +1,6 @@
 class Client:
+    __slots__ = ("client_id", "full_name")
+
     def __init__(self,
                  client_id: str,
                  full_name: str):
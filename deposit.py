@@ -7,6 +7,8 @@ class DepositType(MyEnum):
     SAVINGS = 2
 
 class Deposit:
+    __slots__ = ("deposit_id", "deposit_type", "open_date", "balance", "interest_rate", "closed", "client_id",
+                 "account_id")
 
     def __init__(self,
                  deposit_id: str,
@@ -0,0 +1,351 @@
+import heapq
+import math
+from bisect import bisect_left, bisect_right, insort
+from itertools import chain
+from typing import Iterable, Iterator
+
+from deposit import Deposit, DepositType
+
+
+# Поля, по которым можно сортировать результат запроса, и поля с упорядоченными индексами
+ORDER_FIELDS = ("balance", "interest_rate", "open_date")
+INDEXED_FIELDS = ("balance", "open_date")
+# Упорядоченный индекс предпочитается выборке по диапазону другого поля, пока та не меньше его в RANGE_ADVANTAGE раз
+RANGE_ADVANTAGE = 4
+# Размер блока упорядоченного списка: блок делится пополам, когда становится вдвое больше
+SORTED_LOAD = 512
+
+
+class DepositQuery:
+    """
+    Запрос к вкладам: все заданные условия (не None) должны выполняться одновременно, границы диапазонов
+    включаются. order_by — поле сортировки из ORDER_FIELDS (None — порядок добавления вкладов),
+    limit — сколько вкладов вернуть.
+    """
+    __slots__ = ("deposit_type", "closed", "client_id", "min_balance", "max_balance", "min_rate", "max_rate",
+                 "from_date", "to_date", "order_by", "descending", "limit")
+
+    def __init__(self,
+                 deposit_type: DepositType | None = None,
+                 closed: bool | None = None,
+                 client_id: str | None = None,
+                 min_balance: float | None = None,
+                 max_balance: float | None = None,
+                 min_rate: float | None = None,
+                 max_rate: float | None = None,
+                 from_date: float | None = None,
+                 to_date: float | None = None,
+                 order_by: str | None = None,
+                 descending: bool = False,
+                 limit: int | None = None):
+        if order_by is not None and order_by not in ORDER_FIELDS:
+            raise ValueError(f"Некорректное поле сортировки: {order_by}")
+        if limit is not None and limit < 0:
+            raise ValueError("Некорректное число вкладов в запросе")
+        self.deposit_type = deposit_type
+        self.closed = closed
+        self.client_id = client_id
+        self.min_balance = min_balance
+        self.max_balance = max_balance
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.from_date = from_date
+        self.to_date = to_date
+        self.order_by = order_by
+        self.descending = descending
+        self.limit = limit
+
+    def range(self, field: str) -> tuple[float | None, float | None]:
+        if field == "balance":
+            return self.min_balance, self.max_balance
+        if field == "interest_rate":
+            return self.min_rate, self.max_rate
+        return self.from_date, self.to_date
+
+    def matches(self, d: Deposit) -> bool:
+        return ((self.deposit_type is None or d.deposit_type == self.deposit_type)
+                and (self.closed is None or bool(d.closed) == self.closed)
+                and (self.client_id is None or d.client_id == self.client_id)
+                and (self.min_balance is None or d.balance >= self.min_balance)
+                and (self.max_balance is None or d.balance <= self.max_balance)
+                and (self.min_rate is None or d.interest_rate >= self.min_rate)
+                and (self.max_rate is None or d.interest_rate <= self.max_rate)
+                and (self.from_date is None or d.open_date >= self.from_date)
+                and (self.to_date is None or d.open_date <= self.to_date))
+
+    def apply(self, deposits: Iterable[Deposit]) -> list[Deposit]:
+        """
+        Выполняет запрос перебором deposits (в порядке добавления) — для небольших списков, например вкладов клиента.
+        """
+        found = [d for d in deposits if self.matches(d)]
+        if self.descending:
+            # Сортировка устойчива: при равных значениях вклады идут в обратном порядке добавления, как в индексе
+            found.reverse()
+        if self.order_by is not None:
+            found.sort(key=lambda d: getattr(d, self.order_by), reverse=self.descending)
+        return found if self.limit is None else found[:self.limit]
+
+
+class SortedList:
+    """
+    Упорядоченный список в виде списка блоков: вставка и удаление — двоичный поиск блока и сдвиг внутри
+    блока (не всего списка), выборка диапазона — с любого конца.
+    """
+
+    def __init__(self, values: Iterable = ()):
+        values = sorted(values)
+        self._lists: list[list] = [values[i:i + SORTED_LOAD] for i in range(0, len(values), SORTED_LOAD)]
+        self._maxes: list = [block[-1] for block in self._lists]
+        self._len = len(values)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def add(self, value):
+        lists, maxes = self._lists, self._maxes
+        if not maxes:
+            lists.append([value])
+            maxes.append(value)
+        else:
+            pos = bisect_left(maxes, value)
+            if pos == len(maxes):
+                pos -= 1
+                lists[pos].append(value)
+                maxes[pos] = value
+            else:
+                insort(lists[pos], value)
+            block = lists[pos]
+            if len(block) > 2 * SORTED_LOAD:
+                lists.insert(pos + 1, block[SORTED_LOAD:])
+                del block[SORTED_LOAD:]
+                maxes[pos] = block[-1]
+                maxes.insert(pos + 1, lists[pos + 1][-1])
+        self._len += 1
+
+    def remove(self, value):
+        pos = bisect_left(self._maxes, value)
+        block = self._lists[pos] if pos < len(self._lists) else []
+        i = bisect_left(block, value)
+        if i == len(block) or block[i] != value:
+            raise ValueError(f"{value} нет в списке")
+        del block[i]
+        if block:
+            self._maxes[pos] = block[-1]
+        else:
+            del self._lists[pos]
+            del self._maxes[pos]
+        self._len -= 1
+
+    def _rank(self, value, right: bool) -> int:
+        # Число элементов меньше value (right=True — не больше value)
+        pos = (bisect_right if right else bisect_left)(self._maxes, value)
+        if pos == len(self._maxes):
+            return self._len
+        before = sum(len(block) for block in self._lists[:pos])
+        return before + (bisect_right if right else bisect_left)(self._lists[pos], value)
+
+    def count(self, lo=None, hi=None) -> int:
+        """
+        Число элементов в диапазоне lo <= x <= hi (None — без границы).
+        """
+        start = 0 if lo is None else self._rank(lo, False)
+        stop = self._len if hi is None else self._rank(hi, True)
+        return max(0, stop - start)
+
+    def irange(self, lo=None, hi=None, reverse: bool = False) -> Iterator:
+        """
+        Элементы в диапазоне lo <= x <= hi по возрастанию (reverse=True — по убыванию).
+        """
+        lists, maxes = self._lists, self._maxes
+        if not maxes:
+            return
+        if not reverse:
+            pos = 0 if lo is None else bisect_left(maxes, lo)
+            i = 0 if lo is None or pos == len(maxes) else bisect_left(lists[pos], lo)
+            for block in lists[pos:]:
+                for value in block[i:] if i else block:
+                    if hi is not None and value > hi:
+                        return
+                    yield value
+                i = 0
+        else:
+            pos = len(maxes) if hi is None else bisect_right(maxes, hi)
+            if pos == len(maxes):
+                pos -= 1
+                j = len(lists[pos])
+            else:
+                j = bisect_right(lists[pos], hi)
+            for k in range(pos, -1, -1):
+                block = lists[k]
+                for value in reversed(block[:j] if k == pos else block):
+                    if lo is not None and value < lo:
+                        return
+                    yield value
+
+
+def _bounds(lo: float | None, hi: float | None) -> tuple:
+    # Записи индекса — пары (значение, порядковый номер вклада); (x,) меньше любой пары с x, (x, inf) — больше
+    return None if lo is None else (lo,), None if hi is None else (hi, math.inf)
+
+
+class DepositIndex:
+    """
+    Индексы вкладов для DepositQuery. Вклады разложены по корзинам (тип, закрыт); в каждой корзине —
+    упорядоченные индексы по балансу и по дате открытия. Планировщик выбирает корзины по типу и статусу,
+    а внутри них — упорядоченный индекс, если по нему сортируется результат или он сужает выборку по диапазону,
+    иначе перебирает выбранные корзины. Вклады нумеруются в порядке добавления; номер — второй ключ сортировки.
+
+    Изменение баланса (touch) только отмечает вклад: индексы переносят его перед ближайшим запросом,
+    один раз, сколько бы операций ни прошло по вкладу до этого.
+    """
+
+    def __init__(self, deposits: Iterable[Deposit] = ()):
+        self._next_ordinal = 0
+        self._ordinals: dict[str, int] = {}
+        # Порядковый номер -> (корзина, баланс, дата открытия), с которыми вклад внесён в индексы
+        self._keys: dict[int, tuple] = {}
+        self._buckets: dict[tuple[DepositType, bool], dict[int, Deposit]] = {
+            (dep_type, closed): {} for dep_type in DepositType for closed in (False, True)}
+        # Вклады, баланс которых изменился после внесения в индексы
+        self._stale: dict[str, Deposit] = {}
+        for deposit in deposits:
+            ordinal = self._register(deposit)
+            bucket = (deposit.deposit_type, bool(deposit.closed))
+            self._keys[ordinal] = (bucket, deposit.balance, deposit.open_date)
+            self._buckets[bucket][ordinal] = deposit
+        # Начальные индексы строятся сортировкой, а не вставкой по одному вкладу
+        self._sorted: dict[str, dict[tuple[DepositType, bool], SortedList]] = {
+            "balance": {bucket: SortedList((d.balance, ordinal) for ordinal, d in deposits.items())
+                        for bucket, deposits in self._buckets.items()},
+            "open_date": {bucket: SortedList((d.open_date, ordinal) for ordinal, d in deposits.items())
+                          for bucket, deposits in self._buckets.items()},
+        }
+
+    def __len__(self) -> int:
+        return len(self._ordinals)
+
+    def _register(self, deposit: Deposit) -> int:
+        ordinal = self._next_ordinal
+        self._next_ordinal += 1
+        self._ordinals[deposit.deposit_id] = ordinal
+        return ordinal
+
+    def add(self, deposit: Deposit):
+        self._insert(self._register(deposit), deposit)
+
+    def remove(self, deposit: Deposit):
+        self._stale.pop(deposit.deposit_id, None)
+        ordinal = self._ordinals.pop(deposit.deposit_id, None)
+        if ordinal is not None:
+            self._delete(ordinal)
+
+    def update(self, deposit: Deposit):
+        """
+        Переносит вклад в индексах после изменения баланса, статуса или других полей.
+        """
+        # Отметка touch могла остаться на прежнем объекте вклада (update_deposit с новым объектом)
+        self._stale.pop(deposit.deposit_id, None)
+        ordinal = self._ordinals.get(deposit.deposit_id)
+        if ordinal is None:
+            return
+        bucket = (deposit.deposit_type, bool(deposit.closed))
+        if (self._keys[ordinal] != (bucket, deposit.balance, deposit.open_date)
+                or self._buckets[bucket].get(ordinal) is not deposit):
+            self._delete(ordinal)
+            self._insert(ordinal, deposit)
+
+    def touch(self, deposit: Deposit):
+        """
+        Отмечает изменение баланса вклада; индексы обновятся перед следующим запросом.
+        """
+        self._stale[deposit.deposit_id] = deposit
+
+    def refresh(self):
+        if self._stale:
+            for deposit in list(self._stale.values()):
+                self.update(deposit)
+
+    def _insert(self, ordinal: int, deposit: Deposit):
+        bucket = (deposit.deposit_type, bool(deposit.closed))
+        self._keys[ordinal] = (bucket, deposit.balance, deposit.open_date)
+        self._buckets[bucket][ordinal] = deposit
+        self._sorted["balance"][bucket].add((deposit.balance, ordinal))
+        self._sorted["open_date"][bucket].add((deposit.open_date, ordinal))
+
+    def _delete(self, ordinal: int):
+        bucket, balance, open_date = self._keys.pop(ordinal)
+        del self._buckets[bucket][ordinal]
+        self._sorted["balance"][bucket].remove((balance, ordinal))
+        self._sorted["open_date"][bucket].remove((open_date, ordinal))
+
+    def _select_buckets(self, query: DepositQuery) -> list[tuple[DepositType, bool]]:
+        types = list(DepositType) if query.deposit_type is None else [query.deposit_type]
+        statuses = (False, True) if query.closed is None else (query.closed,)
+        return [(dep_type, closed) for dep_type in types for closed in statuses]
+
+    def _estimate(self, field: str, buckets: list[tuple[DepositType, bool]], query: DepositQuery) -> int:
+        lo, hi = _bounds(*query.range(field))
+        return sum(self._sorted[field][bucket].count(lo, hi) for bucket in buckets)
+
+    def plan(self, query: DepositQuery) -> str | None:
+        """
+        Индекс, по которому будет выполнен запрос: поле из INDEXED_FIELDS или None (перебор корзин).
+        """
+        self.refresh()
+        buckets = self._select_buckets(query)
+        ranges = {field: self._estimate(field, buckets, query)
+                  for field in INDEXED_FIELDS if query.range(field) != (None, None)}
+        best = min(ranges, key=ranges.get) if ranges else None
+        if query.order_by in INDEXED_FIELDS:
+            ordered = ranges.get(query.order_by)
+            if ordered is None:
+                ordered = sum(len(self._buckets[bucket]) for bucket in buckets)
+            if best is not None and ranges[best] * RANGE_ADVANTAGE < ordered:
+                return best
+            return query.order_by
+        if best is not None and ranges[best] < sum(len(self._buckets[bucket]) for bucket in buckets):
+            return best
+        return None
+
+    def _iter_bucket(self, field: str, bucket: tuple[DepositType, bool], lo, hi,
+                     reverse: bool) -> Iterator[tuple[float, int, Deposit]]:
+        deposits = self._buckets[bucket]
+        for value, ordinal in self._sorted[field][bucket].irange(lo, hi, reverse):
+            yield value, ordinal, deposits[ordinal]
+
+    def _scan_index(self, field: str, buckets: list[tuple[DepositType, bool]], query: DepositQuery,
+                    ordered: bool) -> Iterator[tuple[int, Deposit]]:
+        lo, hi = _bounds(*query.range(field))
+        ranges = [self._iter_bucket(field, bucket, lo, hi, query.descending) for bucket in buckets]
+        merged = heapq.merge(*ranges, reverse=query.descending) if ordered else chain(*ranges)
+        return ((ordinal, deposit) for _, ordinal, deposit in merged)
+
+    def select(self, query: DepositQuery) -> list[Deposit]:
+        if query.limit == 0:
+            return []
+        self.refresh()
+        buckets = self._select_buckets(query)
+        field = self.plan(query)
+        if field is not None and field == query.order_by:
+            # Результат уже упорядочен индексом — проверяем остальные условия, пока не наберётся limit вкладов
+            found = []
+            for _, deposit in self._scan_index(field, buckets, query, True):
+                if query.matches(deposit):
+                    found.append(deposit)
+                    if query.limit is not None and len(found) >= query.limit:
+                        break
+            return found
+        if field is not None:
+            candidates = self._scan_index(field, buckets, query, False)
+        else:
+            candidates = chain.from_iterable(self._buckets[bucket].items() for bucket in buckets)
+        found = [(ordinal, deposit) for ordinal, deposit in candidates if query.matches(deposit)]
+        if query.order_by is None:
+            key = lambda item: item[0]
+        else:
+            key = lambda item: (getattr(item[1], query.order_by), item[0])
+        if query.limit is None:
+            found.sort(key=key, reverse=query.descending)
+        else:
+            found = (heapq.nlargest if query.descending else heapq.nsmallest)(query.limit, found, key=key)
+        return [deposit for _, deposit in found]
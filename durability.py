@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+
+from utils import MyEnum, write_to_file, append_to_file, fsync_file, fsync_dir
+
+
+class Durability(MyEnum):
+    # fsync при каждом коммите: подтверждённые изменения переживают отключение питания
+    ALWAYS = 0
+    # fsync журнала транзакций и каталога не чаще раза в sync_interval секунд и не позже чем через sync_interval
+    # после записи: при отключении питания теряется не больше этого интервала. Перезаписанная таблица
+    # синхронизируется при каждом коммите до переименования, поэтому остаётся целой прежней или новой версией
+    INTERVAL = 1
+    # без fsync: данные сбрасывает на диск ОС; переживают падение процесса, но не отключение питания
+    OS = 2
+
+
+# Интервал синхронизации для Durability.INTERVAL, секунды
+SYNC_INTERVAL = 0.05
+
+
+class SyncedFiles:
+    """
+    Записывает изменения одного коммита (список (режим "append" или "rewrite", путь, строки CSV)) с выбранной
+    политикой синхронизации. Таблицы при любой политике перезаписываются атомарно (временный файл и rename),
+    поэтому падение посреди записи оставляет прежнюю версию файла, а не обрезанную.
+
+    При INTERVAL записанное без fsync синхронизирует таймер, даже если следующего коммита нет. Перезаписываемая
+    таблица и при INTERVAL синхронизируется до переименования временного файла, откладывается только fsync
+    каталога: иначе после отключения питания переименование могло бы оказаться на диске раньше данных файла.
+    """
+
+    def __init__(self, durability: Durability = Durability.ALWAYS, sync_interval: float = SYNC_INTERVAL):
+        self.durability = durability
+        self.sync_interval = sync_interval
+        self.syncs = 0
+        self._last_sync = time.monotonic()
+        # Файлы, записанные без fsync (для INTERVAL), — синхронизируются при следующем коммите с fsync
+        # или по таймеру
+        self._unsynced: set[str] = set()
+        self._timer: threading.Timer | None = None
+        # Таймер синхронизирует файлы из своего потока, поэтому запись и синхронизация идут под блокировкой
+        self._lock = threading.Lock()
+
+    def write(self, writes: list[tuple[str, str, list]]):
+        with self._lock:
+            self._write(writes)
+
+    def _write(self, writes: list[tuple[str, str, list]]):
+        now = time.monotonic()
+        sync = (self.durability == Durability.ALWAYS
+                or self.durability == Durability.INTERVAL and now - self._last_sync >= self.sync_interval)
+        written = set()
+        for mode, path, rows in writes:
+            if mode == "rewrite":
+                write_to_file(path, rows, sync=sync or self.durability == Durability.INTERVAL, sync_dir=sync)
+            else:
+                append_to_file(path, rows, sync=sync)
+            written.add(path)
+        if self.durability == Durability.OS:
+            return
+        if not sync:
+            self._unsynced |= written
+            if self._timer is None:
+                self._timer = threading.Timer(self._last_sync + self.sync_interval - now, self._sync_due)
+                self._timer.daemon = True
+                self._timer.start()
+            return
+        # Записанное сейчас уже синхронизировано, остаются файлы прошлых коммитов без fsync
+        self._unsynced -= written
+        self._sync_unsynced()
+        self._last_sync = now
+        self.syncs += 1
+
+    def _sync_due(self):
+        with self._lock:
+            self._timer = None
+            if self._unsynced:
+                self._sync_unsynced()
+                self._last_sync = time.monotonic()
+                self.syncs += 1
+
+    def sync(self):
+        """
+        Синхронизирует всё, что было записано без fsync (например, перед закрытием хранилища).
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._sync_unsynced()
+
+    def _sync_unsynced(self):
+        for path in self._unsynced:
+            fsync_file(path)
+        for directory in {os.path.dirname(path) or "." for path in self._unsynced}:
+            fsync_dir(directory)
+        self._unsynced.clear()
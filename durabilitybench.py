@@ -0,0 +1,78 @@
+import argparse
+import itertools
+import random
+import shutil
+import tempfile
+import time
+
+from bankingsystem import BankingSystem
+from deposit import DepositType
+from durability import Durability
+from loadtest import percentile
+from storage import BACKENDS, BACKGROUND_WRITER_BACKENDS
+
+
+def run(backend: str, durability: Durability, background_writer: bool, operations: int, deposits: int) -> str:
+    data_dir = tempfile.mkdtemp(prefix="bank-bench-")
+    try:
+        banking_system = BankingSystem(backend, data_dir, background_writer, durability)
+        banking_system.add_client("Тест производительности")
+        client_id = banking_system.get_all_clients()[0].client_id
+        with banking_system.batch():
+            for _ in range(deposits):
+                banking_system.add_deposit(client_id, DepositType.DEMAND, 1_000_000.0, 1.0)
+        deposit_ids = [d.deposit_id for d in banking_system.get_client_deposits(client_id)]
+
+        # Задержка операции — до момента, когда её изменения записаны на диск
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(operations):
+            op_start = time.perf_counter()
+            banking_system.deposit_funds(random.choice(deposit_ids), 1.0)
+            banking_system.durable().result()
+            latencies.append(time.perf_counter() - op_start)
+        elapsed = time.perf_counter() - start
+        syncs = sync_counts(banking_system.db)
+        banking_system.close()
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    latencies.sort()
+    if syncs is None:
+        syncs = "-"
+    elif len(syncs) == 1:
+        syncs = str(syncs[0])
+    else:
+        syncs = f"{sum(syncs)} ({'/'.join(map(str, syncs))})"
+    return (f"{backend:<9} {durability.name.lower():<9} {'да' if background_writer else 'нет':<8} "
+            f"{operations / elapsed:>9.0f} {percentile(latencies, 0.5) * 1000:>8.2f} "
+            f"{percentile(latencies, 0.99) * 1000:>8.2f} {syncs:>6}")
+
+
+def sync_counts(db) -> list[int] | None:
+    """
+    Число синхронизаций коммитов с диском (fsync журнала транзакций и каталога; при INTERVAL перезаписанные таблицы
+    синхронизируются ещё и при каждом коммите, до переименования, и здесь не считаются): по одному значению
+    на каждую часть разделённого хранилища (одно — для файлового);
+    None для SQLite, где синхронизацией управляет сама база.
+    """
+    files = [getattr(shard, "files", None) for shard in getattr(db, "shards", [db])]
+    return None if None in files else [f.syncs for f in files]
+
+
+def main(args):
+    print(f"Операций: {args.operations}, вкладов: {args.deposits}")
+    print(f"{'Хранилище':<9} {'Политика':<9} {'Фон':<8} {'оп/с':>9} {'p50, мс':>8} {'p99, мс':>8} "
+          f"{'fsync (по частям)':>6}")
+    for backend, durability, background_writer in itertools.product(args.backends, Durability, (False, True)):
+        if background_writer and backend not in BACKGROUND_WRITER_BACKENDS:
+            continue
+        print(run(backend, durability, background_writer, args.operations, args.deposits))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Производительность хранилищ при разных политиках синхронизации")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--operations", type=int, default=500, help="число операций на замер")
+    parser.add_argument("--deposits", type=int, default=1000, help="число вкладов в базе")
+    main(parser.parse_args())
@@ -0,0 +1,207 @@
+import asyncio
+import os
+import queue
+import threading
+import zlib
+from concurrent.futures import Future
+from contextlib import ExitStack
+from typing import Callable
+
+from shardeddatabase import id_number
+from writer import gather_futures
+
+
+# Сколько операций шард выполняет одним пакетом (одним коммитом хранилища)
+MAX_BATCH = 256
+
+# Признак завершения работы шарда
+_STOP = object()
+
+
+class _Rendezvous:
+    """
+    Операция нескольких шардов (перевод между вкладами): стоит в очереди каждого из них и выполняется, когда все
+    они до неё дошли, поэтому упорядочена с операциями каждого из своих вкладов.
+    """
+    __slots__ = ("task", "waiting", "lock", "done")
+
+    def __init__(self, task: tuple, parties: int):
+        self.task = task
+        self.waiting = parties
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+
+    def arrive(self) -> bool:
+        # True — этот шард дошёл последним и выполняет операцию
+        with self.lock:
+            self.waiting -= 1
+            return self.waiting == 0
+
+
+class ShardedExecutor:
+    """
+    Выполняет операции BankingSystem в нескольких потоках-шардах. Операция привязана к ключу (ID вклада);
+    все операции одного ключа попадают в один шард и выполняются строго по очереди, в порядке отправки,
+    операции разных вкладов распределяются по шардам. Перевод ставится в очереди шардов обоих вкладов
+    и выполняется, когда оба до него дошли.
+
+    Шард забирает из очереди все накопившиеся операции (не более MAX_BATCH) и выполняет их одним пакетом
+    хранилища — с одним коммитом на диск. Результат операции становится доступен, когда её пакет записан на диск.
+
+    С разделённым хранилищем (ShardedDatabase) шард исполнителя отвечает за свои части хранилища и выполняет
+    пакет под блокировками только этих частей, вместе с их коммитом и fsync: пакеты разных шардов идут
+    одновременно, и ожидание диска одним шардом не задерживает другие. Перевод захватывает все части, поэтому
+    выполняется отдельно от пакетов. С другими хранилищами пакет выполняется под общей блокировкой хранилища;
+    запись на диск не держит её только при фоновой записи (background_writer).
+    """
+
+    def __init__(self, banking_system, workers: int | None = None, max_batch: int = MAX_BATCH):
+        self.banking_system = banking_system
+        # Части разделённого хранилища (None — хранилище не разделено)
+        self._parts = getattr(banking_system.db, "shards", None)
+        self.workers = workers or (len(self._parts) if self._parts else os.cpu_count()) or 1
+        self.max_batch = max_batch
+        self._queues: list[queue.SimpleQueue] = [queue.SimpleQueue() for _ in range(self.workers)]
+        self._threads = [threading.Thread(target=self._run, args=(q,), name=f"shard-{i}", daemon=True)
+                         for i, q in enumerate(self._queues)]
+        # Операции нескольких шардов ставятся в очереди под блокировкой: во всех очередях они идут в одном
+        # порядке, и шарды не ждут друг друга по кругу
+        self._submit_lock = threading.Lock()
+        self._closed = False
+        for thread in self._threads:
+            thread.start()
+
+    def part_of(self, key: str) -> int | None:
+        # Номер части разделённого хранилища, в которой лежит вклад
+        return None if self._parts is None else id_number(key) % len(self._parts)
+
+    def shard_of(self, key: str) -> int:
+        if self._parts is not None:
+            return self.part_of(key) % self.workers
+        # crc32, а не hash(): номер шарда не зависит от PYTHONHASHSEED
+        return zlib.crc32(key.encode()) % self.workers
+
+    def submit(self, key: str, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Ставит fn(*args, **kwargs) в очередь шарда ключа. С разделённым хранилищем fn выполняется под блокировкой
+        только части вклада key и должна работать только с ним.
+        """
+        if self._closed:
+            raise RuntimeError("Исполнитель операций остановлен")
+        future = Future()
+        self._queues[self.shard_of(key)].put((future, key, fn, args, kwargs))
+        return future
+
+    def submit_joint(self, keys: tuple[str, ...], fn: Callable, *args, **kwargs) -> Future:
+        """
+        Ставит операцию нескольких вкладов в очереди шардов всех ключей; она выполняется, когда все эти шарды
+        до неё дошли, в своём пакете хранилища (с разделённым хранилищем — под блокировками всех частей).
+        """
+        future = Future()
+        shards = {self.shard_of(key) for key in keys}
+        rendezvous = _Rendezvous((future, None, fn, args, kwargs), len(shards))
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError("Исполнитель операций остановлен")
+            for shard in shards:
+                self._queues[shard].put(rendezvous)
+        return future
+
+    async def run(self, key: str, fn: Callable, *args, **kwargs):
+        """
+        То же, что submit, но для корутин: ожидание не блокирует цикл событий.
+        """
+        return await asyncio.wrap_future(self.submit(key, fn, *args, **kwargs))
+
+    def deposit_funds(self, deposit_id: str, amount: float) -> Future:
+        return self.submit(deposit_id, self.banking_system.deposit_funds, deposit_id, amount)
+
+    def withdraw_funds(self, deposit_id: str, amount: float) -> Future:
+        return self.submit(deposit_id, self.banking_system.withdraw_funds, deposit_id, amount)
+
+    def transfer(self, from_deposit_id: str, to_deposit_id: str, amount: float) -> Future:
+        # Перевод упорядочивается с операциями обоих вкладов
+        return self.submit_joint((from_deposit_id, to_deposit_id), self.banking_system.transfer,
+                                 from_deposit_id, to_deposit_id, amount)
+
+    def calculate_interest(self, deposit_id: str, to_date: float) -> Future:
+        return self.submit(deposit_id, self.banking_system.calculate_interest, deposit_id, to_date)
+
+    def close_deposit(self, deposit_id: str) -> Future:
+        return self.submit(deposit_id, self.banking_system.close_deposit, deposit_id)
+
+    def _run(self, tasks: queue.SimpleQueue):
+        while True:
+            batch = []
+            # Пакет заканчивается перед операцией нескольких шардов и признаком завершения
+            task = tasks.get()
+            while task is not _STOP and not isinstance(task, _Rendezvous):
+                batch.append(task)
+                if len(batch) >= self.max_batch:
+                    task = None
+                    break
+                try:
+                    task = tasks.get_nowait()
+                except queue.Empty:
+                    task = None
+                    break
+            if batch:
+                self._execute(batch)
+            if isinstance(task, _Rendezvous):
+                if task.arrive():
+                    # Блокировок частей шард сейчас не держит: операция захватит все нужные ей сама
+                    self._execute([task.task], joint=True)
+                    task.done.set()
+                else:
+                    task.done.wait()
+            elif task is _STOP:
+                return
+
+    def _execute(self, batch: list[tuple], joint: bool = False):
+        if self._parts is None or joint:
+            scopes = [self.banking_system]
+        else:
+            scopes = [self._parts[part] for part in sorted({self.part_of(task[1]) for task in batch})]
+        results = []
+        try:
+            with ExitStack() as stack:
+                # Части захватываются по возрастанию номера, как в ShardedDatabase.batch
+                for scope in scopes:
+                    stack.enter_context(scope.batch())
+                for future, _, fn, args, kwargs in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        results.append((future, fn(*args, **kwargs), None))
+                    except Exception as e:
+                        results.append((future, None, e))
+        except Exception as e:
+            # Пакет не удалось сохранить — об этом узнают все операции пакета
+            for future, _, _ in results:
+                future.set_exception(e)
+            return
+        # С фоновой записью результаты отдаются, когда пакет записан на диск; шард тем временем берёт следующий
+        gather_futures([scope.durable() for scope in scopes]).add_done_callback(
+            lambda durable: self._resolve(results, durable))
+
+    @staticmethod
+    def _resolve(results: list[tuple], durable: Future):
+        failure = durable.exception()
+        for future, result, error in results:
+            if failure is not None or error is not None:
+                future.set_exception(failure or error)
+            else:
+                future.set_result(result)
+
+    def close(self):
+        """
+        Выполняет уже отправленные операции и останавливает шарды.
+        """
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            for tasks in self._queues:
+                tasks.put(_STOP)
+        for thread in self._threads:
+            thread.join()
@@ -1,147 +1,594 @@
-import random
 import time
+import math
 import os
+import threading
+from bisect import bisect_left, bisect_right
+from concurrent.futures import Future
+from contextlib import contextmanager
+from functools import wraps
+from typing import Iterator
 
 from pystreamapi import Stream
 
 from account import Account, AccountStatus, AccountCategory
 from client import Client
 from deposit import Deposit, DepositType
+from depositquery import DepositIndex, DepositQuery
+from durability import Durability, SyncedFiles, SYNC_INTERVAL
+from idallocator import IdAllocator
+from interest import compute_interest
+from namesearch import NameIndex
+from pagination import NUMBER, Page, encode_cursor, decode_cursor
+from portfoliostats import ClientTotals, PortfolioStats
 from transaction import Transaction, TransactionType
-from utils import read_file, write_to_file
+from transactionstore import TransactionStore
+from utils import read_file, read_journal, repair_journal, read_file_tail, \
+    file_stamp, write_snapshot, read_snapshot
+from writer import BackgroundWriter, done_future
+
+
+# Версия формата снимка; снимки другой версии игнорируются
+SNAPSHOT_VERSION = 4
+# Сколько байт журнала перед точкой снимка сохраняется для проверки, что журнал не переписан
+JOURNAL_TAIL_SIZE = 256
+
+
+def operation(method):
+    """
+    Помечает метод как операцию с данными. Изменения, сделанные операцией (и вложенными в неё
+    операциями), сохраняются на диск одним групповым коммитом после её завершения.
+    Операция вместе с коммитом выполняется под блокировкой хранилища (self.lock), поэтому операции
+    из разных потоков не перемежаются.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            self._batch_depth += 1
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self._commit()
+    return wrapper
 
 
 class FileDatabase:
-    def __init__(self, data_dir: str):
+    # Порядок сохранения таблиц при сбросе изменений на диск
+    TABLES = ("transactions", "accounts", "deposits", "clients")
+
+    def __init__(self,
+                 data_dir: str,
+                 journal_transactions: bool = True,
+                 flush_every: int = 1,
+                 flush_interval: float | None = None,
+                 snapshot_every: int | None = 100_000,
+                 background_writer: bool = False,
+                 durability: Durability = Durability.ALWAYS,
+                 sync_interval: float = SYNC_INTERVAL,
+                 id_step: int = 1,
+                 id_offset: int = 0):
         os.makedirs(data_dir, exist_ok=True)
 
+        # В режиме журнала новые транзакции дописываются в конец transactions.csv,
+        # а не переписывают весь файл при каждой операции
+        self.journal_transactions = journal_transactions
+
+        # Групповой коммит: изменённые таблицы сбрасываются на диск раз в flush_every операций
+        # или если с прошлого сброса прошло flush_interval секунд (проверяется при очередной операции)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._dirty: set[str] = set()
+        self._pending_transactions: list[Transaction] = []
+        self._pending_ops = 0
+        self._batch_depth = 0
+        self._last_flush = time.monotonic()
+        # Блокировка хранилища: операции, пакеты и сброс на диск из разных потоков выполняются по одному
+        self.lock = threading.RLock()
+        # Политика синхронизации с диском (см. Durability): fsync при каждом коммите, по интервалу или силами ОС
+        self.files = SyncedFiles(durability, sync_interval)
+        # С фоновой записью коммит только сериализует изменённые строки и ставит их в очередь потока записи,
+        # а запись файлов и fsync идут в этом потоке (см. durable)
+        self.writer = BackgroundWriter(self.files) if background_writer else None
+        self._writes: list[tuple[str, str, list]] = []
+        # Сериализованные строки таблиц клиентов, вкладов и счетов по ID (в порядке строк файла) и ID строк,
+        # изменённых после последней записи: при коммите заново сериализуются только они, а не вся таблица
+        self._table_rows: dict[str, dict[str, list[str]]] = {}
+        self._changed_rows: dict[str, set[str]] = {}
+
+        # Снимок: бинарная копия всех таблиц. Создаётся автоматически каждые snapshot_every
+        # записанных в журнал транзакций и при закрытии базы, а также по команде checkpoint()
+        self.snapshot_every = snapshot_every
+        self._journaled_since_snapshot = 0
+        self._changed_since_snapshot = False
+        # Поток, который пишет снимок по порогу snapshot_every (см. _start_snapshot)
+        self._snapshot_thread: threading.Thread | None = None
+
         self.clients_file = f"{data_dir}/clients.csv"
         self.deposits_file = f"{data_dir}/deposits.csv"
         self.accounts_file = f"{data_dir}/accounts.csv"
         self.transactions_file = f"{data_dir}/transactions.csv"
+        # Все счета, которые были у каждого вклада (счёт вклада меняет add_account): дописываемая таблица
+        self.deposit_accounts_file = f"{data_dir}/deposit_accounts.csv"
+        self.snapshot_file = f"{data_dir}/snapshot.bin"
+        self.names_file = f"{data_dir}/names.bin"
+        # Часть разделённого хранилища выдаёт только номера ID с остатком id_offset по модулю id_step (см. IdAllocator)
+        self.ids = IdAllocator(f"{data_dir}/sequences.csv", step=id_step, offset=id_offset)
 
         self.clients = []
         self.deposits = []
         self.accounts = []
-        self.transactions = []
+        # Транзакции хранятся по столбцам; там же — индекс записей каждого счёта по дате
+        self.transactions = TransactionStore()
+
+        # Индексы по первичному ключу и по клиенту, поддерживаются вместе со списками
+        self.clients_by_id: dict[str, Client] = {}
+        self.deposits_by_id: dict[str, Deposit] = {}
+        self.accounts_by_id: dict[str, Account] = {}
+        self.deposits_by_client: dict[str, list[Deposit]] = {}
+        # Счёт -> (вклад, тип вклада при открытии счёта) и вклад -> его счета, включая прежние и счета удалённых
+        # вкладов: по ним считается история баланса вклада и портфеля на дату (см. deposit_balance_as_of)
+        self.account_owners: dict[str, tuple[str, DepositType]] = {}
+        self.deposit_accounts: dict[str, list[str]] = {}
+        self._pending_owners: list[list[str]] = []
+        # Корзины вкладов по типу и статусу с упорядоченными индексами для запросов (см. query_deposits)
+        self.deposit_index = DepositIndex()
+        # Сводные показатели портфеля, обновляются при каждом изменении вкладов
+        self.stats = PortfolioStats()
+        # Номер версии каждой таблицы, растёт при каждом изменении таблицы (по нему сбрасывается кэш отчётов)
+        self.versions: dict[str, int] = dict.fromkeys(self.TABLES, 0)
 
         self.load_all()
 
+        self.ids.seed("C", self.clients_by_id)
+        self.ids.seed("D", self.deposits_by_id)
+        self.ids.seed("A", self.accounts_by_id)
+        self.ids.seed("T", (self.transactions.transaction_id(row) for row in range(len(self.transactions))))
+
     def load_all(self):
-        self.load_clients()
-        self.load_deposits()
-        self.load_accounts()
-        self.load_transactions()
+        """
+        Загружает данные из последнего снимка, если он есть. Таблицы, файлы которых изменились
+        после снимка, читаются из CSV; из журнала транзакций читаются только записи после снимка.
+        """
+        for table in self.versions:
+            self.versions[table] += 1
+        self._table_rows.clear()
+        self._changed_rows.clear()
+        repair_journal(self.transactions_file)
+        snapshot = read_snapshot(self.snapshot_file)
+        if snapshot is not None and snapshot.get("version") != SNAPSHOT_VERSION:
+            snapshot = None
+
+        def from_snapshot(table: str, file_path: str):
+            if snapshot is None or snapshot["stamps"].get(table) != file_stamp(file_path):
+                return None
+            return snapshot[table]
+
+        self.load_clients(from_snapshot("clients", self.clients_file))
+        self.load_name_index()
+        self.load_account_owners(from_snapshot("deposit_accounts", self.deposit_accounts_file))
+        self.load_deposits(from_snapshot("deposits", self.deposits_file))
+        self.load_accounts(from_snapshot("accounts", self.accounts_file))
+        if snapshot is not None and self._journal_continues(snapshot["journal_offset"], snapshot["journal_tail"]):
+            self.load_transactions(snapshot["transactions"], snapshot["journal_offset"])
+        else:
+            self.load_transactions()
 
-    def load_clients(self):
+    def load_clients(self, clients: list[Client] | None = None):
         self.clients.clear()
 
-        Stream.of(read_file(self.clients_file)) \
-            .for_each(lambda line: self.clients.append(Client.deserialize(line)))
-
-    def load_deposits(self):
+        if clients is not None:
+            self.clients.extend(clients)
+        else:
+            Stream.of(read_file(self.clients_file)) \
+                .for_each(lambda line: self.clients.append(Client.deserialize(line)))
+
+        self.clients_by_id = {c.client_id: c for c in self.clients}
+        # Порядковый номер клиента в списке (растёт при добавлении, не меняется при удалении других) — ключ страниц
+        self.client_positions = {c.client_id: i for i, c in enumerate(self.clients)}
+        self._next_client_position = len(self.clients)
+
+    def load_name_index(self):
+        """
+        Индекс поиска по ФИО хранится в отдельном файле вместе с отметкой файла клиентов, по которому построен.
+        Если файла нет или клиенты с тех пор изменились, индекс строится заново при загрузке, а не при первом
+        поиске: поиск не должен останавливать цикл событий интерфейса или сервера на время построения.
+        """
+        saved = read_snapshot(self.names_file)
+        if saved is not None and saved.get("version") == SNAPSHOT_VERSION \
+                and saved["stamp"] == file_stamp(self.clients_file):
+            self.name_index: NameIndex = saved["index"]
+            self._name_index_saved = True
+        else:
+            self.name_index = NameIndex(self.clients)
+            self._name_index_saved = False
+
+    def load_account_owners(self, owners: dict[str, tuple[str, DepositType]] | None = None):
+        if owners is None:
+            owners = {row[0]: (row[1], DepositType.value_of(row[2])) for row in read_file(self.deposit_accounts_file)}
+        self.account_owners = owners
+        self.deposit_accounts = {}
+        for account_id, (deposit_id, _) in owners.items():
+            self.deposit_accounts.setdefault(deposit_id, []).append(account_id)
+        self._pending_owners = []
+
+    def load_deposits(self, deposits: list[Deposit] | None = None):
         self.deposits.clear()
 
-        Stream.of(read_file(self.deposits_file)) \
-            .for_each(lambda line: self.deposits.append(Deposit.deserialize(line)))
+        if deposits is not None:
+            self.deposits.extend(deposits)
+        else:
+            Stream.of(read_file(self.deposits_file)) \
+                .for_each(lambda line: self.deposits.append(Deposit.deserialize(line)))
+
+        self.deposits_by_id = {}
+        self.deposits_by_client = {}
+        self.stats = PortfolioStats()
+        for d in self.deposits:
+            self._index_deposit(d)
+        self.deposit_index = DepositIndex(self.deposits)
 
-    def load_accounts(self):
+    def load_accounts(self, accounts: list[Account] | None = None):
         self.accounts.clear()
 
-        Stream.of(read_file(self.accounts_file)) \
-            .for_each(lambda line: self.accounts.append(Account.deserialize(line)))
+        if accounts is not None:
+            self.accounts.extend(accounts)
+        else:
+            Stream.of(read_file(self.accounts_file)) \
+                .for_each(lambda line: self.accounts.append(Account.deserialize(line)))
+
+        self.accounts_by_id = {a.account_id: a for a in self.accounts}
 
-    def load_transactions(self):
-        self.transactions.clear()
+    def load_transactions(self, transactions: TransactionStore | None = None, journal_offset: int = 0):
+        """
+        Загружает транзакции: готовое хранилище из снимка (если передано) плюс записи журнала,
+        начиная с journal_offset.
+        """
+        self.transactions = transactions if transactions is not None else TransactionStore()
 
-        Stream.of(read_file(self.transactions_file)) \
-            .for_each(lambda line: self.transactions.append(Transaction.deserialize(line)))
+        repair_journal(self.transactions_file)
+        for line in read_journal(self.transactions_file, journal_offset):
+            self.transactions.append(Transaction.deserialize(line))
 
     def save_clients(self):
-        write_to_file(self.clients_file, [client.serialize() for client in self.clients])
+        self._write_table("clients", self.clients_file, self.clients, self.clients_by_id)
 
     def save_deposits(self):
-        write_to_file(self.deposits_file, [deposit.serialize() for deposit in self.deposits])
+        self._write_table("deposits", self.deposits_file, self.deposits, self.deposits_by_id)
 
     def save_accounts(self):
-        write_to_file(self.accounts_file, [account.serialize() for account in self.accounts])
+        self._write_table("accounts", self.accounts_file, self.accounts, self.accounts_by_id)
 
     def save_transactions(self):
-        write_to_file(self.transactions_file, [transaction.serialize() for transaction in self.transactions])
+        self._write_rows(self.transactions_file, [transaction.serialize() for transaction in self.transactions])
+
+    def append_transactions(self, transactions: list[Transaction]):
+        self._writes.append(("append", self.transactions_file, [t.serialize() for t in transactions]))
+
+    def _write_rows(self, file_path: str, rows: list[list[str]]):
+        self._writes.append(("rewrite", file_path, rows))
+
+    def _write_table(self, table: str, file_path: str, items: list, by_id: dict):
+        """
+        Перезаписывает таблицу из кэша сериализованных строк, обновив в нём изменённые строки. Поток записи
+        получает копию списка строк, поэтому коммит не зависит от размера таблицы, кроме копирования ссылок.
+        """
+        rows = self._cached_rows(table, items)
+        changed = self._changed_rows.pop(table, ())
+        if rows is None:
+            self._write_rows(file_path, [item.serialize() for item in items])
+            return
+        for key in changed:
+            item = by_id.get(key)
+            if item is None:
+                rows.pop(key, None)
+            else:
+                rows[key] = item.serialize()
+        self._write_rows(file_path, list(rows.values()))
+
+    def _cached_rows(self, table: str, items: list) -> dict[str, list[str]] | None:
+        rows = self._table_rows.get(table)
+        if rows is None:
+            # ID в первом поле строки; при повторяющихся ID (испорченный файл) таблица не кэшируется
+            rows = {row[0]: row for row in (item.serialize() for item in items)}
+            if len(rows) != len(items):
+                return None
+            self._table_rows[table] = rows
+        return rows
+
+    def _write_files(self):
+        # Записывает накопленные изменения сам или отдаёт их потоку записи
+        if not self._writes:
+            return
+        writes, self._writes = self._writes, []
+        if self.writer is not None:
+            self.writer.submit(writes)
+        else:
+            self.files.write(writes)
 
     def save_all(self):
         self.save_clients()
         self.save_deposits()
         self.save_accounts()
         self.save_transactions()
+        self._write_files()
+        self._dirty.clear()
+        self._pending_transactions.clear()
+
+    def _mark_dirty(self, table: str, key: str | None = None):
+        """
+        key — ID единственной изменённой (добавленной, удалённой) строки таблицы; без него при следующей
+        записи таблица сериализуется целиком.
+        """
+        self._dirty.add(table)
+        if key is None:
+            self._table_rows.pop(table, None)
+        elif table in self._table_rows:
+            self._changed_rows.setdefault(table, set()).add(key)
+        if table == "clients":
+            self._name_index_saved = False
+        self.versions[table] += 1
+
+    def _commit(self):
+        if not self._dirty:
+            return
+        self._pending_ops += 1
+        if self._pending_ops >= self.flush_every or (
+                self.flush_interval is not None and time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """
+        Сбрасывает на диск все накопленные изменения: новые транзакции дописываются в журнал,
+        каждая изменённая таблица переписывается один раз.
+        """
+        with self.lock:
+            if self._dirty:
+                self._changed_since_snapshot = True
+            if self._pending_transactions and self.journal_transactions:
+                self.append_transactions(self._pending_transactions)
+                self._journaled_since_snapshot += len(self._pending_transactions)
+                self._dirty.discard("transactions")
+            self._pending_transactions.clear()
+            if self._pending_owners:
+                self._writes.append(("append", self.deposit_accounts_file, self._pending_owners))
+                self._pending_owners = []
+            for table in self.TABLES:
+                if table in self._dirty:
+                    getattr(self, f"save_{table}")()
+            self._dirty.clear()
+            self._pending_ops = 0
+            self._last_flush = time.monotonic()
+            self._write_files()
+
+            if self.snapshot_every is not None and self._journaled_since_snapshot >= self.snapshot_every:
+                self._start_snapshot()
+
+    @contextmanager
+    def batch(self):
+        """
+        Объединяет несколько операций в один коммит: файлы записываются один раз при выходе из блока.
+        Другие потоки не выполняют операций, пока блок не завершится.
+        """
+        with self.lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self.flush()
+
+    def durable(self) -> Future:
+        """
+        Future, который завершается, когда все сохранённые к этому моменту изменения записаны на диск.
+        Без фоновой записи коммит сам пишет файлы, и Future уже завершён.
+        """
+        return self.writer.durable() if self.writer is not None else done_future()
+
+    def checkpoint(self):
+        """
+        Сохраняет все изменения и создаёт снимок данных, чтобы следующий запуск не разбирал CSV целиком.
+        """
+        with self.lock:
+            self.flush()
+            self._write_snapshot()
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            if self.writer is not None:
+                self.writer.close()
+            # Для Durability.INTERVAL: последние коммиты могли ещё не попасть на диск
+            self.files.sync()
+            self._wait_snapshot()
+            if self._changed_since_snapshot:
+                self._write_snapshot()
+            elif not self._name_index_saved:
+                self._write_name_index()
+            self.ids.close()
+
+    def _snapshot_files(self) -> dict:
+        # Вызывается только сразу после flush(): всё, что есть в памяти, уже записано в файлы
+        # (или отправлено потоку записи — тогда дожидаемся его), и отметки файлов соответствуют данным
+        if self.writer is not None:
+            self.writer.wait()
+        journal_offset = os.path.getsize(self.transactions_file) if os.path.exists(self.transactions_file) else 0
+        return {
+            "stamps": {
+                "clients": file_stamp(self.clients_file),
+                "deposit_accounts": file_stamp(self.deposit_accounts_file),
+                "deposits": file_stamp(self.deposits_file),
+                "accounts": file_stamp(self.accounts_file),
+            },
+            "journal_offset": journal_offset,
+            "journal_tail": read_file_tail(self.transactions_file, journal_offset, JOURNAL_TAIL_SIZE),
+        }
+
+    def _write_snapshot(self):
+        self._wait_snapshot()
+        write_snapshot(self.snapshot_file, {
+            "version": SNAPSHOT_VERSION,
+            "clients": self.clients,
+            "deposits": self.deposits,
+            "accounts": self.accounts,
+            "transactions": self.transactions,
+            "deposit_accounts": self.account_owners,
+            **self._snapshot_files(),
+        })
+        if not self._name_index_saved:
+            self._write_name_index()
+        self._journaled_since_snapshot = 0
+        self._changed_since_snapshot = False
+
+    def _start_snapshot(self):
+        """
+        Снимок по порогу snapshot_every. Под блокировкой копируются только ссылки на сериализованные строки
+        таблиц и столбцы транзакций; объекты из строк и индекс транзакций по счетам собирает, сохраняет
+        в pickle и пишет на диск отдельный поток, так что операции не ждут записи снимка. Если предыдущий снимок ещё пишется,
+        новый будет начат при одном из следующих сбросов.
+        """
+        if self._snapshot_thread is not None and self._snapshot_thread.is_alive():
+            return
+        tables = {}
+        for table, items in (("clients", self.clients), ("deposits", self.deposits), ("accounts", self.accounts)):
+            rows = self._cached_rows(table, items)
+            tables[table] = list(rows.values()) if rows is not None else [item.serialize() for item in items]
+        state = {
+            "version": SNAPSHOT_VERSION,
+            "transactions": self.transactions.copy_columns(),
+            "deposit_accounts": dict(self.account_owners),
+            **self._snapshot_files(),
+        }
+        self._snapshot_thread = threading.Thread(target=self._write_snapshot_copy, args=(tables, state),
+                                                 name="snapshot", daemon=True)
+        self._snapshot_thread.start()
+        self._journaled_since_snapshot = 0
+        self._changed_since_snapshot = False
+
+    def _write_snapshot_copy(self, tables: dict[str, list[list[str]]], state: dict):
+        state["clients"] = [Client.deserialize(row) for row in tables["clients"]]
+        state["deposits"] = [Deposit.deserialize(row) for row in tables["deposits"]]
+        state["accounts"] = [Account.deserialize(row) for row in tables["accounts"]]
+        state["transactions"].build_index()
+        write_snapshot(self.snapshot_file, state)
+
+    def _wait_snapshot(self):
+        # Снимок, начатый в фоне, дописывается до того, как файл снимка будет записан заново или база закрыта
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+            self._snapshot_thread = None
+
+    def _write_name_index(self):
+        # Как и снимок, вызывается после flush(): файл клиентов уже записан, его отметка соответствует индексу
+        if self.writer is not None:
+            self.writer.wait()
+        write_snapshot(self.names_file, {
+            "version": SNAPSHOT_VERSION,
+            "index": self.name_index,
+            "stamp": file_stamp(self.clients_file),
+        })
+        self._name_index_saved = True
+
+    def _journal_continues(self, offset: int, tail: bytes) -> bool:
+        # Журнал можно дочитать с offset, только если его начало не переписывалось после снимка
+        stamp = file_stamp(self.transactions_file)
+        size = stamp[0] if stamp else 0
+        return size >= offset and read_file_tail(self.transactions_file, offset, JOURNAL_TAIL_SIZE) == tail
 
     def generate_client_id(self) -> str:
-        while True:
-            cid = f"C{random.randint(0, 9999)}"
-            if all(c.client_id != cid for c in self.clients):
-                return cid
+        return self.ids.allocate("C")
 
     def generate_deposit_id(self) -> str:
-        while True:
-            did = f"D{random.randint(0, 9999)}"
-            if all(d.deposit_id != did for d in self.deposits):
-                return did
+        return self.ids.allocate("D")
 
     def generate_account_id(self) -> str:
-        while True:
-            aid = f"A{random.randint(0, 9999)}"
-            if all(a.account_id != aid for a in self.accounts):
-                return aid
+        return self.ids.allocate("A")
 
     def generate_transaction_id(self) -> str:
-        return f"T{int(time.time())}{random.randint(0, 999)}"
+        return self.ids.allocate("T")
 
-    def get_client(self, client_id: str) -> Client:
-        return Stream.of(self.clients) \
-            .filter(lambda c: c.client_id == client_id) \
-            .find_first() \
-            .or_else(None)
+    def generate_transaction_ids(self, count: int) -> list[str]:
+        return self.ids.allocate_many("T", count)
 
-    def add_client(self, full_name: str) -> bool:
-        if not full_name:
+    def get_client(self, client_id: str) -> Client:
+        return self.clients_by_id.get(client_id)
+
+    def count_clients(self) -> int:
+        return len(self.clients)
+
+    def search_clients(self, query: str, limit: int | None = None, prefix: bool = False) -> list[Client]:
+        """
+        Клиенты, в ФИО которых есть query без учёта регистра (prefix=True — слово ФИО начинается с query).
+        """
+        return [self.clients_by_id[client_id] for client_id in self.name_index.search(query, limit, prefix)]
+
+    def clients_page(self, limit: int, cursor: str | None = None) -> Page[Client]:
+        start = 0
+        if cursor is not None:
+            position, client_id = decode_cursor(cursor, int, str)
+            # Если клиент из курсора ещё существует, берём его текущий номер (номера пересчитываются при загрузке)
+            position = self.client_positions.get(client_id, position)
+            start = bisect_right(self.clients, position, key=lambda c: self.client_positions[c.client_id])
+        items = self.clients[start:start + limit]
+        next_cursor = None
+        if items and start + limit < len(self.clients):
+            last = items[-1]
+            next_cursor = encode_cursor(self.client_positions[last.client_id], last.client_id)
+        return Page(items, next_cursor)
+
+    @operation
+    def add_client(self, full_name: str, client_id: str | None = None) -> bool:
+        """
+        client_id — ID, уже выданный вызывающим (разделённое хранилище выдаёт ID клиентов само, см. ShardedDatabase).
+        """
+        if not full_name or client_id in self.clients_by_id:
             return False
-        client_id = self.generate_client_id()
+        client_id = client_id or self.generate_client_id()
         client = Client(client_id, full_name)
         self.clients.append(client)
-        self.save_clients()
+        self.clients_by_id[client_id] = client
+        self.client_positions[client_id] = self._next_client_position
+        self._next_client_position += 1
+        self.name_index.add(client_id, full_name)
+        self._mark_dirty("clients", client_id)
         return True
 
+    @operation
     def update_client(self, client: Client) -> bool:
-        for idx, c in enumerate(self.clients):
-            if c.client_id == client.client_id:
-                self.clients[idx] = client
-                self.save_clients()
-                return True
-        return False
+        current = self.clients_by_id.get(client.client_id)
+        if current is None:
+            return False
+        if current is not client:
+            self.clients[self.clients.index(current)] = client
+            self.clients_by_id[client.client_id] = client
+        self.name_index.add(client.client_id, client.full_name)
+        self._mark_dirty("clients", client.client_id)
+        return True
 
+    @operation
     def delete_client(self, client_id: str) -> bool:
-        if any(d.client_id == client_id for d in self.deposits):
+        if self.deposits_by_client.get(client_id):
+            return False
+        client = self.clients_by_id.pop(client_id, None)
+        if client is None:
             return False
-        for idx, c in enumerate(self.clients):
-            if c.client_id == client_id:
-                del self.clients[idx]
-                self.save_clients()
-                return True
-        return False
+        self.clients.remove(client)
+        del self.client_positions[client_id]
+        self.name_index.remove(client_id)
+        self._mark_dirty("clients", client_id)
+        return True
 
     def get_deposit(self, deposit_id: str) -> Deposit:
-        return Stream.of(self.deposits) \
-            .filter(lambda d: d.deposit_id == deposit_id) \
-            .find_first() \
-            .or_else(None)
+        return self.deposits_by_id.get(deposit_id)
 
     def get_client_deposits(self, client_id: str) -> list:
-        return Stream.of(self.deposits) \
-            .filter(lambda d: d.client_id == client_id) \
-            .to_list()
+        return list(self.deposits_by_client.get(client_id, ()))
 
+    @operation
     def add_deposit(self, client_id: str, dep_type: DepositType, initial_balance: float, interest_rate: float) -> bool:
-        if not any(c.client_id == client_id for c in self.clients) or initial_balance < 0 or interest_rate < 0:
+        if client_id not in self.clients_by_id or not (0 <= initial_balance < math.inf) \
+                or not (0 <= interest_rate < math.inf):
             return False
         deposit_id = self.generate_deposit_id()
         account_id = self.generate_account_id()
@@ -149,40 +596,101 @@ class FileDatabase:
         now = int(time.time())
         account = Account(account_id, AccountStatus.OPEN, now, 0, AccountCategory.STANDARD)
         self.accounts.append(account)
+        self.accounts_by_id[account_id] = account
         deposit = Deposit(deposit_id, dep_type, now, initial_balance, interest_rate, False, client_id, account_id)
         self.deposits.append(deposit)
+        self._index_deposit(deposit)
+        self.deposit_index.add(deposit)
         if initial_balance > 0:
             self.add_transaction(account_id, TransactionType.DEPOSIT, initial_balance)
-        self.save_accounts()
-        self.save_deposits()
+        self._mark_dirty("accounts", account_id)
+        self._mark_dirty("deposits", deposit_id)
         return True
 
+    @operation
     def update_deposit(self, deposit: Deposit) -> bool:
-        for idx, d in enumerate(self.deposits):
-            if d.deposit_id == deposit.deposit_id:
-                self.deposits[idx] = deposit
-                self.save_deposits()
-                return True
-        return False
+        current = self.deposits_by_id.get(deposit.deposit_id)
+        if current is None:
+            return False
+        if current is not deposit:
+            self.deposits[self.deposits.index(current)] = deposit
+            self._unindex_deposit(current)
+            self._index_deposit(deposit)
+        else:
+            # Объект изменён на месте: сводка вычитает прежние значения вклада, которые она запомнила
+            self.stats.update(deposit)
+        self._link_account(deposit)
+        self.deposit_index.update(deposit)
+        self._mark_dirty("deposits", deposit.deposit_id)
+        return True
 
+    @operation
     def delete_deposit(self, deposit_id: Deposit) -> bool:
-        for idx, d in enumerate(self.deposits):
-            if d.deposit_id == deposit_id:
-                if not d.closed:
-                    return False
-                account = self.get_account(d.account_id)
-                if not account or account.status != AccountStatus.CLOSED:
-                    return False
-                del self.deposits[idx]
-                self.save_deposits()
-                return True
-        return False
+        d = self.deposits_by_id.get(deposit_id)
+        if d is None or not d.closed:
+            return False
+        account = self.get_account(d.account_id)
+        if not account or account.status != AccountStatus.CLOSED:
+            return False
+        self.deposits.remove(d)
+        self._unindex_deposit(d)
+        self.deposit_index.remove(d)
+        self._mark_dirty("deposits", deposit_id)
+        return True
+
+    def _index_deposit(self, deposit: Deposit):
+        self.deposits_by_id[deposit.deposit_id] = deposit
+        self.deposits_by_client.setdefault(deposit.client_id, []).append(deposit)
+        self.stats.add(deposit)
+        self._link_account(deposit)
+
+    def _link_account(self, deposit: Deposit):
+        # Счёт вклада запоминается навсегда; при загрузке так же дописываются счета данных, созданных до таблицы
+        if deposit.account_id in self.account_owners:
+            return
+        self.account_owners[deposit.account_id] = (deposit.deposit_id, deposit.deposit_type)
+        self.deposit_accounts.setdefault(deposit.deposit_id, []).append(deposit.account_id)
+        self._pending_owners.append([deposit.account_id, deposit.deposit_id, str(deposit.deposit_type)])
+
+    def _unindex_deposit(self, deposit: Deposit):
+        del self.deposits_by_id[deposit.deposit_id]
+        client_deposits = self.deposits_by_client.get(deposit.client_id)
+        if client_deposits is not None:
+            client_deposits.remove(deposit)
+            if not client_deposits:
+                del self.deposits_by_client[deposit.client_id]
+        self.stats.remove(deposit)
+
+    def _balance_changed(self, deposit: Deposit, delta: float):
+        self.stats.change_balance(deposit, delta)
+        # Индексы запросов переносят вклад перед ближайшим запросом, а не при каждой проводке
+        self.deposit_index.touch(deposit)
+
+    def query_deposits(self, query: DepositQuery) -> list[Deposit]:
+        # Вкладов одного клиента немного — их проще проверить перебором, чем пересекать с индексами
+        if query.client_id is not None:
+            return query.apply(self.deposits_by_client.get(query.client_id, ()))
+        # Под блокировкой: перед запросом индекс переносит вклады с изменившимся балансом
+        with self.lock:
+            return self.deposit_index.select(query)
+
+    def iter_open_deposits(self, dep_type: DepositType) -> Iterator[Deposit]:
+        return iter(self.query_deposits(DepositQuery(deposit_type=dep_type, closed=False)))
+
+    def client_totals(self, client_id: str) -> ClientTotals:
+        return self.stats.by_client.get(client_id) or ClientTotals()
+
+    def clients_with_totals(self) -> Iterator[tuple[Client, ClientTotals]]:
+        for client in self.clients:
+            yield client, self.client_totals(client.client_id)
+
+    def portfolio_stats(self) -> PortfolioStats:
+        self.stats.clients = len(self.clients)
+        self.stats.accounts = len(self.accounts)
+        return self.stats
 
     def get_account(self, account_id: str) -> Account:
-        return Stream.of(self.accounts) \
-            .filter(lambda a: a.account_id == account_id) \
-            .find_first() \
-            .or_else(None)
+        return self.accounts_by_id.get(account_id)
 
     def get_deposit_account(self, deposit_id: str) -> Account | None:
         deposit = self.get_deposit(deposit_id)
@@ -190,6 +698,7 @@ class FileDatabase:
             return None
         return self.get_account(deposit.account_id)
 
+    @operation
     def add_account(self, deposit_id: str, category: AccountCategory) -> bool:
         deposit = self.get_deposit(deposit_id)
         if not deposit:
@@ -199,19 +708,25 @@ class FileDatabase:
         now = int(time.time())
         account = Account(account_id, AccountStatus.OPEN, now, 0, category)
         self.accounts.append(account)
+        self.accounts_by_id[account_id] = account
         deposit.account_id = account_id
-        self.save_accounts()
-        self.save_deposits()
+        self._link_account(deposit)
+        self._mark_dirty("accounts", account_id)
+        self._mark_dirty("deposits", deposit_id)
         return True
 
+    @operation
     def update_account(self, account: Account) -> bool:
-        for idx, a in enumerate(self.accounts):
-            if a.account_id == account.account_id:
-                self.accounts[idx] = account
-                self.save_accounts()
-                return True
-        return False
+        current = self.accounts_by_id.get(account.account_id)
+        if current is None:
+            return False
+        if current is not account:
+            self.accounts[self.accounts.index(current)] = account
+            self.accounts_by_id[account.account_id] = account
+        self._mark_dirty("accounts", account.account_id)
+        return True
 
+    @operation
     def close_account(self, account_id: str) -> bool:
         account = self.get_account(account_id)
         if not account:
@@ -226,50 +741,211 @@ class FileDatabase:
             account.status = AccountStatus.CLOSED
             success = True
         if success:
-            self.save_accounts()
+            self._mark_dirty("accounts", account_id)
         return success
 
     def get_all_transactions(self) -> list:
-        return sorted(self.transactions, key=lambda t: t.date, reverse=True)
+        store = self.transactions
+        rows = sorted(range(len(store)), key=store.dates.__getitem__, reverse=True)
+        return [store[row] for row in rows]
 
     def get_account_transactions(self, account_id: str) -> list:
-        txs = [t for t in self.transactions if t.account_id == account_id]
-        return sorted(txs, key=lambda t: t.date, reverse=True)
-
+        return self.query_account_transactions(account_id)
+
+    def query_account_transactions(self,
+                                   account_id: str,
+                                   from_date: float | None = None,
+                                   to_date: float | None = None,
+                                   reverse: bool = True,
+                                   limit: int | None = None) -> list:
+        """
+        Транзакции счёта за период [from_date, to_date] (границы включительно).
+        По умолчанию новые операции идут первыми; limit ограничивает размер выборки.
+        """
+        store = self.transactions
+        rows = store.rows_for_account(account_id)
+        lo, hi = store.date_range(rows, from_date, to_date)
+        if limit is not None:
+            if reverse:
+                lo = max(lo, hi - limit)
+            else:
+                hi = min(hi, lo + limit)
+        page = [store[row] for row in rows[lo:hi]]
+        if reverse:
+            page.reverse()
+        return page
+
+    def account_transactions_page(self,
+                                  account_id: str,
+                                  limit: int,
+                                  cursor: str | None = None,
+                                  from_date: float | None = None,
+                                  to_date: float | None = None,
+                                  reverse: bool = True) -> Page[Transaction]:
+        """
+        Страница транзакций счёта за период. Ключ страницы — (дата, номер записи), продолжение
+        находится двоичным поиском, поэтому стоимость не зависит от длины истории.
+        """
+        store = self.transactions
+        rows = store.rows_for_account(account_id)
+        lo, hi = store.date_range(rows, from_date, to_date)
+        if cursor is not None:
+            key = tuple(decode_cursor(cursor, NUMBER, int))
+            order = lambda row: (store.dates[row], row)
+            if reverse:
+                hi = min(hi, bisect_left(rows, key, key=order))
+            else:
+                lo = max(lo, bisect_right(rows, key, key=order))
+        if reverse:
+            start, stop = max(lo, hi - limit), hi
+            more = start > lo
+        else:
+            start, stop = lo, min(hi, lo + limit)
+            more = stop < hi
+        page = rows[start:stop]
+        items = [store[row] for row in (reversed(page) if reverse else page)]
+        next_cursor = None
+        if more and page:
+            last = page[0] if reverse else page[-1]
+            next_cursor = encode_cursor(store.dates[last], last)
+        return Page(items, next_cursor)
+
+    def transactions_page(self, limit: int, cursor: str | None = None) -> Page[Transaction]:
+        """
+        Страница всех транзакций в обратном порядке записи (последние записанные — первыми).
+        """
+        store = self.transactions
+        stop = len(store) if cursor is None else min(len(store), decode_cursor(cursor, int)[0])
+        start = max(0, stop - limit)
+        items = [store[row] for row in range(stop - 1, start - 1, -1)]
+        return Page(items, encode_cursor(start) if start > 0 else None)
+
+    def count_account_transactions(self,
+                                   account_id: str,
+                                   from_date: float | None = None,
+                                   to_date: float | None = None) -> int:
+        store = self.transactions
+        lo, hi = store.date_range(store.rows_for_account(account_id), from_date, to_date)
+        return hi - lo
+
+    def iter_account_transactions(self,
+                                  account_id: str,
+                                  from_date: float | None = None,
+                                  to_date: float | None = None,
+                                  reverse: bool = True) -> Iterator[Transaction]:
+        store = self.transactions
+        rows = store.rows_for_account(account_id)
+        lo, hi = store.date_range(rows, from_date, to_date)
+        for i in (range(hi - 1, lo - 1, -1) if reverse else range(lo, hi)):
+            yield store[rows[i]]
+
+    def balance_as_of(self, account_id: str, date: float) -> float:
+        return self.transactions.balance_as_of(account_id, date)
+
+    def deposit_balance_as_of(self, deposit_id: str, date: float) -> float | None:
+        """
+        Баланс вклада на дату date по всем счетам, которые у него были (None — вклада не было).
+        """
+        accounts = self.deposit_accounts.get(deposit_id)
+        if accounts is None:
+            return None
+        return sum(self.transactions.balance_as_of(account_id, date) for account_id in accounts)
+
+    def book_balance_as_of(self, date: float) -> dict[DepositType, float]:
+        """
+        Суммарный баланс вкладов каждого типа на дату date (закрытые к этой дате вклады дают 0) по всем счетам
+        вкладов, включая прежние счета и вклады, удалённые позже.
+        """
+        balance = dict.fromkeys(DepositType, 0.0)
+        balance_as_of = self.transactions.balance_as_of
+        for account_id, (deposit_id, dep_type) in self.account_owners.items():
+            deposit = self.deposits_by_id.get(deposit_id)
+            balance[deposit.deposit_type if deposit else dep_type] += balance_as_of(account_id, date)
+        return balance
+
+    @operation
     def add_transaction(self, account_id: str, tx_type: TransactionType, amount: float) -> bool:
         if not self.get_account(account_id) or amount < 0:
             return False
-        tx_id = self.generate_transaction_id()
-        import time
-        now = int(time.time())
-        transaction = Transaction(tx_id, now, tx_type, amount, account_id)
-        self.transactions.append(transaction)
-        self.save_transactions()
+        self._record_transaction(account_id, tx_type, amount, int(time.time()))
         return True
 
+    def _record_transaction(self, account_id: str, tx_type: TransactionType, amount: float, date: float):
+        transaction = Transaction(self.generate_transaction_id(), date, tx_type, amount, account_id)
+        self.transactions.append(transaction)
+        self._pending_transactions.append(transaction)
+        self._mark_dirty("transactions")
+
+    @operation
     def deposit_funds(self, deposit_id: str, amount: float) -> bool:
-        if amount <= 0:
+        # nan проходит проверку amount <= 0 и испортил бы баланс вклада
+        if not math.isfinite(amount) or amount <= 0:
             return False
         deposit = self.get_deposit(deposit_id)
         if not deposit or deposit.closed:
             return False
         deposit.deposit(amount)
+        self._balance_changed(deposit, amount)
         self.add_transaction(deposit.account_id, TransactionType.DEPOSIT, amount)
-        self.save_deposits()
+        self._mark_dirty("deposits", deposit_id)
         return True
 
+    @operation
     def withdraw_funds(self, deposit_id: str, amount: float) -> bool:
-        if amount <= 0:
+        if not math.isfinite(amount) or amount <= 0:
             return False
         deposit = self.get_deposit(deposit_id)
         if not deposit or deposit.closed:
             return False
         if not deposit.withdraw(amount):
             return False
+        self._balance_changed(deposit, -amount)
         self.add_transaction(deposit.account_id, TransactionType.WITHDRAW, amount)
-        self.save_deposits()
+        self._mark_dirty("deposits", deposit_id)
         return True
 
+    @operation
+    def post_transfers(self, legs: list[tuple[Deposit, Deposit, float]], balances: dict[str, float]):
+        """
+        Записывает проверенные переводы (см. transfers.apply_transfers): по две транзакции на перевод
+        и итоговые балансы затронутых вкладов.
+        """
+        now = int(time.time())
+        for source, target, amount in legs:
+            self._record_transaction(source.account_id, TransactionType.WITHDRAW, amount, now)
+            self._record_transaction(target.account_id, TransactionType.DEPOSIT, amount, now)
+        self._set_balances(balances)
+
+    @operation
+    def post_operations(self, postings: list[tuple[Deposit, TransactionType, float]], balances: dict[str, float]):
+        """
+        Записывает проверенные пополнения и снятия (см. bulkoperations.apply_operations): по транзакции
+        на операцию и итоговые балансы затронутых вкладов.
+        """
+        now = int(time.time())
+        self.post_transactions([Transaction(transaction_id, now, tx_type, amount, deposit.account_id)
+                                for transaction_id, (deposit, tx_type, amount)
+                                in zip(self.generate_transaction_ids(len(postings)), postings)], balances)
+
+    @operation
+    def post_transactions(self, transactions: list[Transaction], balances: dict[str, float]):
+        """
+        Записывает готовые транзакции (с уже выданными ID) и итоговые балансы затронутых вкладов.
+        """
+        self.transactions.extend(transactions)
+        self._pending_transactions.extend(transactions)
+        self._mark_dirty("transactions")
+        self._set_balances(balances)
+
+    def _set_balances(self, balances: dict[str, float]):
+        for deposit_id, balance in balances.items():
+            deposit = self.deposits_by_id[deposit_id]
+            delta = balance - deposit.balance
+            deposit.balance = balance
+            self._balance_changed(deposit, delta)
+            self._mark_dirty("deposits", deposit_id)
+
+    @operation
     def calculate_and_add_interest(self, deposit_id: str, to_date: float) -> bool:
         deposit = self.get_deposit(deposit_id)
         if not deposit or deposit.closed:
@@ -278,15 +954,41 @@ class FileDatabase:
         if interest <= 0:
             return False
         deposit.deposit(interest)
+        self._balance_changed(deposit, interest)
         self.add_transaction(deposit.account_id, TransactionType.INTEREST, interest)
-        self.save_deposits()
+        self._mark_dirty("deposits", deposit_id)
         return True
 
+    @operation
+    def accrue_interest(self, to_date: float, dep_type: DepositType | None = None) -> dict[str, float]:
+        """
+        Начисляет проценты по всем открытым вкладам (или только вкладам типа dep_type) на дату to_date
+        одним проходом и сохраняет результат одним коммитом. Возвращает начисленные суммы по ID вкладов.
+        """
+        deposits = self.query_deposits(DepositQuery(deposit_type=dep_type, closed=False))
+        interests = compute_interest([d.balance for d in deposits],
+                                     [d.interest_rate for d in deposits],
+                                     [d.open_date for d in deposits],
+                                     to_date)
+        now = int(time.time())
+        accrued = {}
+        for deposit, interest in zip(deposits, interests):
+            if interest <= 0:
+                continue
+            deposit.balance += interest
+            self._balance_changed(deposit, interest)
+            self._record_transaction(deposit.account_id, TransactionType.INTEREST, interest, now)
+            self._mark_dirty("deposits", deposit.deposit_id)
+            accrued[deposit.deposit_id] = interest
+        return accrued
+
+    @operation
     def close_deposit(self, deposit_id: str) -> bool:
         deposit = self.get_deposit(deposit_id)
         if not deposit or deposit.closed:
             return False
         balance = deposit.balance
+        self.stats.close(deposit)
         if hasattr(deposit, "close"):
             closed = deposit.close()
         else:
@@ -294,6 +996,7 @@ class FileDatabase:
             closed = True
         if not closed:
             return False
+        self.deposit_index.update(deposit)
         self.add_transaction(deposit.account_id, TransactionType.CLOSE, balance)
         account = self.get_account(deposit.account_id)
         if account:
@@ -301,6 +1004,6 @@ class FileDatabase:
                 account.close()
             else:
                 account.status = AccountStatus.CLOSED
-        self.save_deposits()
-        self.save_accounts()
+        self._mark_dirty("deposits", deposit_id)
+        self._mark_dirty("accounts", deposit.account_id)
         return True
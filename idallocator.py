@@ -0,0 +1,81 @@
+import threading
+from typing import Iterable
+
+from utils import read_file, write_to_file
+
+
+class IdAllocator:
+    """
+    Выдаёт монотонно растущие ID вида <префикс><номер> (C1, D2, T3...), отдельная последовательность
+    на каждый префикс. Номера резервируются блоками: в файл записывается только верхняя граница
+    блока, поэтому выдача ID не требует обращения к диску, а после перезапуска номера не повторяются
+    (неиспользованный остаток блока пропускается).
+
+    step и offset — выдавать только номера, дающие при делении на step остаток offset. Так части разделённого
+    хранилища (см. ShardedDatabase) выдают непересекающиеся ID, и по номеру ID видно, в какой части запись.
+    """
+
+    def __init__(self, file_path: str, block_size: int = 10_000, step: int = 1, offset: int = 0):
+        self.file_path = file_path
+        self.block_size = block_size
+        self.step = step
+        self.offset = offset
+        self._lock = threading.Lock()
+        # Следующий выдаваемый номер и граница зарезервированного блока (не включительно)
+        self._next: dict[str, int] = {}
+        self._limit: dict[str, int] = {}
+
+        for prefix, limit in read_file(file_path):
+            self._next[prefix] = self._limit[prefix] = int(limit)
+
+    def seed(self, prefix: str, existing_ids: Iterable[str]):
+        """
+        Для последовательности, которой ещё нет в файле, продолжает нумерацию после уже существующих ID
+        (например, выданных раньше случайным образом). Для известных последовательностей ничего не делает.
+        """
+        if prefix in self._limit:
+            return
+        top = 0
+        for existing_id in existing_ids:
+            number = existing_id[len(prefix):]
+            if existing_id.startswith(prefix) and number.isdigit():
+                top = max(top, int(number))
+        self._next[prefix] = top + 1
+
+    def allocate(self, prefix: str) -> str:
+        with self._lock:
+            number = self._align(self._next.get(prefix, 1))
+            if number >= self._limit.get(prefix, 0):
+                self._limit[prefix] = number + self.block_size * self.step
+                self._save()
+            self._next[prefix] = number + self.step
+        return f"{prefix}{number}"
+
+    def allocate_many(self, prefix: str, count: int) -> list[str]:
+        """
+        Выдаёт сразу count ID подряд — то же, что count вызовов allocate, но под одной блокировкой.
+        """
+        with self._lock:
+            first = self._align(self._next.get(prefix, 1))
+            end = first + count * self.step
+            if end - self.step >= self._limit.get(prefix, 0):
+                self._limit[prefix] = end - self.step + self.block_size * self.step
+                self._save()
+            self._next[prefix] = end
+        return [f"{prefix}{number}" for number in range(first, end, self.step)]
+
+    def _align(self, number: int) -> int:
+        # Ближайший номер не меньше number с нужным остатком
+        return number + (self.offset - number) % self.step
+
+    def close(self):
+        """
+        Возвращает неиспользованный остаток блоков, чтобы после штатного перезапуска нумерация шла без пропусков.
+        """
+        with self._lock:
+            self._limit.update(self._next)
+            self._save()
+
+    def _save(self):
+        # Зарезервированный блок должен оказаться на диске раньше, чем будут выданы его ID
+        write_to_file(self.file_path, [[prefix, str(limit)] for prefix, limit in self._limit.items()], sync=True)
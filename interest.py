@@ -0,0 +1,26 @@
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен: без него расчёт идёт на чистом Python
+    np = None
+
+
+SECONDS_PER_DAY = 86400
+DAYS_PER_YEAR = 365
+
+
+def compute_interest(balances: list[float],
+                     rates: list[float],
+                     open_dates: list[float],
+                     to_date: float) -> list[float]:
+    """
+    Проценты по набору вкладов за период от даты открытия до to_date — та же формула,
+    что и в Deposit.calculate_interest, но одним проходом по всем вкладам.
+    """
+    if np is not None:
+        balance = np.asarray(balances, dtype=np.float64)
+        rate = np.asarray(rates, dtype=np.float64)
+        year_fraction = (to_date - np.asarray(open_dates, dtype=np.float64)) / SECONDS_PER_DAY / DAYS_PER_YEAR
+        return (balance * rate * year_fraction / 100).tolist()
+
+    return [balance * rate * ((to_date - open_date) / SECONDS_PER_DAY / DAYS_PER_YEAR) / 100
+            for balance, rate, open_date in zip(balances, rates, open_dates)]
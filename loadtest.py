@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+
+from server import HOST, PORT
+
+
+class ServerError(Exception):
+    pass
+
+
+class BankClient:
+    """
+    Клиент протокола BankingServer. Запросы отправляются сразу, не дожидаясь ответов на предыдущие
+    (конвейер); ответы сопоставляются с запросами по id.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._ids = itertools.count()
+        self._pending: dict[int, asyncio.Future] = {}
+        self._receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, host: str = HOST, port: int = PORT) -> 'BankClient':
+        reader, writer = await asyncio.open_connection(host, port, limit=2 ** 24)
+        return cls(reader, writer)
+
+    async def call(self, op: str, **params):
+        request_id = next(self._ids)
+        future = self._pending[request_id] = asyncio.get_running_loop().create_future()
+        self._writer.write(json.dumps({"id": request_id, "op": op, "params": params}).encode() + b"\n")
+        await self._writer.drain()
+        return await future
+
+    async def _receive(self):
+        try:
+            while line := await self._reader.readline():
+                response = json.loads(line)
+                future = self._pending.pop(response["id"])
+                if "error" in response:
+                    future.set_exception(ServerError(response["error"]))
+                else:
+                    future.set_result(response["result"])
+        finally:
+            for future in self._pending.values():
+                future.set_exception(ConnectionError("Соединение с сервером закрыто"))
+            self._pending.clear()
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+        await asyncio.gather(self._receiver, return_exceptions=True)
+
+
+def percentile(values: list[float], q: float) -> float:
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+async def prepare_deposits(client: BankClient, count: int) -> list[str]:
+    # Отдельный клиент банка с count вкладами, на которых идёт нагрузка
+    name = f"Нагрузочный тест {time.time_ns()}"
+    await client.call("add_client", full_name=name)
+    client_id = (await client.call("search_clients", query=name, limit=1))[0]["client_id"]
+    await asyncio.gather(*(client.call("add_deposit", client_id=client_id, dep_type="DEMAND",
+                                       initial_balance=1_000_000.0, interest_rate=1.0) for _ in range(count)))
+    return [d["deposit_id"] for d in await client.call("get_client_deposits", client_id=client_id)]
+
+
+async def run_connection(host: str, port: int, deposits: list[str], requests: int, pipeline: int,
+                         read_share: float, latencies: list[float]) -> int:
+    client = await BankClient.connect(host, port)
+    window = asyncio.Semaphore(pipeline)
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        try:
+            deposit_id = random.choice(deposits)
+            start = time.perf_counter()
+            r = random.random()
+            try:
+                if r < read_share:
+                    await client.call("get_deposit", deposit_id=deposit_id)
+                elif r < (1 + read_share) / 2:
+                    await client.call("deposit_funds", deposit_id=deposit_id, amount=1.0)
+                else:
+                    await client.call("withdraw_funds", deposit_id=deposit_id, amount=1.0)
+            except ServerError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+        finally:
+            window.release()
+
+    tasks = []
+    for _ in range(requests):
+        await window.acquire()
+        tasks.append(asyncio.create_task(one()))
+    await asyncio.gather(*tasks)
+    await client.close()
+    return errors
+
+
+async def main(args):
+    setup = await BankClient.connect(args.host, args.port)
+    deposits = await prepare_deposits(setup, args.deposits)
+    await setup.close()
+
+    latencies: list[float] = []
+    start = time.perf_counter()
+    errors = await asyncio.gather(*(run_connection(args.host, args.port, deposits, args.requests, args.pipeline,
+                                                   args.read_share, latencies)
+                                    for _ in range(args.connections)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    total = len(latencies)
+    print(f"Соединений: {args.connections}, глубина конвейера: {args.pipeline}, запросов: {total}")
+    print(f"Время: {elapsed:.2f} с, операций в секунду: {total / elapsed:.0f}")
+    print(f"Задержка, мс: p50 {percentile(latencies, 0.5) * 1000:.2f}, p99 {percentile(latencies, 0.99) * 1000:.2f}, "
+          f"max {latencies[-1] * 1000 if latencies else 0:.2f}")
+    print(f"Ошибок: {sum(errors)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочный тест сервера BankingServer")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--connections", type=int, default=16, help="число одновременных соединений")
+    parser.add_argument("--requests", type=int, default=5000, help="запросов на соединение")
+    parser.add_argument("--pipeline", type=int, default=8, help="запросов в полёте на соединение")
+    parser.add_argument("--deposits", type=int, default=100, help="число вкладов, на которых идёт нагрузка")
+    parser.add_argument("--read-share", type=float, default=0.5, help="доля запросов на чтение")
+    asyncio.run(main(parser.parse_args()))
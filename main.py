@@ -1,6 +1,63 @@
 import asyncio
+import os
+import sys
 
+from bankingsystem import BankingSystem
+from deposit import DepositType
+from filedatabase import FileDatabase
+from server import HOST, PORT, serve
+from shardeddatabase import map_shards
 from userinterface import UserInterface
+from utils import parse_date
 
 if __name__ == "__main__":
-    asyncio.run(UserInterface().run())
\ No newline at end of file
+    if sys.argv[1:] == ["snapshot"]:
+        banking_system = BankingSystem()
+        banking_system.checkpoint()
+        banking_system.close()
+        print("Снимок данных создан.")
+    elif len(sys.argv) == 3 and sys.argv[1] == "import":
+        banking_system = BankingSystem()
+        print(banking_system.import_operations(sys.argv[2]), end="")
+        banking_system.close()
+    elif len(sys.argv) == 3 and sys.argv[1] == "accrue":
+        # python main.py accrue <дата>; разделённое хранилище обрабатывается по частям в отдельных процессах
+        to_date = parse_date(sys.argv[2])
+        if os.environ.get("BANK_STORAGE") == "sharded":
+            accrued = {}
+            for part in map_shards(os.environ.get("BANK_DATA_DIR", "data"), FileDatabase.accrue_interest, to_date):
+                accrued.update(part)
+        else:
+            banking_system = BankingSystem()
+            accrued = banking_system.accrue_interest(to_date)
+            banking_system.close()
+        print(f"Проценты начислены по {len(accrued)} вкладам на сумму {sum(accrued.values()):.2f}")
+    elif len(sys.argv) >= 4 and sys.argv[1] == "export":
+        # python main.py export <отчет> <файл> [параметры]; формат файла — по расширению (.txt, .csv, .jsonl)
+        report, file_path, params = sys.argv[2], sys.argv[3], sys.argv[4:]
+        if report == "deposit_type":
+            params = [DepositType.value_of(p) for p in params]
+        elif report == "top_deposits":
+            params = [DepositType.value_of(p) for p in params[:1]] + [int(p) for p in params[1:]]
+        elif report == "transaction":
+            params = params[:1] + [parse_date(p) for p in params[1:]]
+        elif report == "balance_as_of":
+            params = [parse_date(p) + 86400 - 1 for p in params]
+        banking_system = BankingSystem()
+        try:
+            print(f"Записано строк: {banking_system.export_report(file_path, report, *params)}")
+        finally:
+            banking_system.close()
+    elif sys.argv[1:2] == ["serve"]:
+        # python main.py serve [хост] [порт]
+        host = sys.argv[2] if len(sys.argv) > 2 else HOST
+        port = int(sys.argv[3]) if len(sys.argv) > 3 else PORT
+        banking_system = BankingSystem(background_writer=True)
+        try:
+            asyncio.run(serve(banking_system, host, port))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            banking_system.close()
+    else:
+        asyncio.run(UserInterface().run())
\ No newline at end of file
@@ -0,0 +1,122 @@
+from array import array
+from bisect import bisect_left
+from typing import Iterable
+
+from client import Client
+
+
+def normalize_name(name: str) -> str:
+    """
+    Приводит ФИО к виду для поиска: без учёта регистра, «ё» как «е», перед каждым словом — один пробел
+    (поиск по началу слова — это поиск подстроки, начинающейся с пробела).
+    """
+    return " " + " ".join(name.casefold().replace("ё", "е").split())
+
+
+def search_key(query: str, prefix: bool = False) -> str:
+    """
+    Строка, которую нужно найти в нормализованных ФИО: для prefix=True — начало любого слова.
+    """
+    key = normalize_name(query)
+    return key if prefix else key[1:]
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class NameIndex:
+    """
+    Триграммный индекс ФИО клиентов для поиска подстроки и начала слова без учёта регистра.
+    Кандидаты берутся из самого короткого списка среди триграмм запроса и проверяются по самому ФИО.
+    Запросы короче трёх символов (с учётом пробела для поиска по началу слова) проверяются перебором.
+    """
+
+    def __init__(self, clients: Iterable[Client] = ()):
+        # Номер документа -> нормализованное ФИО (None — клиент удалён) и ID клиента
+        self._names: list[str | None] = []
+        self._ids: list[str] = []
+        self._docs: dict[str, int] = {}
+        # Триграмма -> номера документов по возрастанию
+        self._postings: dict[str, array] = {}
+        for client in clients:
+            self.add(client.client_id, client.full_name)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, client_id: str, full_name: str):
+        """
+        Добавляет клиента или обновляет его ФИО.
+        """
+        self._add_normalized(client_id, normalize_name(full_name))
+
+    def _add_normalized(self, client_id: str, name: str):
+        doc = self._docs.get(client_id)
+        if doc is not None:
+            self._update(doc, name)
+            return
+        doc = len(self._names)
+        self._names.append(name)
+        self._ids.append(client_id)
+        self._docs[client_id] = doc
+        postings = self._postings
+        for gram in _trigrams(name):
+            docs = postings.get(gram)
+            if docs is None:
+                docs = postings[gram] = array('i')
+            docs.append(doc)
+
+    def _update(self, doc: int, name: str):
+        # Номер документа сохраняется, чтобы клиент остался на своём месте в результатах поиска.
+        # Триграммы старого ФИО не удаляются: лишние кандидаты отсеиваются проверкой по самому ФИО
+        postings = self._postings
+        for gram in _trigrams(name) - _trigrams(self._names[doc]):
+            docs = postings.get(gram)
+            if docs is None:
+                docs = postings[gram] = array('i')
+            i = bisect_left(docs, doc)
+            if i == len(docs) or docs[i] != doc:
+                docs.insert(i, doc)
+        self._names[doc] = name
+
+    def remove(self, client_id: str):
+        doc = self._docs.pop(client_id, None)
+        if doc is None:
+            return
+        self._names[doc] = None
+        # Удалённые документы остаются в списках триграмм; когда их становится больше, чем живых, индекс перестраивается
+        if len(self._names) > 2 * len(self._docs) + 1024:
+            self._rebuild()
+
+    def _rebuild(self):
+        live = [(client_id, self._names[doc]) for client_id, doc in sorted(self._docs.items(), key=lambda item: item[1])]
+        self._names, self._ids, self._docs, self._postings = [], [], {}, {}
+        for client_id, name in live:
+            self._add_normalized(client_id, name)
+
+    def search(self, query: str, limit: int | None = None, prefix: bool = False) -> list[str]:
+        """
+        ID клиентов, в ФИО которых есть query (prefix=True — слово, начинающееся с query),
+        в порядке добавления.
+        """
+        key = search_key(query, prefix)
+        if not key.strip():
+            return []
+        grams = _trigrams(key)
+        if grams:
+            postings = [self._postings.get(gram) for gram in grams]
+            if any(docs is None for docs in postings):
+                return []
+            candidates = min(postings, key=len)
+        else:
+            candidates = range(len(self._names))
+        names = self._names
+        found = []
+        for doc in candidates:
+            name = names[doc]
+            if name is not None and key in name:
+                found.append(self._ids[doc])
+                if limit is not None and len(found) >= limit:
+                    break
+        return found
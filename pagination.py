@@ -0,0 +1,44 @@
+import base64
+import binascii
+import json
+from typing import Generic, TypeVar
+
+
+T = TypeVar("T")
+
+# Размер страницы по умолчанию
+PAGE_SIZE = 20
+# Тип числового поля ключа в курсоре (дата или номер записи)
+NUMBER = (int, float)
+
+
+class Page(Generic[T]):
+    """
+    Страница результатов. next_cursor — токен для запроса следующей страницы (None, если страница последняя).
+    Токен указывает на последнюю выданную запись, поэтому добавление и удаление записей между запросами
+    не сдвигает страницы.
+    """
+    __slots__ = ("items", "next_cursor")
+
+    def __init__(self, items: list[T], next_cursor: str | None = None):
+        self.items = items
+        self.next_cursor = next_cursor
+
+
+def encode_cursor(*key) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor: str, *types) -> list:
+    """
+    types — типы полей ключа (str, int, NUMBER); курсор с другим числом полей или полем другого типа
+    отклоняется так же, как повреждённый.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, binascii.Error):
+        raise ValueError("Некорректный курсор страницы")
+    if not isinstance(key, list) or types and (
+            len(key) != len(types) or not all(isinstance(value, t) for value, t in zip(key, types))):
+        raise ValueError("Некорректный курсор страницы")
+    return key
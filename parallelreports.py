@@ -0,0 +1,85 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
+from deposit import DepositType
+from reportcache import REPORT_TABLES
+from reportexport import format_client_line, format_deposit_line
+
+
+# Минимальное число строк в шарде: меньшие отчёты быстрее сформировать без пересылки данных в другие процессы
+MIN_SHARD_SIZE = 20_000
+
+
+def _render_clients(rows: list[tuple]) -> str:
+    return "".join([format_client_line(*fields) for fields in rows])
+
+
+def _render_deposits(rows: list[tuple]) -> str:
+    return "".join([format_deposit_line(*fields) for fields in rows])
+
+
+class ReportEngine:
+    """
+    Формирует отчёты по всему портфелю в пуле процессов: строки таблицы делятся на шарды по порядку,
+    каждый шард форматируется в отдельном процессе, фрагменты склеиваются в исходном порядке.
+    Итоги отчётов берутся из сводных показателей хранилища (PortfolioStats) и не пересчитываются.
+    """
+
+    def __init__(self, banking_system, workers: int | None = None, min_shard_size: int = MIN_SHARD_SIZE):
+        self.banking_system = banking_system
+        self.workers = workers or os.cpu_count() or 1
+        self.min_shard_size = min_shard_size
+        self._executor: ProcessPoolExecutor | None = None
+
+    async def all_clients_report(self) -> str:
+        cache = self.banking_system.report_cache
+        key, tables = ("all_clients",), REPORT_TABLES["all_clients"]
+        report = cache.get(key, tables)
+        if report is None:
+            versions = cache.versions(tables)
+            fragments = await self._render(_render_clients, list(self.banking_system.all_clients_fields()))
+            report = "".join(self.banking_system.iter_all_clients_report(fragments))
+            cache.put(key, tables, report, versions)
+        return report
+
+    async def deposit_type_report(self, dep_type: DepositType) -> str:
+        cache = self.banking_system.report_cache
+        key, tables = ("deposit_type", dep_type), REPORT_TABLES["deposit_type"]
+        report = cache.get(key, tables)
+        if report is None:
+            versions = cache.versions(tables)
+            fragments = await self._render(_render_deposits, list(self.banking_system.deposit_type_fields(dep_type)))
+            report = "".join(self.banking_system.iter_deposit_type_report(dep_type, fragments))
+            cache.put(key, tables, report, versions)
+        return report
+
+    async def system_summary_report(self) -> str:
+        # Сводный отчёт строится из сводных показателей за O(1), делить его на шарды незачем
+        return self.banking_system.generate_system_summary_report()
+
+    async def _render(self, render: Callable[[list[tuple]], str], rows: list[tuple]) -> list[str]:
+        shards = self._split(rows)
+        if len(shards) <= 1:
+            return [render(shard) for shard in shards]
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        return list(await asyncio.gather(*(loop.run_in_executor(executor, render, shard) for shard in shards)))
+
+    def _split(self, rows: list[tuple]) -> list[list[tuple]]:
+        if not rows:
+            return []
+        count = max(1, min(self.workers, len(rows) // self.min_shard_size))
+        size = -(-len(rows) // count)
+        return [rows[i:i + size] for i in range(0, len(rows), size)]
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -0,0 +1,100 @@
+from typing import Iterable
+
+from deposit import Deposit, DepositType
+
+
+class ClientTotals:
+    """
+    Итоги по вкладам одного клиента: всего вкладов, из них активных, и баланс активных вкладов.
+    """
+    __slots__ = ("deposits", "active", "balance")
+
+    def __init__(self, deposits: int = 0, active: int = 0, balance: float = 0.0):
+        self.deposits = deposits
+        self.active = active
+        self.balance = balance
+
+
+class PortfolioStats:
+    """
+    Сводные показатели портфеля вкладов. Хранилище обновляет их за O(1) при каждом изменении вклада,
+    поэтому сводные отчёты не пересчитывают весь портфель.
+    """
+
+    def __init__(self, deposits: Iterable[Deposit] = ()):
+        self.clients = 0
+        self.accounts = 0
+        self.deposits = 0
+        self.closed = 0
+        # По типам вкладов — только активные (незакрытые) вклады
+        self.count: dict[DepositType, int] = dict.fromkeys(DepositType, 0)
+        self.balance: dict[DepositType, float] = dict.fromkeys(DepositType, 0.0)
+        self.rate_sum: dict[DepositType, float] = dict.fromkeys(DepositType, 0.0)
+        # Итоги по клиентам (только для клиентов, у которых есть вклады)
+        self.by_client: dict[str, ClientTotals] = {}
+        # Учтённые значения каждого вклада [клиент, тип, закрыт, баланс, ставка]: по ним вклад вычитается
+        # из показателей, даже если сам объект уже изменён
+        self._recorded: dict[str, list] = {}
+        for deposit in deposits:
+            self.add(deposit)
+
+    def add(self, deposit: Deposit):
+        values = [deposit.client_id, deposit.deposit_type, deposit.closed, deposit.balance, deposit.interest_rate]
+        self._recorded[deposit.deposit_id] = values
+        self._count(values, 1)
+
+    def remove(self, deposit: Deposit):
+        self._count(self._recorded.pop(deposit.deposit_id), -1)
+
+    def update(self, deposit: Deposit):
+        """
+        Учитывает вклад, изменённый на месте: вычитаются учтённые значения и добавляются текущие, за O(1).
+        """
+        self.remove(deposit)
+        self.add(deposit)
+
+    def _count(self, values: list, sign: int):
+        client_id, deposit_type, closed, balance, interest_rate = values
+        self.deposits += sign
+        totals = self.by_client.get(client_id)
+        if totals is None:
+            totals = self.by_client[client_id] = ClientTotals()
+        totals.deposits += sign
+        if not totals.deposits:
+            del self.by_client[client_id]
+        if closed:
+            self.closed += sign
+            return
+        self.count[deposit_type] += sign
+        self.balance[deposit_type] += sign * balance
+        self.rate_sum[deposit_type] += sign * interest_rate
+        totals.active += sign
+        totals.balance += sign * balance
+
+    def change_balance(self, deposit: Deposit, delta: float):
+        values = self._recorded[deposit.deposit_id]
+        if not values[2]:
+            values[3] += delta
+            self.balance[values[1]] += delta
+            self.by_client[values[0]].balance += delta
+
+    def close(self, deposit: Deposit):
+        """
+        Учитывает закрытие вклада; вызывается до того, как вклад помечен закрытым.
+        """
+        self.remove(deposit)
+        values = [deposit.client_id, deposit.deposit_type, True, deposit.balance, deposit.interest_rate]
+        self._recorded[deposit.deposit_id] = values
+        self._count(values, 1)
+
+    @property
+    def open_count(self) -> int:
+        return sum(self.count.values())
+
+    @property
+    def total_balance(self) -> float:
+        return sum(self.balance.values())
+
+    def average_rate(self, dep_type: DepositType) -> float:
+        count = self.count[dep_type]
+        return self.rate_sum[dep_type] / count if count else 0.0
@@ -0,0 +1,81 @@
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+
+# Ограничения кэша: число отчётов и их суммарный размер в символах
+MAX_ENTRIES = 256
+MAX_SIZE = 32 * 1024 * 1024
+# Выписки по счёту с большим числом операций не кэшируются: они выводятся по мере формирования
+# (см. BankingSystem.transaction_report_lines) и не должны оставаться в памяти целиком
+MAX_CACHED_STATEMENT_ROWS = 5000
+# Таблицы, от которых зависит каждый отчёт
+REPORT_TABLES = {
+    "client": ("clients", "deposits"),
+    "all_clients": ("clients", "deposits"),
+    "deposit_type": ("clients", "deposits"),
+    "top_deposits": ("clients", "deposits"),
+    "transaction": ("accounts", "transactions"),
+    "system_summary": ("clients", "deposits", "accounts"),
+    "balance_as_of": ("deposits", "transactions"),
+}
+
+
+class ReportCache:
+    """
+    LRU-кэш готовых отчётов по ключу (отчёт, параметры). Вместе с отчётом запоминаются версии таблиц,
+    из которых он построен (db.versions); если хоть одна таблица с тех пор изменилась, отчёт строится заново.
+    """
+
+    def __init__(self, db, max_entries: int = MAX_ENTRIES, max_size: int = MAX_SIZE):
+        self.db = db
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[tuple[int, ...], str]] = OrderedDict()
+
+    def versions(self, tables: tuple[str, ...]) -> tuple[int, ...]:
+        versions = self.db.versions
+        return tuple([versions[table] for table in tables])
+
+    def get(self, key: Hashable, tables: tuple[str, ...]) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != self.versions(tables):
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, tables: tuple[str, ...], report: str, versions: tuple[int, ...] | None = None):
+        """
+        versions — версии таблиц на момент начала построения отчёта; если таблицы с тех пор изменились,
+        отчёт мог их уже не учитывать, и он не кэшируется.
+        """
+        current = self.versions(tables)
+        if versions is not None and versions != current or len(report) > self.max_size:
+            return
+        self.discard(key)
+        self._entries[key] = (current, report)
+        self.size += len(report)
+        while len(self._entries) > self.max_entries or self.size > self.max_size:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def get_or_render(self, key: Hashable, tables: tuple[str, ...], render: Callable[[], str]) -> str:
+        report = self.get(key, tables)
+        if report is None:
+            versions = self.versions(tables)
+            report = render()
+            self.put(key, tables, report, versions)
+        return report
+
+    def discard(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
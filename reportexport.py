@@ -0,0 +1,72 @@
+import csv
+import json
+import sys
+import time
+from typing import IO, Iterable
+
+
+# Сколько строк отчёта накапливать перед записью в файл
+WRITE_CHUNK_LINES = 1000
+
+
+def format_client_line(client_id: str, full_name: str, active: int, balance: float) -> str:
+    return f"{client_id:5} | {full_name:30} | {active:14} | {balance:12.2f}\n"
+
+
+def format_deposit_line(deposit_id: str, client_name: str, open_date: float, balance: float, interest_rate: float) -> str:
+    return f"{deposit_id:5} | {client_name:30} | {time.strftime('%d.%m.%Y', time.localtime(open_date)):13} | {balance:12.2f} | {interest_rate:8.2f}\n"
+
+
+def write_report(lines: Iterable[str], sink: IO[str] | None = None) -> int:
+    """
+    Построчно записывает отчёт (см. BankingSystem.iter_*_report) в файл или в stdout, не собирая его целиком.
+    Возвращает число записанных строк.
+    """
+    sink = sink or sys.stdout
+    chunk = []
+    written = 0
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= WRITE_CHUNK_LINES:
+            sink.write("".join(chunk))
+            written += len(chunk)
+            chunk.clear()
+    if chunk:
+        sink.write("".join(chunk))
+        written += len(chunk)
+    return written
+
+
+def write_csv(rows: Iterable[dict], sink: IO[str] | None = None) -> int:
+    """
+    Записывает строки отчёта (см. BankingSystem.*_rows) в CSV с заголовком из ключей первой строки.
+    Файл нужно открывать с newline=''.
+    """
+    sink = sink or sys.stdout
+    writer = None
+    written = 0
+    for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(sink, fieldnames=list(row))
+            writer.writeheader()
+        writer.writerow(row)
+        written += 1
+    return written
+
+
+def write_jsonl(rows: Iterable[dict], sink: IO[str] | None = None) -> int:
+    """
+    Записывает строки отчёта в JSON Lines — по одному объекту на строку.
+    """
+    sink = sink or sys.stdout
+    written = 0
+    for row in rows:
+        sink.write(json.dumps(row, ensure_ascii=False) + "\n")
+        written += 1
+    return written
+
+
+WRITERS = {
+    "csv": write_csv,
+    "jsonl": write_jsonl,
+}
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import math
+from contextlib import ExitStack
+from enum import Enum
+
+from bankingsystem import BankingSystem
+from deposit import DepositType
+
+
+# Адрес по умолчанию
+HOST = "127.0.0.1"
+PORT = 7007
+# Сколько байт читать из соединения за раз и предельный размер одного запроса
+READ_CHUNK = 64 * 1024
+MAX_REQUEST_SIZE = 1024 * 1024
+
+# Операции BankingSystem, доступные по сети (параметры запроса передаются в метод по именам)
+OPERATIONS = frozenset((
+    "add_client", "update_client", "delete_client", "get_client", "count_clients", "get_clients_page",
+    "search_clients", "get_client_totals", "get_client_deposits",
+    "add_deposit", "deposit_funds", "withdraw_funds", "transfer", "calculate_interest", "accrue_interest", "close_deposit",
+    "get_deposit", "find_deposits", "get_deposit_balance_as_of",
+    "get_account", "get_deposit_account", "get_account_transactions_page", "get_transactions_page",
+    "generate_client_report", "generate_transaction_report", "generate_system_summary_report",
+    "generate_balance_as_of_report", "generate_top_deposits_report",
+))
+# Отчёты по всему портфелю формируются в пуле процессов (см. ReportEngine) и ожидаются асинхронно
+ASYNC_OPERATIONS = {
+    "generate_all_clients_report": lambda bs: bs.reports.all_clients_report(),
+    "generate_deposit_type_report": lambda bs, dep_type: bs.reports.deposit_type_report(dep_type),
+}
+# Параметры, которые передаются строкой и преобразуются перед вызовом
+PARAM_PARSERS = {
+    "dep_type": DepositType.value_of,
+    "deposit_type": DepositType.value_of,
+}
+
+
+def to_json(value):
+    """
+    Преобразует результат операции (модели, страницы, перечисления, списки) в значение для JSON.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Enum):
+        return str(value)
+    if isinstance(value, dict):
+        return {str(key) if isinstance(key, Enum) else key: to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+    slots = getattr(type(value), "__slots__", None)
+    if slots is not None:
+        return {name: to_json(getattr(value, name)) for name in slots}
+    raise TypeError(f"Нельзя передать значение типа {type(value).__name__}")
+
+
+class BankingServer:
+    """
+    Сетевой доступ к BankingSystem по протоколу JSON Lines: каждый запрос — строка
+    {"id": ..., "op": "<операция>", "params": {...}}, ответ — строка {"id": ..., "result": ...}
+    или {"id": ..., "error": "<сообщение>"}. Ответы приходят в порядке запросов.
+
+    Клиент может отправлять запросы, не дожидаясь ответов. Все запросы, прочитанные из соединения за раз,
+    выполняются подряд и сохраняются одним групповым коммитом; ответы отправляются, когда коммит записан
+    на диск (с фоновой записью цикл событий в это время обслуживает другие соединения).
+    Операции выполняются в потоке цикла событий без переключений между ними, поэтому соединения
+    работают с общим хранилищем без блокировок.
+    """
+
+    def __init__(self, banking_system: BankingSystem, host: str = HOST, port: int = PORT):
+        self.banking_system = banking_system
+        self.host = host
+        self.port = port
+        self.connections = 0
+        self.requests = 0
+        self._server: asyncio.Server | None = None
+
+    async def start(self) -> asyncio.Server:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        return self._server
+
+    async def serve_forever(self):
+        server = self._server or await self.start()
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        buffer = b""
+        try:
+            while True:
+                chunk = await reader.read(READ_CHUNK)
+                if not chunk:
+                    break
+                *lines, buffer = (buffer + chunk).split(b"\n")
+                if lines:
+                    responses = await self.execute(lines)
+                    # Ответ отправляется, когда изменения запросов записаны на диск
+                    await self.banking_system.wait_durable()
+                    writer.write(b"".join(responses))
+                if len(buffer) > MAX_REQUEST_SIZE:
+                    writer.write(_encode({"id": None, "error": "Слишком длинный запрос"}))
+                    break
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def execute(self, lines: list[bytes]) -> list[bytes]:
+        """
+        Выполняет запросы по порядку и возвращает закодированные ответы. Синхронные операции идут одним
+        пакетом хранилища; перед асинхронной операцией пакет сохраняется, чтобы она видела его результат
+        и чтобы пакет не оставался открытым, пока цикл событий обслуживает другие соединения.
+        """
+        responses = []
+        batch: ExitStack | None = None
+        try:
+            for line in lines:
+                if not line.strip():
+                    continue
+                self.requests += 1
+                request_id = None
+                try:
+                    request = json.loads(line, parse_float=_parse_float, parse_constant=_parse_constant)
+                    if not isinstance(request, dict):
+                        raise ValueError("Запрос должен быть объектом JSON")
+                    request_id = request.get("id")
+                    name, params = request.get("op"), _parse_params(request.get("params"))
+                    if name in ASYNC_OPERATIONS:
+                        if batch is not None:
+                            batch.close()
+                            batch = None
+                        result = await ASYNC_OPERATIONS[name](self.banking_system, **params)
+                    elif name in OPERATIONS:
+                        if batch is None:
+                            batch = ExitStack()
+                            batch.enter_context(self.banking_system.batch())
+                        result = getattr(self.banking_system, name)(**params)
+                    else:
+                        raise ValueError(f"Неизвестная операция: {name}")
+                    responses.append(_encode({"id": request_id, "result": to_json(result)}))
+                except (ValueError, TypeError, KeyError) as e:
+                    responses.append(_encode({"id": request_id, "error": str(e)}))
+                except Exception as e:
+                    # Сбой одной операции не должен обрывать остальные запросы пакета и соединение
+                    error = f"Внутренняя ошибка: {type(e).__name__}: {e}"
+                    responses.append(_encode({"id": request_id, "error": error}))
+        finally:
+            if batch is not None:
+                batch.close()
+        return responses
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+
+def _parse_params(params) -> dict:
+    if params is None:
+        return {}
+    if not isinstance(params, dict):
+        raise ValueError("Параметры запроса должны быть объектом JSON")
+    return {name: PARAM_PARSERS[name](value) if name in PARAM_PARSERS and value is not None else value
+            for name, value in params.items()}
+
+
+def _parse_float(text: str) -> float:
+    # NaN, Infinity и числа вне диапазона float (1e999) испортили бы балансы вкладов
+    value = float(text)
+    if not math.isfinite(value):
+        raise ValueError(f"Недопустимое число: {text}")
+    return value
+
+
+def _parse_constant(name: str):
+    raise ValueError(f"Недопустимое число: {name}")
+
+
+def _encode(response: dict) -> bytes:
+    return json.dumps(response, ensure_ascii=False).encode() + b"\n"
+
+
+async def serve(banking_system: BankingSystem, host: str = HOST, port: int = PORT):
+    server = BankingServer(banking_system, host, port)
+    await server.start()
+    print(f"Сервер слушает {host}:{port}")
+    await server.serve_forever()
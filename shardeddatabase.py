@@ -0,0 +1,471 @@
+import heapq
+import os
+import threading
+import time
+import zlib
+from bisect import bisect_right
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from itertools import islice
+from typing import Callable, Iterator
+
+from account import Account
+from client import Client
+from deposit import Deposit, DepositType
+from depositquery import DepositQuery
+from durability import Durability
+from filedatabase import FileDatabase
+from idallocator import IdAllocator
+from pagination import Page, encode_cursor, decode_cursor
+from portfoliostats import ClientTotals, PortfolioStats
+from transaction import BALANCE_SIGN, Transaction, TransactionType
+from utils import append_to_file, read_file, write_to_file
+from writer import gather_futures
+
+
+# Число частей нового разделённого хранилища, если оно не задано
+DEFAULT_SHARDS = 4
+
+
+def id_number(entity_id: str) -> int:
+    # Номер ID вида <префикс><номер>; у ID другого вида — 0
+    number = entity_id[1:]
+    return int(number) if number.isdigit() else 0
+
+
+def shard_dir(data_dir: str, index: int) -> str:
+    return f"{data_dir}/shard-{index}"
+
+
+def transfers_file(data_dir: str) -> str:
+    return f"{data_dir}/transfers.csv"
+
+
+def read_layout(data_dir: str) -> int | None:
+    """
+    Число частей, на которые разделён каталог данных, или None, если каталог не разделён.
+    """
+    rows = read_file(f"{data_dir}/shards.csv")
+    return int(rows[0][0]) if rows else None
+
+
+def open_shard(data_dir: str, index: int, count: int, **options) -> FileDatabase:
+    """
+    Открывает одну часть разделённого хранилища — обычный FileDatabase в своём каталоге. Часть выдаёт
+    номера ID вкладов, счетов и транзакций с остатком index по модулю count, поэтому по ID видно её номер.
+    """
+    return FileDatabase(shard_dir(data_dir, index), id_step=count, id_offset=index, **options)
+
+
+class ShardedDatabase:
+    """
+    Хранилище, разделённое на count частей (шардов): клиент вместе со своими вкладами, счетами и транзакциями
+    хранится в части crc32(client_id) % count, каждая часть — независимый FileDatabase в каталоге shard-<номер>.
+    Операции с клиентом, вкладом, счётом отправляются в одну часть (часть вклада, счёта или транзакции — номер
+    ID по модулю count), отчёты по всему банку собираются из всех частей.
+
+    Каждая часть сохраняет только свои файлы: операция переписывает таблицы одной части, а не всего банка.
+    Части открываются и закрываются параллельно; map_shards обрабатывает части в отдельных процессах.
+    Пакет (batch) захватывает все части и сохраняет каждую одним коммитом. Перевод между вкладами разных
+    частей сохраняется коммитами этих частей, поэтому до них его транзакции и балансы вкладов после них
+    записываются в журнал переводов (transfers.csv): если после сбоя какой-то части не хватает своей стороны
+    перевода или её балансов, они восстанавливаются из журнала при следующем открытии хранилища. Журнал
+    очищается, когда коммиты частей после записанных в него переводов оказались на диске, и при закрытии.
+    """
+
+    def __init__(self, data_dir: str, shards: int | None = None, **options):
+        # Журнал переводов синхронизируется с диском, только если части синхронизируют каждый коммит
+        self.sync_transfers = options.get("durability", Durability.ALWAYS) == Durability.ALWAYS
+        os.makedirs(data_dir, exist_ok=True)
+        count = read_layout(data_dir)
+        if count is None:
+            if os.path.exists(f"{data_dir}/clients.csv"):
+                raise ValueError(f"Каталог {data_dir} содержит неразделённые данные")
+            count = shards or DEFAULT_SHARDS
+            write_to_file(f"{data_dir}/shards.csv", [[str(count)]], sync=True)
+        elif shards is not None and shards != count:
+            raise ValueError(f"Каталог {data_dir} разделён на части: {count}, а не {shards}")
+        self.data_dir = data_dir
+        self.count = count
+        with ThreadPoolExecutor(count) as pool:
+            self.shards: list[FileDatabase] = list(pool.map(
+                lambda index: open_shard(data_dir, index, count, **options), range(count)))
+        # ID клиентов выдаются здесь: по ID выбирается часть, в которой клиент будет храниться
+        self.ids = IdAllocator(f"{data_dir}/sequences.csv")
+        self.ids.seed("C", (c.client_id for shard in self.shards for c in shard.clients))
+        self.transfers_file = transfers_file(data_dir)
+        # Число дозаписей журнала переводов и номер последней из них, после которой журнал очищен
+        self._transfers_lock = threading.Lock()
+        self._transfers_logged = 0
+        self._transfers_cleared = 0
+        self._replay_transfers()
+
+    def shard_of_client(self, client_id: str) -> FileDatabase:
+        # crc32, а не hash(): номер части не зависит от PYTHONHASHSEED
+        return self.shards[zlib.crc32(client_id.encode()) % self.count]
+
+    def shard_of_id(self, entity_id: str) -> FileDatabase:
+        # ID не из этого хранилища не найдётся ни в одной части — его можно искать в любой
+        return self.shards[id_number(entity_id) % self.count]
+
+    def _each(self, method: str, *args) -> list:
+        with ThreadPoolExecutor(self.count) as pool:
+            return list(pool.map(lambda shard: getattr(shard, method)(*args), self.shards))
+
+    # Сохранение
+    @property
+    def versions(self) -> dict[str, int]:
+        # Сумма версий частей растёт при любом изменении таблицы в любой части
+        versions = dict.fromkeys(FileDatabase.TABLES, 0)
+        for shard in self.shards:
+            for table, version in shard.versions.items():
+                versions[table] += version
+        return versions
+
+    def flush(self):
+        for shard in self.shards:
+            shard.flush()
+
+    @contextmanager
+    def batch(self):
+        # Части захватываются всегда в одном порядке, поэтому пакеты из разных потоков не блокируют друг друга
+        with ExitStack() as stack:
+            for shard in self.shards:
+                stack.enter_context(shard.batch())
+            try:
+                yield self
+            finally:
+                # Части сохраняют изменения при выходе из внешнего пакета, а не вложенного
+                outermost = all(shard._batch_depth == 1 for shard in self.shards)
+        if outermost:
+            self._clear_transfers_when_durable()
+
+    def durable(self) -> Future:
+        return gather_futures([shard.durable() for shard in self.shards])
+
+    def checkpoint(self):
+        self._each("checkpoint")
+
+    def close(self):
+        self._each("close")
+        self.ids.close()
+        # Все части записаны на диск — стороны переводов из журнала больше не потеряются
+        write_to_file(self.transfers_file, [], sync=self.sync_transfers)
+
+    def _clear_transfers_when_durable(self):
+        with self._transfers_lock:
+            logged = self._transfers_logged
+            if logged == self._transfers_cleared:
+                return
+        self.durable().add_done_callback(lambda durable: self._clear_transfers(logged, durable))
+
+    def _clear_transfers(self, logged: int, durable: Future):
+        if durable.exception() is not None:
+            return
+        with self._transfers_lock:
+            # Переводы, дописанные в журнал позже, ещё могут быть не записаны частями
+            if logged == self._transfers_logged and logged != self._transfers_cleared:
+                write_to_file(self.transfers_file, [], sync=self.sync_transfers)
+                self._transfers_cleared = logged
+
+    def _replay_transfers(self):
+        """
+        Восстанавливает в частях переводы из журнала после сбоя: дописывает транзакции, которых в части нет
+        (сбой между коммитами частей), и выставляет балансы вкладов по журналу, даже если транзакция есть
+        (коммит части дописывает журнал транзакций и переписывает deposits.csv отдельными записями, и сбой
+        мог прийти между ними). Баланс вклада — записанный в журнал баланс после его последней стороны
+        перевода плюс транзакции его счёта, проведённые в части после неё. Затем журнал очищается.
+        """
+        rows = read_file(self.transfers_file)
+        if not rows:
+            return
+        # Номер части -> записи журнала (транзакция, ID вклада, баланс вклада после неё) в порядке журнала
+        logged: dict[int, list[tuple[Transaction, str, float]]] = {}
+        for row in rows:
+            logged.setdefault(id_number(row[5]) % self.count, []).append(
+                (Transaction.deserialize(row[:5]), row[5], float(row[6])))
+        for index, entries in logged.items():
+            shard = self.shards[index]
+            store = shard.transactions
+            wanted = {id_number(transaction.transaction_id) for transaction, _, _ in entries}
+            # Номер ID транзакции журнала -> её позиция в части; записи переводов — в конце, поиск идёт с конца
+            positions = {}
+            for position in range(len(store) - 1, -1, -1):
+                if len(positions) == len(wanted):
+                    break
+                if store.ids[position] in wanted:
+                    positions[store.ids[position]] = position
+            missing = [transaction for transaction, _, _ in entries
+                       if id_number(transaction.transaction_id) not in positions]
+            last = {deposit_id: (transaction, balance) for transaction, deposit_id, balance in entries}
+            balances = {}
+            for deposit_id, (transaction, balance) in last.items():
+                deposit = shard.get_deposit(deposit_id)
+                if deposit is None:
+                    continue
+                position = positions.get(id_number(transaction.transaction_id))
+                if position is not None:
+                    accounts = {transaction.account_id, deposit.account_id}
+                    for row in range(position + 1, len(store)):
+                        later = store[row]
+                        if later.account_id in accounts:
+                            balance += BALANCE_SIGN[later.transaction_type] * later.amount
+                if balance != deposit.balance:
+                    balances[deposit_id] = balance
+            if not missing and not balances:
+                continue
+            shard.post_transactions(missing, balances)
+            shard.flush()
+            shard.durable().result()
+        write_to_file(self.transfers_file, [], sync=self.sync_transfers)
+
+    # Клиенты
+    @property
+    def clients(self) -> list[Client]:
+        # В каждой части клиенты идут по возрастанию номера ID, то есть в порядке добавления
+        return list(heapq.merge(*(shard.clients for shard in self.shards), key=lambda c: id_number(c.client_id)))
+
+    def get_client(self, client_id: str) -> Client:
+        return self.shard_of_client(client_id).get_client(client_id)
+
+    def count_clients(self) -> int:
+        return sum(shard.count_clients() for shard in self.shards)
+
+    def search_clients(self, query: str, limit: int | None = None, prefix: bool = False) -> list[Client]:
+        found = heapq.merge(*(shard.search_clients(query, limit, prefix) for shard in self.shards),
+                            key=lambda c: id_number(c.client_id))
+        return list(islice(found, limit))
+
+    def clients_page(self, limit: int, cursor: str | None = None) -> Page[Client]:
+        # Ключ страницы — номер ID последнего клиента: в каждой части продолжение находится двоичным поиском
+        after = 0 if cursor is None else decode_cursor(cursor, int)[0]
+        order = lambda c: id_number(c.client_id)
+        starts = [bisect_right(shard.clients, after, key=order) for shard in self.shards]
+        items = list(islice(heapq.merge(*(shard.clients[start:start + limit]
+                                          for shard, start in zip(self.shards, starts)), key=order), limit))
+        remaining = sum(len(shard.clients) - start for shard, start in zip(self.shards, starts))
+        next_cursor = encode_cursor(order(items[-1])) if items and remaining > limit else None
+        return Page(items, next_cursor)
+
+    def add_client(self, full_name: str) -> bool:
+        if not full_name:
+            return False
+        client_id = self.ids.allocate("C")
+        return self.shard_of_client(client_id).add_client(full_name, client_id)
+
+    def update_client(self, client: Client) -> bool:
+        return self.shard_of_client(client.client_id).update_client(client)
+
+    def delete_client(self, client_id: str) -> bool:
+        return self.shard_of_client(client_id).delete_client(client_id)
+
+    def client_totals(self, client_id: str) -> ClientTotals:
+        return self.shard_of_client(client_id).client_totals(client_id)
+
+    def clients_with_totals(self) -> Iterator[tuple[Client, ClientTotals]]:
+        return heapq.merge(*(shard.clients_with_totals() for shard in self.shards),
+                           key=lambda item: id_number(item[0].client_id))
+
+    def portfolio_stats(self) -> PortfolioStats:
+        # Итоги по клиентам (by_client) не собираются: они есть в части клиента, см. client_totals
+        stats = PortfolioStats()
+        for shard in self.shards:
+            part = shard.portfolio_stats()
+            stats.clients += part.clients
+            stats.accounts += part.accounts
+            stats.deposits += part.deposits
+            stats.closed += part.closed
+            for dep_type in DepositType:
+                stats.count[dep_type] += part.count[dep_type]
+                stats.balance[dep_type] += part.balance[dep_type]
+                stats.rate_sum[dep_type] += part.rate_sum[dep_type]
+        return stats
+
+    # Вклады
+    @property
+    def deposits(self) -> list[Deposit]:
+        return list(heapq.merge(*(shard.deposits for shard in self.shards), key=lambda d: id_number(d.deposit_id)))
+
+    def get_deposit(self, deposit_id: str) -> Deposit:
+        return self.shard_of_id(deposit_id).get_deposit(deposit_id)
+
+    def get_client_deposits(self, client_id: str) -> list:
+        return self.shard_of_client(client_id).get_client_deposits(client_id)
+
+    def add_deposit(self, client_id: str, dep_type: DepositType, initial_balance: float, interest_rate: float) -> bool:
+        return self.shard_of_client(client_id).add_deposit(client_id, dep_type, initial_balance, interest_rate)
+
+    def query_deposits(self, query: DepositQuery) -> list[Deposit]:
+        if query.client_id is not None:
+            return self.shard_of_client(query.client_id).query_deposits(query)
+        # Каждая часть отбирает вклады по своим индексам (с тем же limit), итог — тот же запрос по их объединению
+        found = [d for shard in self.shards for d in shard.query_deposits(query)]
+        found.sort(key=lambda d: id_number(d.deposit_id))
+        return query.apply(found)
+
+    def iter_open_deposits(self, dep_type: DepositType) -> Iterator[Deposit]:
+        return iter(self.query_deposits(DepositQuery(deposit_type=dep_type, closed=False)))
+
+    def deposit_funds(self, deposit_id: str, amount: float) -> bool:
+        return self.shard_of_id(deposit_id).deposit_funds(deposit_id, amount)
+
+    def withdraw_funds(self, deposit_id: str, amount: float) -> bool:
+        return self.shard_of_id(deposit_id).withdraw_funds(deposit_id, amount)
+
+    def post_transfers(self, legs: list[tuple[Deposit, Deposit, float]], balances: dict[str, float]):
+        # Каждая часть записывает транзакции своих вкладов: ID выдаёт часть, дата — общая для пакета
+        now = int(time.time())
+        sides: dict[int, list[tuple[Deposit, TransactionType, float]]] = {}
+        for source, target, amount in legs:
+            for deposit, tx_type in ((source, TransactionType.WITHDRAW), (target, TransactionType.DEPOSIT)):
+                sides.setdefault(id_number(deposit.deposit_id) % self.count, []).append((deposit, tx_type, amount))
+        parts: dict[int, tuple[list[Transaction], dict]] = {}
+        logged = []
+        # Баланс вклада после каждой стороны перевода
+        running: dict[str, float] = {}
+        for index, shard_sides in sides.items():
+            transaction_ids = self.shards[index].generate_transaction_ids(len(shard_sides))
+            transactions = parts.setdefault(index, ([], {}))[0]
+            for transaction_id, (deposit, tx_type, amount) in zip(transaction_ids, shard_sides):
+                transaction = Transaction(transaction_id, now, tx_type, amount, deposit.account_id)
+                transactions.append(transaction)
+                balance = running[deposit.deposit_id] = \
+                    running.get(deposit.deposit_id, deposit.balance) + BALANCE_SIGN[tx_type] * amount
+                logged.append(transaction.serialize() + [deposit.deposit_id, str(balance)])
+        for deposit_id, balance in balances.items():
+            parts[id_number(deposit_id) % self.count][1][deposit_id] = balance
+        if len(parts) > 1:
+            # Журнал пишется до коммитов частей: после сбоя между ними или внутри коммита части
+            # недостающие транзакции и балансы восстановятся
+            with self._transfers_lock:
+                append_to_file(self.transfers_file, logged, sync=self.sync_transfers)
+                self._transfers_logged += 1
+        with self.batch():
+            for index, (transactions, shard_balances) in parts.items():
+                self.shards[index].post_transactions(transactions, shard_balances)
+
+    def post_operations(self, postings: list[tuple[Deposit, TransactionType, float]], balances: dict[str, float]):
+        parts: dict[int, tuple[list, dict]] = {}
+        for posting in postings:
+            parts.setdefault(id_number(posting[0].deposit_id) % self.count, ([], {}))[0].append(posting)
+        for deposit_id, balance in balances.items():
+            parts[id_number(deposit_id) % self.count][1][deposit_id] = balance
+        with self.batch():
+            for index, (shard_postings, shard_balances) in parts.items():
+                self.shards[index].post_operations(shard_postings, shard_balances)
+
+    def calculate_and_add_interest(self, deposit_id: str, to_date: float) -> bool:
+        return self.shard_of_id(deposit_id).calculate_and_add_interest(deposit_id, to_date)
+
+    def accrue_interest(self, to_date: float, dep_type: DepositType | None = None) -> dict[str, float]:
+        accrued = {}
+        with self.batch():
+            for shard in self.shards:
+                accrued.update(shard.accrue_interest(to_date, dep_type))
+        return accrued
+
+    def close_deposit(self, deposit_id: str) -> bool:
+        return self.shard_of_id(deposit_id).close_deposit(deposit_id)
+
+    # Счета
+    def get_account(self, account_id: str) -> Account:
+        return self.shard_of_id(account_id).get_account(account_id)
+
+    def get_deposit_account(self, deposit_id: str) -> Account | None:
+        return self.shard_of_id(deposit_id).get_deposit_account(deposit_id)
+
+    # Транзакции
+    def get_account_transactions(self, account_id: str) -> list:
+        return self.shard_of_id(account_id).get_account_transactions(account_id)
+
+    def query_account_transactions(self,
+                                   account_id: str,
+                                   from_date: float | None = None,
+                                   to_date: float | None = None,
+                                   reverse: bool = True,
+                                   limit: int | None = None) -> list:
+        return self.shard_of_id(account_id).query_account_transactions(account_id, from_date, to_date, reverse, limit)
+
+    def account_transactions_page(self,
+                                  account_id: str,
+                                  limit: int,
+                                  cursor: str | None = None,
+                                  from_date: float | None = None,
+                                  to_date: float | None = None,
+                                  reverse: bool = True) -> Page[Transaction]:
+        return self.shard_of_id(account_id).account_transactions_page(account_id, limit, cursor, from_date, to_date,
+                                                                      reverse)
+
+    def transactions_page(self, limit: int, cursor: str | None = None) -> Page[Transaction]:
+        """
+        Страница всех транзакций, новые — первыми. Курсор хранит для каждой части число ещё не выданных записей.
+        """
+        stores = [shard.transactions for shard in self.shards]
+        if cursor is None:
+            stops = [len(store) for store in stores]
+        else:
+            stops = decode_cursor(cursor, *[int] * self.count)
+            stops = [min(len(store), stop) for store, stop in zip(stores, stops)]
+
+        def newest(index: int) -> Iterator[tuple[tuple[float, int], int, int]]:
+            dates = stores[index].dates
+            for row in range(stops[index] - 1, max(0, stops[index] - limit) - 1, -1):
+                yield (dates[row], index), index, row
+
+        items = []
+        for _, index, row in islice(heapq.merge(*(newest(i) for i in range(self.count)), reverse=True), limit):
+            items.append(stores[index][row])
+            stops[index] = row
+        return Page(items, encode_cursor(*stops) if any(stops) else None)
+
+    def count_account_transactions(self,
+                                   account_id: str,
+                                   from_date: float | None = None,
+                                   to_date: float | None = None) -> int:
+        return self.shard_of_id(account_id).count_account_transactions(account_id, from_date, to_date)
+
+    def iter_account_transactions(self,
+                                  account_id: str,
+                                  from_date: float | None = None,
+                                  to_date: float | None = None,
+                                  reverse: bool = True) -> Iterator[Transaction]:
+        return self.shard_of_id(account_id).iter_account_transactions(account_id, from_date, to_date, reverse)
+
+    def balance_as_of(self, account_id: str, date: float) -> float:
+        return self.shard_of_id(account_id).balance_as_of(account_id, date)
+
+    def deposit_balance_as_of(self, deposit_id: str, date: float) -> float | None:
+        return self.shard_of_id(deposit_id).deposit_balance_as_of(deposit_id, date)
+
+    def book_balance_as_of(self, date: float) -> dict[DepositType, float]:
+        balance = dict.fromkeys(DepositType, 0.0)
+        for shard in self.shards:
+            for dep_type, amount in shard.book_balance_as_of(date).items():
+                balance[dep_type] += amount
+        return balance
+
+
+def _process_shard(data_dir: str, index: int, count: int, options: dict, fn: Callable, args: tuple):
+    db = open_shard(data_dir, index, count, **options)
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+def map_shards(data_dir: str, fn: Callable, *args, workers: int | None = None, **options) -> list:
+    """
+    Выполняет fn(db, *args) для каждой части разделённого хранилища в отдельном процессе: процесс сам загружает
+    свою часть, выполняет fn и сохраняет результат. Возвращает результаты в порядке частей. Хранилище в это время
+    не должно быть открыто другими процессами (например, сервером). fn и результаты должны сериализоваться pickle
+    (например, FileDatabase.accrue_interest).
+    """
+    count = read_layout(data_dir)
+    if count is None:
+        raise ValueError(f"Каталог {data_dir} не разделён на части")
+    if read_file(transfers_file(data_dir)):
+        # После сбоя части сначала дописывают недостающие стороны переводов из журнала
+        ShardedDatabase(data_dir, **options).close()
+    with ProcessPoolExecutor(max_workers=min(count, workers or os.cpu_count() or 1)) as pool:
+        futures = [pool.submit(_process_shard, data_dir, index, count, options, fn, args) for index in range(count)]
+        return [future.result() for future in futures]
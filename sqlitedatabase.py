@@ -0,0 +1,770 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Iterator
+
+from account import Account, AccountStatus, AccountCategory
+from client import Client
+from deposit import Deposit, DepositType
+from depositquery import DepositQuery, ORDER_FIELDS
+from durability import Durability
+from filedatabase import operation
+from idallocator import IdAllocator
+from interest import compute_interest
+from namesearch import normalize_name, search_key
+from pagination import NUMBER, Page, encode_cursor, decode_cursor
+from portfoliostats import ClientTotals, PortfolioStats
+from transaction import Transaction, TransactionType
+from writer import done_future
+
+
+# Политика синхронизации -> PRAGMA synchronous. В режиме WAL при NORMAL журнал синхронизируется только
+# при контрольных точках SQLite (по размеру журнала, а не по времени), при OFF — никогда
+SYNCHRONOUS = {
+    Durability.ALWAYS: "FULL",
+    Durability.INTERVAL: "NORMAL",
+    Durability.OS: "OFF",
+}
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clients (
+    client_id TEXT PRIMARY KEY,
+    full_name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS accounts (
+    account_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    open_date REAL NOT NULL,
+    close_date REAL NOT NULL,
+    category TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS deposits (
+    deposit_id TEXT PRIMARY KEY,
+    deposit_type TEXT NOT NULL,
+    open_date REAL NOT NULL,
+    balance REAL NOT NULL,
+    interest_rate REAL NOT NULL,
+    closed INTEGER NOT NULL,
+    client_id TEXT NOT NULL,
+    account_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS deposits_client ON deposits (client_id);
+CREATE INDEX IF NOT EXISTS deposits_account ON deposits (account_id);
+DROP INDEX IF EXISTS deposits_type;
+CREATE INDEX IF NOT EXISTS deposits_type_balance ON deposits (deposit_type, closed, balance);
+CREATE INDEX IF NOT EXISTS deposits_type_open_date ON deposits (deposit_type, closed, open_date);
+CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id TEXT PRIMARY KEY,
+    date REAL NOT NULL,
+    transaction_type TEXT NOT NULL,
+    amount REAL NOT NULL,
+    account_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_account_date ON transactions (account_id, date);
+-- Все счета, которые были у каждого вклада (счёт вклада меняет add_account), в том числе у удалённых вкладов
+CREATE TABLE IF NOT EXISTS deposit_accounts (
+    account_id TEXT PRIMARY KEY,
+    deposit_id TEXT NOT NULL,
+    deposit_type TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS deposit_accounts_deposit ON deposit_accounts (deposit_id);
+"""
+
+# Номер месяца по дате транзакции (год * 12 + месяц - 1, по местному времени) и сумма со знаком (см. BALANCE_SIGN)
+PERIOD_SQL = ("(CAST(strftime('%Y', {date}, 'unixepoch', 'localtime') AS INTEGER) * 12"
+              " + CAST(strftime('%m', {date}, 'unixepoch', 'localtime') AS INTEGER) - 1)")
+SIGNED_SQL = "(CASE WHEN {type} IN ('WITHDRAW', 'CLOSE') THEN -{amount} ELSE {amount} END)"
+# Баланс каждого счёта на конец каждого месяца, в котором были операции; поддерживается триггером
+# при добавлении транзакций
+CHECKPOINTS_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS balance_checkpoints (
+    account_id TEXT NOT NULL,
+    period INTEGER NOT NULL,
+    balance REAL NOT NULL,
+    PRIMARY KEY (account_id, period)
+);
+CREATE TRIGGER IF NOT EXISTS transactions_checkpoint AFTER INSERT ON transactions BEGIN
+    INSERT OR IGNORE INTO balance_checkpoints VALUES (NEW.account_id, {PERIOD_SQL.format(date="NEW.date")}, COALESCE(
+        (SELECT balance FROM balance_checkpoints
+         WHERE account_id = NEW.account_id AND period < {PERIOD_SQL.format(date="NEW.date")}
+         ORDER BY period DESC LIMIT 1), 0));
+    UPDATE balance_checkpoints SET balance = balance + {SIGNED_SQL.format(type="NEW.transaction_type", amount="NEW.amount")}
+    WHERE account_id = NEW.account_id AND period >= {PERIOD_SQL.format(date="NEW.date")};
+END;
+"""
+CHECKPOINTS_BACKFILL = f"""
+INSERT INTO balance_checkpoints
+SELECT account_id, period, SUM(amount) OVER (PARTITION BY account_id ORDER BY period)
+FROM (SELECT account_id, {PERIOD_SQL.format(date="date")} AS period,
+             SUM({SIGNED_SQL.format(type="transaction_type", amount="amount")}) AS amount
+      FROM transactions GROUP BY account_id, period)
+"""
+# Нормализованные ФИО клиентов (см. namesearch.normalize_name) с триграммным индексом FTS5; rowid совпадает с clients
+NAMES_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS client_names USING fts5(name, tokenize='trigram');
+"""
+# Баланс счёта на дату: контрольная точка на конец предыдущего месяца плюс операции текущего месяца до даты
+BALANCE_AS_OF = f"""
+COALESCE((SELECT balance FROM balance_checkpoints WHERE account_id = {{account}} AND period < :period
+          ORDER BY period DESC LIMIT 1), 0)
++ COALESCE((SELECT SUM({SIGNED_SQL.format(type="transaction_type", amount="amount")}) FROM transactions
+            WHERE account_id = {{account}} AND date >= :start AND date <= :date), 0)
+"""
+
+CLIENT_COLUMNS = "client_id, full_name"
+DEPOSIT_COLUMNS = "deposit_id, deposit_type, open_date, balance, interest_rate, closed, client_id, account_id"
+ACCOUNT_COLUMNS = "account_id, status, open_date, close_date, category"
+TRANSACTION_COLUMNS = "transaction_id, date, transaction_type, amount, account_id"
+
+
+class SqliteDatabase:
+    """
+    Хранилище на SQLite с тем же интерфейсом, что и FileDatabase.
+    Данные не загружаются в память целиком: каждая операция — индексированный запрос.
+    """
+
+    def __init__(self,
+                 data_dir: str,
+                 flush_every: int = 1,
+                 flush_interval: float | None = None,
+                 durability: Durability = Durability.ALWAYS):
+        os.makedirs(data_dir, exist_ok=True)
+
+        self.db_file = f"{data_dir}/bank.sqlite3"
+        # Соединение используется из разных потоков под блокировкой self.lock (см. operation)
+        self.conn = sqlite3.connect(self.db_file, cached_statements=256, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA synchronous={SYNCHRONOUS[durability]}")
+        self.conn.executescript(SCHEMA)
+        # База, созданная до таблицы счетов вкладов: в ней есть только текущие счета
+        if self.conn.execute("SELECT NOT EXISTS (SELECT 1 FROM deposit_accounts) "
+                             "AND EXISTS (SELECT 1 FROM deposits)").fetchone()[0]:
+            with self.conn:
+                self.conn.execute("INSERT OR IGNORE INTO deposit_accounts "
+                                  "SELECT account_id, deposit_id, deposit_type FROM deposits")
+        self.conn.executescript(CHECKPOINTS_SCHEMA)
+        # База, созданная до появления контрольных точек: строим их по истории транзакций
+        if self.conn.execute("SELECT NOT EXISTS (SELECT 1 FROM balance_checkpoints) "
+                             "AND EXISTS (SELECT 1 FROM transactions)").fetchone()[0]:
+            with self.conn:
+                self.conn.execute(CHECKPOINTS_BACKFILL)
+        self.conn.executescript(NAMES_SCHEMA)
+        if self.conn.execute("SELECT NOT EXISTS (SELECT 1 FROM client_names) "
+                             "AND EXISTS (SELECT 1 FROM clients)").fetchone()[0]:
+            with self.conn:
+                self.conn.executemany("INSERT INTO client_names (rowid, name) VALUES (?, ?)",
+                                      [(rowid, normalize_name(name)) for rowid, name in
+                                       self.conn.execute("SELECT rowid, full_name FROM clients")])
+
+        self.ids = IdAllocator(f"{data_dir}/sequences.csv")
+        for prefix, table, column in (("C", "clients", "client_id"), ("D", "deposits", "deposit_id"),
+                                      ("A", "accounts", "account_id"), ("T", "transactions", "transaction_id")):
+            self.ids.seed(prefix, (row[0] for row in self.conn.execute(f"SELECT {column} FROM {table}")))
+
+        # Групповой коммит — те же правила, что и в FileDatabase
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._dirty = False
+        self._pending_ops = 0
+        self._batch_depth = 0
+        self._last_flush = time.monotonic()
+        # Версии таблиц для кэша отчётов; учитываются только изменения, сделанные через этот объект
+        self.versions: dict[str, int] = dict.fromkeys(("transactions", "accounts", "deposits", "clients"), 0)
+
+    # Коллекции целиком (для списков и отчётов)
+    @property
+    def clients(self) -> list[Client]:
+        return [_client(row) for row in self.conn.execute(f"SELECT {CLIENT_COLUMNS} FROM clients ORDER BY rowid")]
+
+    @property
+    def deposits(self) -> list[Deposit]:
+        return [_deposit(row) for row in self.conn.execute(f"SELECT {DEPOSIT_COLUMNS} FROM deposits ORDER BY rowid")]
+
+    @property
+    def accounts(self) -> list[Account]:
+        return [_account(row) for row in self.conn.execute(f"SELECT {ACCOUNT_COLUMNS} FROM accounts ORDER BY rowid")]
+
+    @property
+    def transactions(self) -> list[Transaction]:
+        return [_transaction(row) for row in
+                self.conn.execute(f"SELECT {TRANSACTION_COLUMNS} FROM transactions ORDER BY rowid")]
+
+    # Сохранение
+    def _mark_dirty(self, table: str):
+        self._dirty = True
+        self.versions[table] += 1
+
+    def _commit(self):
+        if not self._dirty:
+            return
+        self._pending_ops += 1
+        if self._pending_ops >= self.flush_every or (
+                self.flush_interval is not None and time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            self.conn.commit()
+            self._dirty = False
+            self._pending_ops = 0
+            self._last_flush = time.monotonic()
+
+    def durable(self) -> Future:
+        # Коммит SQLite синхронный: к возврату из операции изменения уже в базе
+        return done_future()
+
+    @contextmanager
+    def batch(self):
+        with self.lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self.flush()
+
+    def checkpoint(self):
+        # Переносит накопленный WAL в основной файл базы
+        with self.lock:
+            self.flush()
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            self.conn.close()
+            self.ids.close()
+
+    def _exists(self, table: str, column: str, value: str) -> bool:
+        return self.conn.execute(f"SELECT 1 FROM {table} WHERE {column} = ?", (value,)).fetchone() is not None
+
+    # Идентификаторы
+    def generate_client_id(self) -> str:
+        return self.ids.allocate("C")
+
+    def generate_deposit_id(self) -> str:
+        return self.ids.allocate("D")
+
+    def generate_account_id(self) -> str:
+        return self.ids.allocate("A")
+
+    def generate_transaction_id(self) -> str:
+        return self.ids.allocate("T")
+
+    def generate_transaction_ids(self, count: int) -> list[str]:
+        return self.ids.allocate_many("T", count)
+
+    # Клиенты
+    def get_client(self, client_id: str) -> Client | None:
+        row = self.conn.execute(f"SELECT {CLIENT_COLUMNS} FROM clients WHERE client_id = ?", (client_id,)).fetchone()
+        return _client(row) if row else None
+
+    def count_clients(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM clients").fetchone()[0]
+
+    def search_clients(self, query: str, limit: int | None = None, prefix: bool = False) -> list[Client]:
+        key = search_key(query, prefix)
+        if not key.strip():
+            return []
+        # Для запросов из трёх и более символов работает триграммный индекс, короткие проверяются перебором
+        if len(key) >= 3:
+            where, param = "client_names MATCH ?", '"' + key.replace('"', '""') + '"'
+        else:
+            where, param = "instr(n.name, ?) > 0", key
+        return [_client(row) for row in self.conn.execute(
+            "SELECT c.client_id, c.full_name FROM client_names AS n JOIN clients AS c ON c.rowid = n.rowid "
+            f"WHERE {where} ORDER BY n.rowid LIMIT ?", (param, -1 if limit is None else limit))]
+
+    def clients_page(self, limit: int, cursor: str | None = None) -> Page[Client]:
+        after = decode_cursor(cursor, int)[0] if cursor is not None else 0
+        rows = self.conn.execute(f"SELECT rowid, {CLIENT_COLUMNS} FROM clients WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                                 (after, limit + 1)).fetchall()
+        next_cursor = encode_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+        return Page([_client(row[1:]) for row in rows[:limit]], next_cursor)
+
+    @operation
+    def add_client(self, full_name: str) -> bool:
+        if not full_name:
+            return False
+        client = Client(self.generate_client_id(), full_name)
+        cur = self.conn.execute("INSERT INTO clients VALUES (?, ?)", client.serialize())
+        self.conn.execute("INSERT INTO client_names (rowid, name) VALUES (?, ?)",
+                          (cur.lastrowid, normalize_name(full_name)))
+        self._mark_dirty("clients")
+        return True
+
+    @operation
+    def update_client(self, client: Client) -> bool:
+        cur = self.conn.execute("UPDATE clients SET full_name = ? WHERE client_id = ?",
+                                (client.full_name, client.client_id))
+        if cur.rowcount == 0:
+            return False
+        self.conn.execute("UPDATE client_names SET name = ? WHERE rowid = (SELECT rowid FROM clients WHERE client_id = ?)",
+                          (normalize_name(client.full_name), client.client_id))
+        self._mark_dirty("clients")
+        return True
+
+    @operation
+    def delete_client(self, client_id: str) -> bool:
+        if self._exists("deposits", "client_id", client_id):
+            return False
+        self.conn.execute("DELETE FROM client_names WHERE rowid = (SELECT rowid FROM clients WHERE client_id = ?)",
+                          (client_id,))
+        cur = self.conn.execute("DELETE FROM clients WHERE client_id = ?", (client_id,))
+        if cur.rowcount == 0:
+            return False
+        self._mark_dirty("clients")
+        return True
+
+    # Вклады
+    def get_deposit(self, deposit_id: str) -> Deposit | None:
+        row = self.conn.execute(f"SELECT {DEPOSIT_COLUMNS} FROM deposits WHERE deposit_id = ?",
+                                (deposit_id,)).fetchone()
+        return _deposit(row) if row else None
+
+    def get_client_deposits(self, client_id: str) -> list:
+        return [_deposit(row) for row in
+                self.conn.execute(f"SELECT {DEPOSIT_COLUMNS} FROM deposits WHERE client_id = ? ORDER BY rowid",
+                                  (client_id,))]
+
+    # UPSERT, а не INSERT OR REPLACE: строка обновляется на месте и сохраняет свой rowid (порядок в списках)
+    def _write_deposit(self, deposit: Deposit):
+        self.conn.execute("INSERT INTO deposits VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (deposit_id) DO UPDATE SET "
+                          "deposit_type = excluded.deposit_type, open_date = excluded.open_date, "
+                          "balance = excluded.balance, interest_rate = excluded.interest_rate, "
+                          "closed = excluded.closed, client_id = excluded.client_id, "
+                          "account_id = excluded.account_id", _deposit_row(deposit))
+        self.conn.execute("INSERT OR IGNORE INTO deposit_accounts VALUES (?, ?, ?)",
+                          (deposit.account_id, deposit.deposit_id, str(deposit.deposit_type)))
+        self._mark_dirty("deposits")
+
+    def _write_account(self, account: Account):
+        self.conn.execute("INSERT INTO accounts VALUES (?, ?, ?, ?, ?) ON CONFLICT (account_id) DO UPDATE SET "
+                          "status = excluded.status, open_date = excluded.open_date, "
+                          "close_date = excluded.close_date, category = excluded.category", _account_row(account))
+        self._mark_dirty("accounts")
+
+    @operation
+    def add_deposit(self, client_id: str, dep_type: DepositType, initial_balance: float, interest_rate: float) -> bool:
+        if not self._exists("clients", "client_id", client_id) or not (0 <= initial_balance < math.inf) \
+                or not (0 <= interest_rate < math.inf):
+            return False
+        deposit_id = self.generate_deposit_id()
+        account_id = self.generate_account_id()
+        now = int(time.time())
+        self._write_account(Account(account_id, AccountStatus.OPEN, now, 0, AccountCategory.STANDARD))
+        self._write_deposit(Deposit(deposit_id, dep_type, now, initial_balance, interest_rate, False,
+                                    client_id, account_id))
+        if initial_balance > 0:
+            self.add_transaction(account_id, TransactionType.DEPOSIT, initial_balance)
+        return True
+
+    @operation
+    def update_deposit(self, deposit: Deposit) -> bool:
+        if not self._exists("deposits", "deposit_id", deposit.deposit_id):
+            return False
+        self._write_deposit(deposit)
+        return True
+
+    @operation
+    def delete_deposit(self, deposit_id: str) -> bool:
+        d = self.get_deposit(deposit_id)
+        if d is None or not d.closed:
+            return False
+        account = self.get_account(d.account_id)
+        if not account or account.status != AccountStatus.CLOSED:
+            return False
+        self.conn.execute("DELETE FROM deposits WHERE deposit_id = ?", (deposit_id,))
+        self._mark_dirty("deposits")
+        return True
+
+    def query_deposits(self, query: DepositQuery) -> list[Deposit]:
+        conditions, params = [], []
+        for column, value in (("deposit_type", None if query.deposit_type is None else str(query.deposit_type)),
+                              ("closed", None if query.closed is None else int(query.closed)),
+                              ("client_id", query.client_id)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        for column in ORDER_FIELDS:
+            lo, hi = query.range(column)
+            if lo is not None:
+                conditions.append(f"{column} >= ?")
+                params.append(lo)
+            if hi is not None:
+                conditions.append(f"{column} <= ?")
+                params.append(hi)
+        sql = f"SELECT {DEPOSIT_COLUMNS} FROM deposits"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        direction = " DESC" if query.descending else ""
+        order = f"rowid{direction}" if query.order_by is None else f"{query.order_by}{direction}, rowid{direction}"
+        sql += f" ORDER BY {order}"
+        if query.limit is not None:
+            sql += " LIMIT ?"
+            params.append(query.limit)
+        return [_deposit(row) for row in self.conn.execute(sql, params)]
+
+    def iter_open_deposits(self, dep_type: DepositType) -> Iterator[Deposit]:
+        for row in self.conn.execute(f"SELECT {DEPOSIT_COLUMNS} FROM deposits WHERE deposit_type = ? AND closed = 0 "
+                                     "ORDER BY rowid", (str(dep_type),)):
+            yield _deposit(row)
+
+    def client_totals(self, client_id: str) -> ClientTotals:
+        row = self.conn.execute("SELECT COUNT(*), TOTAL(closed = 0), TOTAL(CASE WHEN closed = 0 THEN balance END) "
+                                "FROM deposits WHERE client_id = ?", (client_id,)).fetchone()
+        return ClientTotals(row[0], int(row[1]), row[2])
+
+    def clients_with_totals(self) -> Iterator[tuple[Client, ClientTotals]]:
+        # Один проход по клиентам с присоединением их вкладов по индексу deposits_client
+        for row in self.conn.execute(
+                "SELECT c.client_id, c.full_name, COUNT(d.deposit_id), TOTAL(d.closed = 0), "
+                "TOTAL(CASE WHEN d.closed = 0 THEN d.balance END) "
+                "FROM clients c LEFT JOIN deposits d ON d.client_id = c.client_id "
+                "GROUP BY c.rowid ORDER BY c.rowid"):
+            yield Client(row[0], row[1]), ClientTotals(row[2], int(row[3]), row[4])
+
+    def portfolio_stats(self) -> PortfolioStats:
+        stats = PortfolioStats()
+        for dep_type, closed, count, balance, rate_sum in self.conn.execute(
+                "SELECT deposit_type, closed, COUNT(*), SUM(balance), SUM(interest_rate) FROM deposits "
+                "GROUP BY deposit_type, closed"):
+            stats.deposits += count
+            if closed:
+                stats.closed += count
+            else:
+                dep_type = DepositType.value_of(dep_type)
+                stats.count[dep_type] = count
+                stats.balance[dep_type] = balance
+                stats.rate_sum[dep_type] = rate_sum
+        stats.clients = self.conn.execute("SELECT COUNT(*) FROM clients").fetchone()[0]
+        stats.accounts = self.conn.execute("SELECT COUNT(*) FROM accounts").fetchone()[0]
+        return stats
+
+    # Счета
+    def get_account(self, account_id: str) -> Account | None:
+        row = self.conn.execute(f"SELECT {ACCOUNT_COLUMNS} FROM accounts WHERE account_id = ?",
+                                (account_id,)).fetchone()
+        return _account(row) if row else None
+
+    def get_deposit_account(self, deposit_id: str) -> Account | None:
+        deposit = self.get_deposit(deposit_id)
+        if not deposit:
+            return None
+        return self.get_account(deposit.account_id)
+
+    @operation
+    def add_account(self, deposit_id: str, category: AccountCategory) -> bool:
+        deposit = self.get_deposit(deposit_id)
+        if not deposit:
+            return False
+        account_id = self.generate_account_id()
+        self._write_account(Account(account_id, AccountStatus.OPEN, int(time.time()), 0, category))
+        deposit.account_id = account_id
+        self._write_deposit(deposit)
+        return True
+
+    @operation
+    def update_account(self, account: Account) -> bool:
+        if not self._exists("accounts", "account_id", account.account_id):
+            return False
+        self._write_account(account)
+        return True
+
+    @operation
+    def close_account(self, account_id: str) -> bool:
+        account = self.get_account(account_id)
+        if not account:
+            return False
+        for row in self.conn.execute("SELECT deposit_id FROM deposits WHERE account_id = ? AND closed = 0",
+                                     (account_id,)).fetchall():
+            if not self.close_deposit(row[0]):
+                return False
+        account = self.get_account(account_id)
+        success = account.close()
+        if success:
+            self._write_account(account)
+        return success
+
+    # Транзакции
+    def get_all_transactions(self) -> list:
+        return [_transaction(row) for row in
+                self.conn.execute(f"SELECT {TRANSACTION_COLUMNS} FROM transactions ORDER BY date DESC")]
+
+    def get_account_transactions(self, account_id: str) -> list:
+        return self.query_account_transactions(account_id)
+
+    def query_account_transactions(self,
+                                   account_id: str,
+                                   from_date: float | None = None,
+                                   to_date: float | None = None,
+                                   reverse: bool = True,
+                                   limit: int | None = None) -> list:
+        where, params = self._transaction_filter(account_id, from_date, to_date)
+        order = "date DESC, rowid DESC" if reverse else "date, rowid"
+        params.append(-1 if limit is None else limit)
+        return [_transaction(row) for row in
+                self.conn.execute(f"SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE {where} ORDER BY {order} "
+                                  "LIMIT ?", params)]
+
+    def _transaction_filter(self, account_id: str, from_date: float | None, to_date: float | None) -> tuple[str, list]:
+        where = "account_id = ?"
+        params: list = [account_id]
+        if from_date is not None:
+            where += " AND date >= ?"
+            params.append(from_date)
+        if to_date is not None:
+            where += " AND date <= ?"
+            params.append(to_date)
+        return where, params
+
+    def account_transactions_page(self,
+                                  account_id: str,
+                                  limit: int,
+                                  cursor: str | None = None,
+                                  from_date: float | None = None,
+                                  to_date: float | None = None,
+                                  reverse: bool = True) -> Page[Transaction]:
+        where, params = self._transaction_filter(account_id, from_date, to_date)
+        if cursor is not None:
+            where += " AND (date, rowid) < (?, ?)" if reverse else " AND (date, rowid) > (?, ?)"
+            params.extend(decode_cursor(cursor, NUMBER, int))
+        order = "date DESC, rowid DESC" if reverse else "date, rowid"
+        params.append(limit + 1)
+        rows = self.conn.execute(f"SELECT rowid, {TRANSACTION_COLUMNS} FROM transactions WHERE {where} "
+                                 f"ORDER BY {order} LIMIT ?", params).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last[2], last[0])
+        return Page([_transaction(row[1:]) for row in rows[:limit]], next_cursor)
+
+    def transactions_page(self, limit: int, cursor: str | None = None) -> Page[Transaction]:
+        where, params = "", []
+        if cursor is not None:
+            where, params = "WHERE rowid < ?", decode_cursor(cursor, int)
+        params.append(limit + 1)
+        rows = self.conn.execute(f"SELECT rowid, {TRANSACTION_COLUMNS} FROM transactions {where} "
+                                 "ORDER BY rowid DESC LIMIT ?", params).fetchall()
+        next_cursor = encode_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+        return Page([_transaction(row[1:]) for row in rows[:limit]], next_cursor)
+
+    def count_account_transactions(self,
+                                   account_id: str,
+                                   from_date: float | None = None,
+                                   to_date: float | None = None) -> int:
+        where, params = self._transaction_filter(account_id, from_date, to_date)
+        return self.conn.execute(f"SELECT COUNT(*) FROM transactions WHERE {where}", params).fetchone()[0]
+
+    def iter_account_transactions(self,
+                                  account_id: str,
+                                  from_date: float | None = None,
+                                  to_date: float | None = None,
+                                  reverse: bool = True) -> Iterator[Transaction]:
+        where, params = self._transaction_filter(account_id, from_date, to_date)
+        order = "date DESC, rowid DESC" if reverse else "date, rowid"
+        for row in self.conn.execute(f"SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE {where} ORDER BY {order}",
+                                     params):
+            yield _transaction(row)
+
+    def balance_as_of(self, account_id: str, date: float) -> float:
+        return self.conn.execute(f"SELECT {BALANCE_AS_OF.format(account=':account_id')}",
+                                 dict(_period_params(date), account_id=account_id)).fetchone()[0]
+
+    def deposit_balance_as_of(self, deposit_id: str, date: float) -> float | None:
+        return self.conn.execute(f"SELECT SUM({BALANCE_AS_OF.format(account='m.account_id')}) "
+                                 "FROM deposit_accounts AS m WHERE m.deposit_id = :deposit_id",
+                                 dict(_period_params(date), deposit_id=deposit_id)).fetchone()[0]
+
+    def book_balance_as_of(self, date: float) -> dict[DepositType, float]:
+        # По всем счетам вкладов, включая прежние; тип удалённого вклада — записанный при открытии счёта
+        balance = dict.fromkeys(DepositType, 0.0)
+        for dep_type, total in self.conn.execute(
+                f"SELECT COALESCE(d.deposit_type, m.deposit_type), SUM({BALANCE_AS_OF.format(account='m.account_id')}) "
+                "FROM deposit_accounts AS m LEFT JOIN deposits AS d ON d.deposit_id = m.deposit_id "
+                "GROUP BY 1", _period_params(date)):
+            balance[DepositType.value_of(dep_type)] = total
+        return balance
+
+    @operation
+    def add_transaction(self, account_id: str, tx_type: TransactionType, amount: float) -> bool:
+        if not self._exists("accounts", "account_id", account_id) or amount < 0:
+            return False
+        transaction = Transaction(self.generate_transaction_id(), int(time.time()), tx_type, amount, account_id)
+        self.conn.execute("INSERT INTO transactions VALUES (?, ?, ?, ?, ?)", _transaction_row(transaction))
+        self._mark_dirty("transactions")
+        return True
+
+    @operation
+    def deposit_funds(self, deposit_id: str, amount: float) -> bool:
+        # nan проходит проверку amount <= 0 и испортил бы баланс вклада
+        if not math.isfinite(amount) or amount <= 0:
+            return False
+        deposit = self.get_deposit(deposit_id)
+        if not deposit or deposit.closed:
+            return False
+        deposit.deposit(amount)
+        self.add_transaction(deposit.account_id, TransactionType.DEPOSIT, amount)
+        self._write_deposit(deposit)
+        return True
+
+    @operation
+    def withdraw_funds(self, deposit_id: str, amount: float) -> bool:
+        if not math.isfinite(amount) or amount <= 0:
+            return False
+        deposit = self.get_deposit(deposit_id)
+        if not deposit or deposit.closed:
+            return False
+        if not deposit.withdraw(amount):
+            return False
+        self.add_transaction(deposit.account_id, TransactionType.WITHDRAW, amount)
+        self._write_deposit(deposit)
+        return True
+
+    @operation
+    def post_transfers(self, legs: list[tuple[Deposit, Deposit, float]], balances: dict[str, float]):
+        now = int(time.time())
+        transactions = []
+        for source, target, amount in legs:
+            transactions.append(_transaction_row(Transaction(self.generate_transaction_id(), now,
+                                                             TransactionType.WITHDRAW, amount, source.account_id)))
+            transactions.append(_transaction_row(Transaction(self.generate_transaction_id(), now,
+                                                             TransactionType.DEPOSIT, amount, target.account_id)))
+        self._post(transactions, balances)
+
+    @operation
+    def post_operations(self, postings: list[tuple[Deposit, TransactionType, float]], balances: dict[str, float]):
+        now = int(time.time())
+        self._post([(transaction_id, now, str(tx_type), amount, deposit.account_id)
+                    for transaction_id, (deposit, tx_type, amount)
+                    in zip(self.generate_transaction_ids(len(postings)), postings)], balances)
+
+    def _post(self, transactions: list[tuple], balances: dict[str, float]):
+        self.conn.executemany("INSERT INTO transactions VALUES (?, ?, ?, ?, ?)", transactions)
+        self.conn.executemany("UPDATE deposits SET balance = ? WHERE deposit_id = ?",
+                              [(balance, deposit_id) for deposit_id, balance in balances.items()])
+        self._mark_dirty("deposits")
+        self._mark_dirty("transactions")
+
+    @operation
+    def calculate_and_add_interest(self, deposit_id: str, to_date: float) -> bool:
+        deposit = self.get_deposit(deposit_id)
+        if not deposit or deposit.closed:
+            return False
+        interest = deposit.calculate_interest(to_date)
+        if interest <= 0:
+            return False
+        deposit.deposit(interest)
+        self.add_transaction(deposit.account_id, TransactionType.INTEREST, interest)
+        self._write_deposit(deposit)
+        return True
+
+    @operation
+    def accrue_interest(self, to_date: float, dep_type: DepositType | None = None) -> dict[str, float]:
+        query = "SELECT deposit_id, balance, interest_rate, open_date, account_id FROM deposits WHERE closed = 0"
+        params = []
+        if dep_type is not None:
+            query += " AND deposit_type = ?"
+            params.append(str(dep_type))
+        rows = self.conn.execute(query, params).fetchall()
+        interests = compute_interest([row[1] for row in rows], [row[2] for row in rows], [row[3] for row in rows],
+                                     to_date)
+        now = int(time.time())
+        accrued = {}
+        balances = []
+        transactions = []
+        for row, interest in zip(rows, interests):
+            if interest <= 0:
+                continue
+            accrued[row[0]] = interest
+            balances.append((row[1] + interest, row[0]))
+            transactions.append(_transaction_row(
+                Transaction(self.generate_transaction_id(), now, TransactionType.INTEREST, interest, row[4])))
+        if accrued:
+            self.conn.executemany("UPDATE deposits SET balance = ? WHERE deposit_id = ?", balances)
+            self.conn.executemany("INSERT INTO transactions VALUES (?, ?, ?, ?, ?)", transactions)
+            self._mark_dirty("deposits")
+            self._mark_dirty("transactions")
+        return accrued
+
+    @operation
+    def close_deposit(self, deposit_id: str) -> bool:
+        deposit = self.get_deposit(deposit_id)
+        if not deposit or deposit.closed:
+            return False
+        balance = deposit.balance
+        if not deposit.close():
+            return False
+        self.add_transaction(deposit.account_id, TransactionType.CLOSE, balance)
+        account = self.get_account(deposit.account_id)
+        if account:
+            account.close()
+            self._write_account(account)
+        self._write_deposit(deposit)
+        return True
+
+
+def _client(row) -> Client:
+    return Client(row[0], row[1])
+
+
+def _deposit(row) -> Deposit:
+    return Deposit(
+        deposit_id=row[0],
+        deposit_type=DepositType.value_of(row[1]),
+        open_date=row[2],
+        balance=row[3],
+        interest_rate=row[4],
+        closed=bool(row[5]),
+        client_id=row[6],
+        account_id=row[7]
+    )
+
+
+def _deposit_row(deposit: Deposit) -> tuple:
+    return (deposit.deposit_id, str(deposit.deposit_type), deposit.open_date, deposit.balance,
+            deposit.interest_rate, 1 if deposit.closed else 0, deposit.client_id, deposit.account_id)
+
+
+def _account(row) -> Account:
+    return Account(
+        account_id=row[0],
+        status=AccountStatus.value_of(row[1]),
+        open_date=row[2],
+        close_date=row[3],
+        category=AccountCategory.value_of(row[4])
+    )
+
+
+def _account_row(account: Account) -> tuple:
+    return account.account_id, str(account.status), account.open_date, account.close_date, str(account.category)
+
+
+def _transaction(row) -> Transaction:
+    return Transaction(
+        transaction_id=row[0],
+        date=row[1],
+        transaction_type=TransactionType.value_of(row[2]),
+        amount=row[3],
+        account_id=row[4]
+    )
+
+
+def _transaction_row(transaction: Transaction) -> tuple:
+    return (transaction.transaction_id, transaction.date, str(transaction.transaction_type),
+            transaction.amount, transaction.account_id)
+
+
+def _period_params(date: float) -> dict:
+    # Номер месяца даты и начало этого месяца — в том же виде, что и PERIOD_SQL
+    local = time.localtime(date)
+    return {"period": local.tm_year * 12 + local.tm_mon - 1,
+            "start": time.mktime((local.tm_year, local.tm_mon, 1, 0, 0, 0, 0, 0, -1)),
+            "date": date}
@@ -0,0 +1,42 @@
+import os
+
+from durability import Durability
+from filedatabase import FileDatabase
+from shardeddatabase import ShardedDatabase
+from sqlitedatabase import SqliteDatabase
+
+
+# Доступные хранилища данных
+BACKENDS = {
+    "file": FileDatabase,
+    "sqlite": SqliteDatabase,
+    "sharded": ShardedDatabase,
+}
+# Хранилища, которые умеют писать файлы в фоновом потоке (у SQLite коммит и так не переписывает таблиц)
+BACKGROUND_WRITER_BACKENDS = {"file", "sharded"}
+
+
+def open_database(backend: str | None = None,
+                  data_dir: str | None = None,
+                  background_writer: bool = False,
+                  durability: Durability | None = None,
+                  **options):
+    """
+    Открывает хранилище данных. Если параметры не заданы, берёт их из переменных окружения
+    BANK_STORAGE (file/sqlite/sharded, по умолчанию file), BANK_DATA_DIR (по умолчанию data)
+    и BANK_DURABILITY (always/interval/os, по умолчанию always); для sharded — BANK_SHARDS (число частей
+    нового хранилища).
+    background_writer — сохранять изменения в фоновом потоке, если хранилище это умеет.
+    """
+    backend = backend or os.environ.get("BANK_STORAGE", "file")
+    data_dir = data_dir or os.environ.get("BANK_DATA_DIR", "data")
+    if durability is None:
+        durability = Durability.value_of(os.environ.get("BANK_DURABILITY", "always"))
+    options["durability"] = durability
+    if backend == "sharded" and "shards" not in options and os.environ.get("BANK_SHARDS"):
+        options["shards"] = int(os.environ["BANK_SHARDS"])
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестное хранилище: {backend}. Доступны: {', '.join(BACKENDS)}")
+    if background_writer and backend in BACKGROUND_WRITER_BACKENDS:
+        options["background_writer"] = True
+    return BACKENDS[backend](data_dir, **options)
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+# Модули проекта лежат в корне репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bankingsystem import BankingSystem  # noqa: E402
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def banking_system(request, tmp_path):
+    banking_system = BankingSystem(request.param, str(tmp_path / "data"))
+    yield banking_system
+    banking_system.close()
+
+
+@pytest.fixture
+def file_system(tmp_path):
+    banking_system = BankingSystem("file", str(tmp_path / "data"))
+    yield banking_system
+    banking_system.close()
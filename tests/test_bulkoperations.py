@@ -0,0 +1,70 @@
+import json
+
+from deposit import DepositType
+
+
+def _deposits(banking_system, *balances) -> list[str]:
+    banking_system.add_client("Иванов Иван")
+    client_id = banking_system.get_all_clients()[0].client_id
+    for balance in balances:
+        banking_system.add_deposit(client_id, DepositType.DEMAND, balance, 10.0)
+    return sorted((d.deposit_id for d in banking_system.get_client_deposits(client_id)),
+                  key=lambda deposit_id: banking_system.get_deposit(deposit_id).balance)
+
+
+def test_non_finite_values_rejected(banking_system):
+    deposit_id, = _deposits(banking_system, 100.0)
+    operations = [{"operation": operation, "deposit_id": deposit_id, "amount": amount}
+                  for operation in ("DEPOSIT", "WITHDRAW") for amount in ("nan", "inf", "-inf", float("nan"))]
+    operations += [{"operation": "INTEREST", "deposit_id": deposit_id, "date": date}
+                   for date in ("nan", "inf", float("inf"))]
+    report = banking_system.apply_operations(operations)
+    assert report.applied == 0
+    assert {r.error for r in report.errors()} == {"Некорректная сумма", "Некорректная дата начисления процентов"}
+    assert banking_system.get_deposit(deposit_id).balance == 100.0
+
+
+def test_lines_see_earlier_lines(banking_system):
+    first, second = _deposits(banking_system, 100.0, 200.0)
+    report = banking_system.apply_operations([
+        {"operation": "WITHDRAW", "deposit_id": first, "amount": "80"},
+        {"operation": "WITHDRAW", "deposit_id": first, "amount": "30"},
+        {"operation": "DEPOSIT", "deposit_id": first, "amount": "50"},
+        {"operation": "WITHDRAW", "deposit_id": first, "amount": "30"},
+        {"operation": "DEPOSIT", "deposit_id": second, "amount": "25"},
+        {"operation": "CLOSE", "deposit_id": second},
+        {"operation": "DEPOSIT", "deposit_id": second, "amount": "1"},
+        {"operation": "DEPOSIT", "deposit_id": "D0", "amount": "1"},
+    ])
+    assert [(r.ok, r.amount) for r in report.results] == [
+        (True, 80.0), (False, 30.0), (True, 50.0), (True, 30.0), (True, 25.0), (True, 225.0), (False, 0.0),
+        (False, 0.0)]
+    assert banking_system.get_deposit(first).balance == 40.0
+    assert banking_system.get_deposit(second).closed
+    account_id = banking_system.get_deposit(first).account_id
+    transactions = banking_system.get_account_transactions_page(account_id, None, 10).items
+    assert sorted(t.amount for t in transactions) == [30.0, 50.0, 80.0, 100.0]
+
+
+def test_malformed_lines_do_not_abort_import(banking_system, tmp_path):
+    deposit_id, = _deposits(banking_system, 100.0)
+    file_path = tmp_path / "operations.jsonl"
+    file_path.write_text("\n".join([
+        json.dumps({"operation": "DEPOSIT", "deposit_id": deposit_id, "amount": 10}),
+        '{"operation": "DEPOSIT", "deposit_id"',
+        "[1, 2]",
+        "42",
+        "",
+        json.dumps({"operation": "WITHDRAW", "deposit_id": deposit_id, "amount": {"value": 5}}),
+        json.dumps({"operation": "INTEREST", "deposit_id": deposit_id, "date": ["01.01.2030"]}),
+        json.dumps({"operation": "WITHDRAW", "deposit_id": deposit_id, "amount": "30"}),
+    ]) + "\n", encoding="utf-8")
+    report = banking_system.import_operations(str(file_path))
+    assert [(r.line, r.ok) for r in report.results] == [
+        (1, True), (2, False), (3, False), (4, False), (5, False), (6, False), (7, True)]
+    assert report.results[1].error.startswith("Некорректная строка JSON")
+    assert report.results[2].error == report.results[3].error == "Операция должна быть объектом"
+    assert report.results[4].error == "Некорректная сумма"
+    assert report.results[5].error == "Некорректный формат даты. Используйте дд.мм.гггг"
+    assert banking_system.get_deposit(deposit_id).balance == 80.0
+    assert "Строка 2:" in str(report)
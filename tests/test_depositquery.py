@@ -0,0 +1,110 @@
+import csv
+import random
+import time
+
+import depositquery
+from deposit import Deposit, DepositType
+from depositquery import DepositQuery, SortedList
+
+
+def test_sorted_list_matches_sorted_reference(monkeypatch):
+    # Маленькие блоки, чтобы проверить их деление и слияние
+    monkeypatch.setattr(depositquery, "SORTED_LOAD", 8)
+    rng = random.Random(3)
+    items, reference = SortedList(), []
+    for i in range(3000):
+        if reference and rng.random() < 0.3:
+            value = rng.choice(reference)
+            reference.remove(value)
+            items.remove(value)
+        else:
+            value = (rng.randint(0, 300), i)
+            items.add(value)
+            reference.append(value)
+        if i % 97 == 0:
+            reference.sort()
+            low, high = (rng.randint(0, 300),), (rng.randint(0, 300), float("inf"))
+            expected = [v for v in reference if low <= v <= high]
+            assert list(items.irange(low, high)) == expected
+            assert list(items.irange(low, high, True)) == expected[::-1]
+            assert items.count(low, high) == len(expected)
+            assert list(items.irange()) == reference
+
+
+def _random_query(rng: random.Random, deposits: list) -> dict:
+    def bound(low, high):
+        return None if rng.random() < 0.5 else rng.uniform(low, high)
+    return dict(deposit_type=rng.choice([None] + list(DepositType)), closed=rng.choice([None, False, True]),
+                client_id=None if rng.random() < 0.8 else rng.choice(deposits).client_id,
+                min_balance=bound(0, 6000), max_balance=bound(0, 8000), min_rate=bound(0, 12), max_rate=bound(0, 13),
+                from_date=bound(1790000000, 1790000000 + 4e6), to_date=bound(1790000000, 1790000000 + 4e6),
+                order_by=rng.choice([None, "balance", "interest_rate", "open_date"]),
+                descending=rng.random() < 0.5, limit=rng.choice([None, 0, 1, 10, 100]))
+
+
+def _check_queries(banking_system, rng: random.Random, count: int):
+    deposits = banking_system.get_all_deposits()
+    for _ in range(count):
+        kwargs = _random_query(rng, deposits)
+        expected = [d.deposit_id for d in DepositQuery(**kwargs).apply(deposits)]
+        assert [d.deposit_id for d in banking_system.find_deposits(**kwargs)] == expected, kwargs
+
+
+def test_find_deposits_matches_brute_force(banking_system, monkeypatch):
+    monkeypatch.setattr(depositquery, "SORTED_LOAD", 8)
+    now = [1790000000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    rng = random.Random(1)
+    db = banking_system.db
+    for i in range(40):
+        banking_system.add_client(f"Клиент {i}")
+    clients = [c.client_id for c in banking_system.get_all_clients()]
+    for _ in range(600):
+        now[0] += rng.randint(0, 5000)
+        db.add_deposit(rng.choice(clients), rng.choice(list(DepositType)), float(rng.randint(0, 50) * 100),
+                       float(rng.randint(1, 12)))
+    deposit_ids = [d.deposit_id for d in banking_system.get_all_deposits()]
+    # Запросы вперемешку с проводками: индекс переносит вклады с изменившимся балансом перед запросом
+    for _ in range(20):
+        for _ in range(40):
+            deposit_id, r = rng.choice(deposit_ids), rng.random()
+            if r < 0.45:
+                db.deposit_funds(deposit_id, float(rng.randint(1, 30) * 100))
+            elif r < 0.9:
+                db.withdraw_funds(deposit_id, float(rng.randint(1, 30) * 100))
+            else:
+                db.close_deposit(deposit_id)
+        _check_queries(banking_system, rng, 30)
+    banking_system.accrue_interest(now[0] + 86400 * 30, DepositType.TERM)
+    _check_queries(banking_system, rng, 300)
+
+
+def test_export_top_deposits(banking_system, tmp_path):
+    banking_system.add_client("Иванов Иван")
+    client_id = banking_system.get_all_clients()[0].client_id
+    for balance in (100.0, 500.0, 300.0):
+        banking_system.add_deposit(client_id, DepositType.SAVINGS, balance, 5.0)
+    banking_system.add_deposit(client_id, DepositType.DEMAND, 900.0, 1.0)
+    file_path = tmp_path / "top.csv"
+    assert banking_system.export_report(str(file_path), "top_deposits", DepositType.SAVINGS, 2) == 2
+    with open(file_path, encoding="utf-8") as file:
+        rows = list(csv.DictReader(file))
+    assert [float(row["balance"]) for row in rows] == [500.0, 300.0]
+    assert {row["full_name"] for row in rows} == {"Иванов Иван"}
+
+
+def test_update_with_new_object_after_posting(banking_system):
+    banking_system.add_client("Иванов Иван")
+    client_id = banking_system.get_all_clients()[0].client_id
+    banking_system.add_deposit(client_id, DepositType.DEMAND, 100.0, 1.0)
+    deposit_id = banking_system.get_client_deposits(client_id)[0].deposit_id
+    banking_system.deposit_funds(deposit_id, 5.0)
+    # Новый объект вместо изменённого на месте: отметка о балансе прежнего объекта не должна его вернуть
+    current = banking_system.get_deposit(deposit_id)
+    replacement = Deposit(deposit_id, DepositType.SAVINGS, current.open_date, 500.0, current.interest_rate, False,
+                          client_id, current.account_id)
+    assert banking_system.db.update_deposit(replacement)
+    found = banking_system.find_deposits()
+    assert [(d.deposit_type, d.balance) for d in found] == [(DepositType.SAVINGS, 500.0)]
+    assert [d.deposit_id for d in banking_system.find_deposits(deposit_type=DepositType.SAVINGS)] == [deposit_id]
+    assert banking_system.find_deposits(deposit_type=DepositType.DEMAND) == []
@@ -0,0 +1,39 @@
+import os
+import time
+
+import durability
+from durability import Durability, SyncedFiles
+
+
+def test_interval_syncs_without_next_commit(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(durability, "fsync_file", synced.append)
+    files = SyncedFiles(Durability.INTERVAL, sync_interval=0.05)
+    path = str(tmp_path / "table.csv")
+    files.write([("rewrite", path, [["1", "a"]])])
+    assert files.syncs == 0
+    # Следующего коммита нет — файл синхронизирует таймер
+    deadline = time.monotonic() + 2
+    while not files.syncs and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert files.syncs == 1
+    assert synced == [path]
+    files.write([("append", path, [["2", "b"]])])
+    files.sync()
+    assert synced == [path, path]
+
+
+def test_interval_rewrite_synced_before_rename(tmp_path, monkeypatch):
+    events = []
+    fsync, replace = os.fsync, os.replace
+    monkeypatch.setattr(os, "fsync", lambda fd: (events.append("fsync"), fsync(fd))[1])
+    monkeypatch.setattr(os, "replace", lambda src, dst: (events.append("replace"), replace(src, dst))[1])
+    monkeypatch.setattr(durability, "fsync_dir", lambda path: events.append("dir"))
+    files = SyncedFiles(Durability.INTERVAL, sync_interval=60)
+    path = str(tmp_path / "table.csv")
+    files.write([("rewrite", path, [["1", "a"]])])
+    files.write([("rewrite", path, [["2", "b"]])])
+    # Данные временного файла — на диске до переименования, fsync каталога отложен
+    assert events == ["fsync", "replace"] * 2
+    files.sync()
+    assert events[-1] == "dir"
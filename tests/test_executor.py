@@ -0,0 +1,91 @@
+import random
+import threading
+
+import pytest
+
+from bankingsystem import BankingSystem
+from deposit import DepositType
+from executor import ShardedExecutor
+from transaction import BALANCE_SIGN
+
+
+@pytest.fixture(params=["file", "sqlite", "sharded"])
+def any_system(request, tmp_path):
+    banking_system = BankingSystem(request.param, str(tmp_path / "data"))
+    yield banking_system
+    banking_system.close()
+
+
+def _open_deposits(banking_system, count: int) -> list[str]:
+    with banking_system.batch():
+        for i in range(8):
+            banking_system.add_client(f"Клиент {i}")
+        clients = [c.client_id for c in banking_system.get_all_clients()]
+        for i in range(count):
+            banking_system.add_deposit(clients[i % len(clients)], DepositType.DEMAND, 100.0, 1.0)
+    return [d.deposit_id for d in banking_system.get_all_deposits()]
+
+
+def test_concurrent_operations_not_lost(any_system):
+    banking_system = any_system
+    deposit_ids = _open_deposits(banking_system, 50)
+    executor = ShardedExecutor(banking_system, workers=4, max_batch=16)
+    submitted = [[] for _ in range(4)]
+    transfers = [[] for _ in range(4)]
+
+    def produce(seed: int, out: list):
+        rng = random.Random(seed)
+        for _ in range(1000):
+            deposit_id, amount = rng.choice(deposit_ids), float(rng.randint(1, 50))
+            if rng.random() < 0.2:
+                transfers[seed].append(executor.transfer(deposit_id, rng.choice(deposit_ids), amount))
+                continue
+            withdraw = rng.random() < 0.5
+            submit = executor.withdraw_funds if withdraw else executor.deposit_funds
+            out.append((deposit_id, -amount if withdraw else amount, submit(deposit_id, amount)))
+
+    producers = [threading.Thread(target=produce, args=(seed, out)) for seed, out in enumerate(submitted)]
+    for thread in producers:
+        thread.start()
+    for thread in producers:
+        thread.join()
+    executor.close()
+
+    # Переводы не меняют общий баланс, а баланс каждого вклада сходится с историей его счёта
+    total = 100.0 * len(deposit_ids)
+    applied = 0
+    for out in submitted:
+        for deposit_id, delta, future in out:
+            if future.result():
+                total += delta
+                applied += 1
+    transferred = sum(future.result() for out in transfers for future in out)
+    assert applied > 1500 and transferred > 300
+    transactions = 0
+    for deposit_id in deposit_ids:
+        deposit = banking_system.get_deposit(deposit_id)
+        history = banking_system.get_account_transactions(deposit.account_id)
+        assert abs(deposit.balance - sum(BALANCE_SIGN[t.transaction_type] * t.amount for t in history)) < 1e-6
+        total -= deposit.balance
+        transactions += len(history)
+    assert abs(total) < 1e-6
+    # По транзакции на открытие вклада и на каждую проведённую операцию, по две — на перевод
+    assert transactions == len(deposit_ids) + applied + 2 * transferred
+
+
+def test_transfer_ordered_with_both_deposits(any_system):
+    banking_system = any_system
+    deposit_ids = _open_deposits(banking_system, 16)
+    executor = ShardedExecutor(banking_system, workers=4)
+    rng = random.Random(5)
+    results = []
+    for _ in range(200):
+        source, target = rng.sample(deposit_ids, 2)
+        # Перевод проходит, только если выполнен после пополнения источника,
+        # а снятие с получателя — только если выполнено после перевода
+        results.append((executor.deposit_funds(source, 1000.0),
+                        executor.transfer(source, target, 1000.0),
+                        executor.withdraw_funds(target, 1000.0)))
+    executor.close()
+    assert all(future.result() for futures in results for future in futures)
+    assert [banking_system.get_deposit(deposit_id).balance for deposit_id in deposit_ids] == [100.0] * 16
@@ -0,0 +1,284 @@
+import os
+import random
+import threading
+import time
+
+import pytest
+
+import filedatabase
+from account import Account, AccountCategory
+from bankingsystem import BankingSystem
+from client import Client
+from deposit import Deposit, DepositType
+from filedatabase import FileDatabase
+from transactionstore import TransactionStore
+from utils import file_stamp, read_file, read_snapshot
+
+
+@pytest.mark.parametrize("background_writer", [False, True])
+def test_tables_match_full_serialization(tmp_path, background_writer):
+    # Таблицы переписываются из кэша строк; после любых операций файлы должны совпадать с полной сериализацией
+    data_dir = str(tmp_path / "data")
+    banking_system = BankingSystem("file", data_dir, background_writer)
+    db = banking_system.db
+    rng = random.Random(11)
+    for i in range(20):
+        banking_system.add_client(f"Клиент {i}")
+    clients = [c.client_id for c in banking_system.get_all_clients()]
+    for _ in range(60):
+        banking_system.add_deposit(rng.choice(clients), rng.choice(list(DepositType)), float(rng.randint(0, 900)), 5.0)
+    deposits = [d.deposit_id for d in banking_system.get_all_deposits()]
+    for _ in range(300):
+        deposit_id, r = rng.choice(deposits), rng.random()
+        if r < 0.3:
+            banking_system.deposit_funds(deposit_id, float(rng.randint(1, 100)))
+        elif r < 0.5:
+            banking_system.withdraw_funds(deposit_id, float(rng.randint(1, 100)))
+        elif r < 0.65:
+            banking_system.transfer(deposit_id, rng.choice(deposits), float(rng.randint(1, 100)))
+        elif r < 0.7:
+            banking_system.close_deposit(deposit_id)
+        elif r < 0.75:
+            db.add_account(deposit_id, AccountCategory.STANDARD)
+        elif r < 0.85:
+            banking_system.update_client(rng.choice(clients), f"Клиент {rng.randint(100, 999)}")
+        elif r < 0.9:
+            client_id = rng.choice(clients)
+            if banking_system.delete_client(client_id):
+                clients.remove(client_id)
+        else:
+            banking_system.add_client(f"Новый клиент {rng.randint(0, 99)}")
+            clients = [c.client_id for c in banking_system.get_all_clients()]
+        if db.writer is not None:
+            db.writer.wait()
+        for file_path, items in ((db.clients_file, db.clients), (db.deposits_file, db.deposits),
+                                 (db.accounts_file, db.accounts)):
+            assert read_file(file_path) == [item.serialize() for item in items]
+    expected = [d.serialize() for d in db.deposits]
+    banking_system.close()
+
+    banking_system = BankingSystem("file", data_dir)
+    assert [d.serialize() for d in banking_system.db.deposits] == expected
+    banking_system.close()
+
+
+def test_snapshot_written_off_the_lock(tmp_path, monkeypatch):
+    # Снимок по порогу пишется в отдельном потоке: операции не ждут записи, а снимок соответствует сбросу, после
+    # которого он начат
+    data_dir = str(tmp_path / "data")
+    db = FileDatabase(data_dir, snapshot_every=10)
+    release = threading.Event()
+    write_snapshot = filedatabase.write_snapshot
+
+    def slow_write(file_path, state):
+        if file_path == db.snapshot_file:
+            release.wait(5)
+        write_snapshot(file_path, state)
+
+    monkeypatch.setattr(filedatabase, "write_snapshot", slow_write)
+    db.add_client("Иванов Иван")
+    client_id = db.clients[0].client_id
+    db.add_deposit(client_id, DepositType.DEMAND, 0.0, 1.0)
+    deposit_id = db.deposits[0].deposit_id
+    for _ in range(9):
+        db.deposit_funds(deposit_id, 10.0)
+    worker = threading.Thread(target=db.deposit_funds, args=(deposit_id, 10.0))
+    worker.start()
+    worker.join(2)
+    assert not worker.is_alive()
+    # Пока снимок не записан, операции из других потоков выполняются
+    other = threading.Thread(target=db.deposit_funds, args=(deposit_id, 5.0))
+    other.start()
+    other.join(2)
+    assert not other.is_alive()
+    release.set()
+    db._wait_snapshot()
+
+    snapshot = read_snapshot(db.snapshot_file)
+    assert [d.balance for d in snapshot["deposits"]] == [100.0]
+    assert len(snapshot["transactions"]) == 10
+    expected = TransactionStore()
+    expected.extend(db.transactions[row] for row in range(10))
+    assert [list(rows) for rows in snapshot["transactions"].account_rows] == \
+           [list(rows) for rows in expected.account_rows]
+    assert [list(b) for b in snapshot["transactions"].account_balances] == \
+           [list(b) for b in expected.account_balances]
+    assert snapshot["stamps"]["clients"] == file_stamp(db.clients_file)
+    # Без close, как после аварии: снимок дополняется журналом, записанным после него
+    reopened = FileDatabase(data_dir)
+    assert reopened._journal_continues(snapshot["journal_offset"], snapshot["journal_tail"])
+    assert [d.balance for d in reopened.deposits] == [105.0]
+    assert len(reopened.transactions) == 11
+    reopened.close()
+    db.close()
+
+
+def _funded_deposit(db: FileDatabase) -> str:
+    db.add_client("Иванов Иван")
+    db.add_deposit(db.clients[0].client_id, DepositType.DEMAND, 0.0, 1.0)
+    return db.deposits[0].deposit_id
+
+
+def _journal(db: FileDatabase) -> list[tuple[str, float]]:
+    return [(row[0], float(row[3])) for row in read_file(db.transactions_file)]
+
+
+def test_journal_appended_not_rewritten(tmp_path):
+    data_dir = str(tmp_path / "data")
+    db = FileDatabase(data_dir, snapshot_every=None)
+    deposit_id = _funded_deposit(db)
+    for _ in range(5):
+        db.deposit_funds(deposit_id, 10.0)
+    with open(db.transactions_file, "rb") as file:
+        before = file.read()
+    db.withdraw_funds(deposit_id, 3.0)
+    with open(db.transactions_file, "rb") as file:
+        after = file.read()
+    # Новая транзакция дописана в конец, записанные ранее байты не тронуты
+    assert after.startswith(before) and after.count(b"\n") == before.count(b"\n") + 1
+    assert _journal(db) == [(t.transaction_id, t.amount) for t in db.transactions]
+    db.close()
+
+
+def test_torn_journal_record_dropped_on_load(tmp_path):
+    data_dir = str(tmp_path / "data")
+    db = FileDatabase(data_dir, snapshot_every=None)
+    deposit_id = _funded_deposit(db)
+    for _ in range(3):
+        db.deposit_funds(deposit_id, 10.0)
+    expected = [t.serialize() for t in db.transactions]
+    # Запись, недописанная при аварии: без перевода строки
+    with open(db.transactions_file, "a", encoding="utf-8") as file:
+        file.write("T999,1790000000.0,DEP")
+
+    reopened = FileDatabase(data_dir, snapshot_every=None)
+    assert [t.serialize() for t in reopened.transactions] == expected
+    # Следующая запись журнала не склеивается с отрезанной
+    reopened.deposit_funds(deposit_id, 5.0)
+    assert _journal(reopened) == [(t.transaction_id, t.amount) for t in reopened.transactions]
+    assert len(reopened.transactions) == 4
+    reopened.close()
+    db.close()
+
+
+def test_journal_disabled_rewrites_transactions(tmp_path):
+    data_dir = str(tmp_path / "data")
+    db = FileDatabase(data_dir, journal_transactions=False, snapshot_every=None)
+    deposit_id = _funded_deposit(db)
+    for _ in range(3):
+        db.deposit_funds(deposit_id, 10.0)
+    assert _journal(db) == [(t.transaction_id, t.amount) for t in db.transactions]
+    db.close()
+    reopened = FileDatabase(data_dir)
+    assert [t.amount for t in reopened.transactions] == [10.0] * 3
+    reopened.close()
+
+
+def _check_indexes(db: FileDatabase):
+    for items, by_id, key in ((db.clients, db.clients_by_id, "client_id"), (db.deposits, db.deposits_by_id, "deposit_id"),
+                              (db.accounts, db.accounts_by_id, "account_id")):
+        assert len(by_id) == len(items)
+        assert all(by_id[getattr(item, key)] is item for item in items)
+    for client in db.clients:
+        expected = [d for d in db.deposits if d.client_id == client.client_id]
+        assert sorted(map(id, db.get_client_deposits(client.client_id))) == sorted(map(id, expected))
+    assert set(db.deposits_by_client) <= set(db.clients_by_id)
+
+
+def test_indexes_match_lists(tmp_path):
+    # Словари по ID и по клиенту поддерживаются вместе со списками, в том числе при замене объектов и удалении
+    data_dir = str(tmp_path / "data")
+    db = FileDatabase(data_dir)
+    rng = random.Random(5)
+    for i in range(10):
+        db.add_client(f"Клиент {i}")
+    for _ in range(400):
+        clients = [c.client_id for c in db.clients]
+        deposits = [d.deposit_id for d in db.deposits]
+        r = rng.random()
+        if r < 0.2 or not deposits:
+            db.add_deposit(rng.choice(clients), rng.choice(list(DepositType)), float(rng.randint(0, 100)), 5.0)
+        elif r < 0.3:
+            db.add_client(f"Клиент {rng.randint(100, 999)}")
+        elif r < 0.4:
+            db.update_client(Client(rng.choice(clients), f"Клиент {rng.randint(100, 999)}"))
+        elif r < 0.5:
+            db.delete_client(rng.choice(clients))
+        elif r < 0.6:
+            # Новый объект вклада у другого клиента
+            d = db.get_deposit(rng.choice(deposits))
+            db.update_deposit(Deposit(d.deposit_id, d.deposit_type, d.open_date, d.balance, d.interest_rate, d.closed,
+                                      rng.choice(clients), d.account_id))
+        elif r < 0.7:
+            db.add_account(rng.choice(deposits), AccountCategory.STANDARD)
+        elif r < 0.8:
+            a = db.get_account(db.get_deposit(rng.choice(deposits)).account_id)
+            db.update_account(Account(a.account_id, a.status, a.open_date, a.close_date, AccountCategory.PREMIUM))
+        else:
+            deposit = db.get_deposit(rng.choice(deposits))
+            db.close_account(deposit.account_id)
+            db.delete_deposit(deposit.deposit_id)
+        _check_indexes(db)
+    assert db.get_client("C0") is None and db.get_deposit("D0") is None and db.get_account("nope") is None
+    expected = {d.deposit_id: d.client_id for d in db.deposits}
+    db.close()
+
+    reopened = FileDatabase(data_dir)
+    _check_indexes(reopened)
+    assert {d.deposit_id: d.client_id for d in reopened.deposits} == expected
+    reopened.close()
+
+
+def _record_commits(db: FileDatabase, monkeypatch) -> list[list[tuple[str, str]]]:
+    # Каждый коммит — список (режим, имя файла) переданных на запись таблиц
+    commits = []
+    write = db.files.write
+
+    def recording(writes):
+        commits.append([(mode, os.path.basename(path)) for mode, path, _ in writes])
+        write(writes)
+
+    monkeypatch.setattr(db.files, "write", recording)
+    return commits
+
+
+def test_only_dirty_tables_written(tmp_path, monkeypatch):
+    db = FileDatabase(str(tmp_path / "data"), snapshot_every=None)
+    deposit_id = _funded_deposit(db)
+    commits = _record_commits(db, monkeypatch)
+    db.deposit_funds(deposit_id, 10.0)
+    db.update_client(Client(db.clients[0].client_id, "Петров Пётр"))
+    db.deposit_funds("D999", 10.0)
+    assert commits == [[("append", "transactions.csv"), ("rewrite", "deposits.csv")], [("rewrite", "clients.csv")]]
+    db.close()
+
+
+def test_group_commit(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    data_dir = str(tmp_path / "data")
+    db = FileDatabase(data_dir, flush_every=5, flush_interval=60.0, snapshot_every=None)
+    deposit_id = _funded_deposit(db)
+    commits = _record_commits(db, monkeypatch)
+    for _ in range(3):
+        db.deposit_funds(deposit_id, 10.0)
+    # Клиент, вклад и три пополнения: пятая операция сбрасывает всё накопленное одним коммитом
+    assert commits == [[("append", "transactions.csv"), ("append", "deposit_accounts.csv"),
+                        ("rewrite", "accounts.csv"), ("rewrite", "deposits.csv"), ("rewrite", "clients.csv")]]
+    db.deposit_funds(deposit_id, 10.0)
+    assert len(commits) == 1
+    # По времени: следующая операция после flush_interval сбрасывает накопленное, не дожидаясь flush_every
+    clock[0] += 61.0
+    db.deposit_funds(deposit_id, 10.0)
+    assert len(commits) == 2
+    with db.batch():
+        for _ in range(20):
+            db.deposit_funds(deposit_id, 1.0)
+    assert len(commits) == 3
+    db.deposit_funds(deposit_id, 10.0)
+    db.close()
+    assert len(commits) == 4
+    reopened = FileDatabase(data_dir)
+    assert reopened.deposits[0].balance == 80.0
+    assert len(reopened.transactions) == 26
+    reopened.close()
@@ -0,0 +1,178 @@
+import random
+import time
+
+import pytest
+
+from account import AccountCategory
+from bankingsystem import BankingSystem
+from deposit import DepositType
+from transaction import BALANCE_SIGN, Transaction, TransactionType
+from transactionstore import TransactionStore
+
+DAY = 86400
+START = 1_700_000_000
+
+
+@pytest.fixture
+def history(banking_system, monkeypatch):
+    """
+    Несколько вкладов с операциями за полгода (время операций подменяется), в случайном порядке.
+    """
+    clock = [START]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+    rng = random.Random(16)
+    for i in range(3):
+        banking_system.add_client(f"Клиент {i}")
+    clients = [c.client_id for c in banking_system.get_all_clients()]
+    for _ in range(6):
+        banking_system.add_deposit(rng.choice(clients), rng.choice(list(DepositType)), 1000.0, 5.0)
+    deposits = [d.deposit_id for d in banking_system.get_all_deposits()]
+    for _ in range(400):
+        clock[0] += rng.randint(0, DAY)
+        deposit_id = rng.choice(deposits)
+        if rng.random() < 0.5:
+            banking_system.deposit_funds(deposit_id, float(rng.randint(1, 100)))
+        else:
+            banking_system.withdraw_funds(deposit_id, float(rng.randint(1, 100)))
+    banking_system.close_deposit(deposits[0])
+    return banking_system, deposits
+
+
+def _replay(transactions: list[Transaction], date: float) -> float:
+    return sum(BALANCE_SIGN[t.transaction_type] * t.amount for t in transactions if t.date <= date)
+
+
+def test_balance_as_of_matches_replay(history):
+    banking_system, deposits = history
+    end = max(t.date for d in deposits
+              for t in banking_system.get_account_transactions(banking_system.get_deposit(d).account_id))
+    for deposit_id in deposits:
+        account_id = banking_system.get_deposit(deposit_id).account_id
+        transactions = banking_system.get_account_transactions(account_id)
+        for date in range(START - DAY, int(end) + 2 * DAY, DAY // 3):
+            expected = _replay(transactions, date)
+            assert banking_system.get_deposit_balance_as_of(deposit_id, date) == pytest.approx(expected)
+
+
+def test_book_balance_as_of_matches_replay(history):
+    banking_system, deposits = history
+    date = START + 60 * DAY
+    expected = dict.fromkeys(DepositType, 0.0)
+    for deposit_id in deposits:
+        deposit = banking_system.get_deposit(deposit_id)
+        expected[deposit.deposit_type] += _replay(banking_system.get_account_transactions(deposit.account_id), date)
+    actual = banking_system.db.book_balance_as_of(date)
+    assert actual == pytest.approx(expected)
+
+
+def test_store_out_of_order_insert():
+    store = TransactionStore()
+    dates = [10, 30, 20, 5, 30, 25]
+    for i, date in enumerate(dates):
+        store.append(Transaction(f"T{i}", date, TransactionType.DEPOSIT, float(i + 1), "A1"))
+    transactions = list(store)
+    for date in range(0, 40):
+        assert store.balance_as_of("A1", date) == pytest.approx(_replay(transactions, date))
+
+
+def test_range_queries_match_filter(history):
+    banking_system, deposits = history
+    db = banking_system.db
+    rng = random.Random(3)
+    everything = db.get_all_transactions()
+    for deposit_id in deposits:
+        account_id = banking_system.get_deposit(deposit_id).account_id
+        # По дате, при равных датах — в порядке записи
+        expected = sorted((t for t in everything if t.account_id == account_id),
+                          key=lambda t: (t.date, int(t.transaction_id[1:])))
+        dates = [t.date for t in expected]
+        for _ in range(30):
+            # Границы — и даты самих операций (включаются), и произвольные моменты, и отсутствие границы
+            from_date, to_date = (rng.choice([None, rng.choice(dates), rng.uniform(START, dates[-1])])
+                                  for _ in range(2))
+            if from_date is not None and to_date is not None and from_date > to_date:
+                from_date, to_date = to_date, from_date
+            selected = [t.transaction_id for t in expected
+                        if (from_date is None or t.date >= from_date) and (to_date is None or t.date <= to_date)]
+            limit = rng.choice([None, 1, 5])
+            ascending = [t.transaction_id for t in
+                         banking_system.query_account_transactions(account_id, from_date, to_date, False, limit)]
+            descending = [t.transaction_id for t in
+                          banking_system.query_account_transactions(account_id, from_date, to_date, True, limit)]
+            assert ascending == selected[:limit]
+            assert descending == selected[::-1][:limit]
+            assert db.count_account_transactions(account_id, from_date, to_date) == len(selected)
+            assert [t.transaction_id for t in db.iter_account_transactions(account_id, from_date, to_date, False)] \
+                   == selected
+    assert banking_system.query_account_transactions("A999999", None, None) == []
+
+def test_account_transactions_pages(history):
+    banking_system, deposits = history
+    account_id = banking_system.get_deposit(deposits[1]).account_id
+    expected = banking_system.query_account_transactions(account_id, START + 10 * DAY, START + 90 * DAY)
+    seen, cursor = [], None
+    while True:
+        page = banking_system.get_account_transactions_page(account_id, cursor, 7, START + 10 * DAY, START + 90 * DAY)
+        seen += page.items
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert [t.transaction_id for t in seen] == [t.transaction_id for t in expected]
+
+
+def test_clients_and_transactions_pages(history):
+    banking_system, deposits = history
+    clients, cursor = [], None
+    while True:
+        page = banking_system.get_clients_page(cursor, 2)
+        clients += [c.client_id for c in page.items]
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert clients == [c.client_id for c in banking_system.get_all_clients()]
+
+    transactions, cursor = [], None
+    while True:
+        page = banking_system.get_transactions_page(cursor, 33)
+        transactions += [t.transaction_id for t in page.items]
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    expected = {t.transaction_id for d in deposits
+                for t in banking_system.get_account_transactions(banking_system.get_deposit(d).account_id)}
+    assert len(transactions) == len(expected)
+    assert set(transactions) == expected
+
+
+@pytest.mark.parametrize("backend", ["file", "sqlite"])
+def test_history_survives_account_change_and_deletion(backend, tmp_path, monkeypatch):
+    clock = [START]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+    data_dir = str(tmp_path / "data")
+    banking_system = BankingSystem(backend, data_dir)
+    banking_system.add_client("Иванов Иван")
+    client_id = banking_system.get_all_clients()[0].client_id
+    banking_system.add_deposit(client_id, DepositType.SAVINGS, 200.0, 5.0)
+    banking_system.add_deposit(client_id, DepositType.DEMAND, 50.0, 1.0)
+    moved, deleted = [d.deposit_id for d in banking_system.get_client_deposits(client_id)]
+    clock[0] += DAY
+    # Вклад переходит на новый счёт, история остаётся на прежнем
+    assert banking_system.db.add_account(moved, AccountCategory.PREMIUM)
+    clock[0] += DAY
+    banking_system.deposit_funds(moved, 30.0)
+    clock[0] += DAY
+    banking_system.close_deposit(deleted)
+    assert banking_system.db.delete_deposit(deleted)
+    banking_system.close()
+
+    banking_system = BankingSystem(backend, data_dir)
+    assert banking_system.get_deposit_balance_as_of(moved, START) == 200.0
+    assert banking_system.get_deposit_balance_as_of(moved, START + 2 * DAY) == 230.0
+    # Удалённый вклад учитывается в портфеле на даты, когда он ещё был открыт
+    assert banking_system.get_deposit_balance_as_of(deleted, START) == 50.0
+    book = banking_system.db.book_balance_as_of(START + DAY)
+    assert book[DepositType.SAVINGS] == 200.0 and book[DepositType.DEMAND] == 50.0
+    book = banking_system.db.book_balance_as_of(START + 3 * DAY)
+    assert book[DepositType.SAVINGS] == 230.0 and book[DepositType.DEMAND] == 0.0
+    assert banking_system.get_deposit_balance_as_of("D999", START) is None
+    banking_system.close()
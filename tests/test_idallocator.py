@@ -0,0 +1,100 @@
+import threading
+
+import idallocator
+from bankingsystem import BankingSystem
+from deposit import DepositType
+from idallocator import IdAllocator
+
+
+def _count_saves(monkeypatch) -> list:
+    saves = []
+    write_to_file = idallocator.write_to_file
+
+    def recording(file_path, rows, **options):
+        saves.append(rows)
+        write_to_file(file_path, rows, **options)
+
+    monkeypatch.setattr(idallocator, "write_to_file", recording)
+    return saves
+
+
+def test_blocks_reserved_on_disk(tmp_path, monkeypatch):
+    saves = _count_saves(monkeypatch)
+    file_path = str(tmp_path / "sequences.csv")
+    ids = IdAllocator(file_path, block_size=10)
+    assert [ids.allocate("T") for _ in range(25)] == [f"T{i}" for i in range(1, 26)]
+    # На диск пишется только граница блока: по разу на каждые block_size номеров
+    assert saves == [[["T", "11"]], [["T", "21"]], [["T", "31"]]]
+    assert ids.allocate_many("T", 12) == [f"T{i}" for i in range(26, 38)]
+    assert saves[-1] == [["T", "47"]]
+
+    # После аварии (без close) остаток блока пропускается, номера не повторяются
+    restarted = IdAllocator(file_path, block_size=10)
+    assert restarted.allocate("T") == "T47"
+    restarted.close()
+    # После штатного закрытия нумерация продолжается без пропусков
+    assert IdAllocator(file_path, block_size=10).allocate("T") == "T48"
+
+
+def test_seed_continues_existing_ids(tmp_path):
+    ids = IdAllocator(str(tmp_path / "sequences.csv"))
+    ids.seed("C", ["C3", "C17", "X99", "Cabc"])
+    assert ids.allocate("C") == "C18"
+    # Последовательность уже в файле: существующие ID не сдвигают её
+    ids = IdAllocator(str(tmp_path / "sequences.csv"))
+    ids.seed("C", ["C500"])
+    assert ids.allocate("C") != "C501"
+
+
+def test_step_and_offset_give_disjoint_ids(tmp_path):
+    allocators = [IdAllocator(str(tmp_path / f"sequences{i}.csv"), block_size=5, step=3, offset=i) for i in range(3)]
+    issued = []
+    for _ in range(2):
+        for offset, ids in enumerate(allocators):
+            numbers = [int(ids.allocate("D")[1:]) for _ in range(7)] + [int(i[1:]) for i in ids.allocate_many("D", 7)]
+            assert all(number % 3 == offset for number in numbers)
+            issued += numbers
+        # Перезапуск без close
+        allocators = [IdAllocator(str(tmp_path / f"sequences{i}.csv"), block_size=5, step=3, offset=i)
+                      for i in range(3)]
+    assert len(issued) == len(set(issued))
+
+
+def test_concurrent_allocation_unique(tmp_path):
+    ids = IdAllocator(str(tmp_path / "sequences.csv"), block_size=7)
+    issued = []
+
+    def allocate():
+        for _ in range(200):
+            issued.append(ids.allocate("T"))
+            issued.extend(ids.allocate_many("T", 3))
+
+    threads = [threading.Thread(target=allocate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(issued)) == len(issued) == 4 * 200 * 4
+
+
+def test_sharded_ids_unique_across_restarts(tmp_path):
+    data_dir = str(tmp_path / "data")
+    seen = set()
+    for _ in range(3):
+        # Каждый раз — без close, как после аварии
+        banking_system = BankingSystem("sharded", data_dir)
+        for i in range(6):
+            banking_system.add_client(f"Клиент {i}")
+        for client in banking_system.get_all_clients():
+            banking_system.add_deposit(client.client_id, DepositType.DEMAND, 10.0, 1.0)
+        db = banking_system.db
+        for index, shard in enumerate(db.shards):
+            assert all(int(d.deposit_id[1:]) % db.count == index for d in shard.deposits)
+        ids = [c.client_id for c in banking_system.get_all_clients()] + \
+              [d.deposit_id for d in banking_system.get_all_deposits()] + \
+              [a.account_id for shard in db.shards for a in shard.accounts] + \
+              [t.transaction_id for shard in db.shards for t in shard.transactions]
+        assert len(ids) == len(set(ids))
+        seen |= set(ids)
+    # Записи прежних запусков на месте, новые ID с ними не совпали
+    assert seen == set(ids)
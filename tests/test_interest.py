@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+import interest
+from deposit import Deposit, DepositType
+from interest import compute_interest
+from transaction import TransactionType
+
+TO_DATE = 1_800_000_000.0
+
+
+def _random_deposits(count: int) -> list[Deposit]:
+    rng = random.Random(10)
+    return [Deposit(f"D{i}", rng.choice(list(DepositType)), TO_DATE - rng.randint(-86400, 86400 * 800),
+                    float(rng.randint(0, 10 ** 6)) / 100, rng.randint(0, 200) / 10, False, "C1", f"A{i}")
+            for i in range(count)]
+
+
+@pytest.mark.parametrize("implementation", ["python", "numpy"])
+def test_compute_interest_matches_deposit_formula(implementation, monkeypatch):
+    if implementation == "numpy":
+        monkeypatch.setattr(interest, "np", pytest.importorskip("numpy"))
+    else:
+        monkeypatch.setattr(interest, "np", None)
+    deposits = _random_deposits(1000)
+    interests = compute_interest([d.balance for d in deposits], [d.interest_rate for d in deposits],
+                                 [d.open_date for d in deposits], TO_DATE)
+    assert interests == pytest.approx([d.calculate_interest(TO_DATE) for d in deposits], rel=1e-12)
+    assert compute_interest([], [], [], TO_DATE) == []
+
+
+def test_accrue_interest_matches_per_deposit(banking_system):
+    rng = random.Random(4)
+    banking_system.add_client("Иванов Иван")
+    client_id = banking_system.get_all_clients()[0].client_id
+    for _ in range(40):
+        banking_system.add_deposit(client_id, rng.choice(list(DepositType)), float(rng.randint(0, 5000)),
+                                   float(rng.randint(0, 12)))
+    deposits = banking_system.get_all_deposits()
+    for deposit in deposits[:5]:
+        banking_system.close_deposit(deposit.deposit_id)
+    deposits = {d.deposit_id: d for d in banking_system.get_all_deposits()}
+    to_date = max(d.open_date for d in deposits.values()) + 86400 * 100
+    # Закрытые вклады, вклады другого типа и вклады с нулевыми процентами не меняются
+    expected = {d.deposit_id: d.calculate_interest(to_date) for d in deposits.values()
+                if d.deposit_type == DepositType.SAVINGS and not d.closed and d.calculate_interest(to_date) > 0}
+    balances = {d.deposit_id: d.balance for d in deposits.values()}
+
+    accrued = banking_system.accrue_interest(to_date, DepositType.SAVINGS)
+    assert accrued == pytest.approx(expected)
+    for deposit in banking_system.get_all_deposits():
+        assert deposit.balance == pytest.approx(balances[deposit.deposit_id] + expected.get(deposit.deposit_id, 0.0))
+        interests = [t.amount for t in banking_system.get_account_transactions(deposit.account_id)
+                     if t.transaction_type == TransactionType.INTEREST]
+        assert interests == pytest.approx([expected[deposit.deposit_id]] if deposit.deposit_id in expected else [])
+    # Сводка портфеля учитывает начисление
+    stats = banking_system.db.portfolio_stats()
+    assert stats.balance[DepositType.SAVINGS] == pytest.approx(
+        sum(d.balance for d in banking_system.get_all_deposits()
+            if d.deposit_type == DepositType.SAVINGS and not d.closed))
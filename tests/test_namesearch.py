@@ -0,0 +1,106 @@
+import os
+import random
+
+import pytest
+
+from bankingsystem import BankingSystem
+from filedatabase import FileDatabase
+from namesearch import NameIndex, normalize_name, search_key
+
+
+def test_search_matches_brute_force():
+    rng = random.Random(18)
+    names = ["Иванов", "Петров", "Сидорова", "Ёлкина", "Смирнов", "Кузнецова"]
+    index = NameIndex()
+    people = {}
+    for i in range(500):
+        client_id = f"C{i}"
+        people[client_id] = f"{rng.choice(names)} {rng.choice(names)}"
+        index.add(client_id, people[client_id])
+    for client_id in rng.sample(sorted(people), 100):
+        index.remove(client_id)
+        del people[client_id]
+    for query in ["ов", "Ив", "елк", "ВА СИ", "x", "нов"]:
+        for prefix in (False, True):
+            key = search_key(query, prefix)
+            expected = [c for c in people if key in normalize_name(people[c])]
+            expected.sort(key=lambda c: int(c[1:]))
+            assert index.search(query, prefix=prefix) == expected
+
+
+def test_index_is_built_at_load_and_persisted(tmp_path):
+    data_dir = str(tmp_path)
+    db = FileDatabase(data_dir)
+    db.add_client("Иванов Иван")
+    db.add_client("Петрова Анна")
+    db.close()
+    assert os.path.exists(f"{data_dir}/names.bin")
+
+    db = FileDatabase(data_dir)
+    # Индекс загружен из файла, а не построен заново
+    assert db._name_index_saved
+    assert [c.full_name for c in db.search_clients("петр")] == ["Петрова Анна"]
+    db.close()
+
+    # Файл клиентов изменён в обход хранилища — сохранённый индекс устарел и строится заново при загрузке
+    with open(f"{data_dir}/clients.csv", "a", encoding="utf-8") as file:
+        file.write("C99,Сидоров Пётр\n")
+    db = FileDatabase(data_dir)
+    assert not db._name_index_saved
+    assert [c.full_name for c in db.search_clients("петр")] == ["Петрова Анна", "Сидоров Пётр"]
+    db.close()
+
+
+NAMES = ["Ёлкин Пётр", "ЁЖИКОВА Алёна", "José Álvarez", "Straße Jürgen", "Ωμέγα Δέλτα", "O'Brien Seán",
+         "Анна-Мария Ли", "Ли Во", "Ng", "Ян", "小林 一茶", "Ибн Сина 2-й"]
+
+
+def _short_queries(rng: random.Random) -> list[str]:
+    # Запросы короче триграммы, на стыке слов, с другим регистром и «ё»/«е», а также нелатинские
+    queries = ["е", "Ё", "ли", "Ли", " ли", "ян", "ß", "ss", "ω", "ΔΈ", "á", "'", "-", "2", "小", "林 一", "n", "ng",
+               "  ", "", "ж", "ЕЛ", "ёл"]
+    for _ in range(40):
+        name = rng.choice(NAMES)
+        start = rng.randrange(len(name))
+        text = name[start:start + rng.randint(1, 4)]
+        queries.append(text.upper() if rng.random() < 0.3 else text)
+    return queries
+
+
+def _expected(people: dict[str, str], query: str, prefix: bool) -> list[str]:
+    key = search_key(query, prefix)
+    if not key.strip():
+        return []
+    return [name for name in people.values() if key in normalize_name(name)]
+
+
+def test_short_and_non_ascii_queries():
+    rng = random.Random(11)
+    index = NameIndex()
+    people = {}
+    for i, name in enumerate(NAMES):
+        index.add(f"C{i}", name)
+        people[f"C{i}"] = name
+    # Переименование: прежнее ФИО больше не находится
+    index.add("C0", "Ёлкина Вера")
+    people["C0"] = "Ёлкина Вера"
+    for query in _short_queries(rng):
+        for prefix in (False, True):
+            found = [people[client_id] for client_id in index.search(query, prefix=prefix)]
+            assert found == _expected(people, query, prefix), (query, prefix)
+    assert index.search("пётр") == []
+    assert index.search("е", limit=2) == ["C0", "C1"]
+
+
+@pytest.mark.parametrize("backend", ["file", "sqlite", "sharded"])
+def test_backends_search_short_and_non_ascii(backend, tmp_path):
+    banking_system = BankingSystem(backend, str(tmp_path / "data"))
+    for name in NAMES:
+        banking_system.add_client(name)
+    people = {c.client_id: c.full_name for c in banking_system.get_all_clients()}
+    rng = random.Random(12)
+    for query in _short_queries(rng):
+        for prefix in (False, True):
+            found = [c.full_name for c in banking_system.search_clients(query, prefix=prefix)]
+            assert found == _expected(people, query, prefix), (query, prefix)
+    banking_system.close()
@@ -0,0 +1,82 @@
+import base64
+
+import pytest
+
+from bankingsystem import BankingSystem
+from deposit import DepositType
+from pagination import NUMBER, decode_cursor, encode_cursor
+
+
+@pytest.fixture(params=["file", "sqlite", "sharded"])
+def any_system(request, tmp_path):
+    banking_system = BankingSystem(request.param, str(tmp_path / "data"))
+    yield banking_system
+    banking_system.close()
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    assert decode_cursor(encode_cursor(1790000000.5, 17), NUMBER, int) == [1790000000.5, 17]
+    assert decode_cursor(encode_cursor(3, "C7"), int, str) == [3, "C7"]
+    bad = ["", "%%%", base64.urlsafe_b64encode(b"not json").decode(), base64.urlsafe_b64encode(b'{"a": 1}').decode(),
+           encode_cursor(), encode_cursor(1), encode_cursor(1, 2), encode_cursor(1.5, "C1"), encode_cursor(1, "C1", 2)]
+    for cursor in bad:
+        with pytest.raises(ValueError):
+            decode_cursor(cursor, int, str)
+
+
+def _book(banking_system) -> str:
+    for i in range(10):
+        banking_system.add_client(f"Клиент {i}")
+    client_id = banking_system.get_all_clients()[0].client_id
+    banking_system.add_deposit(client_id, DepositType.DEMAND, 100.0, 1.0)
+    deposit_id = banking_system.get_client_deposits(client_id)[0].deposit_id
+    for _ in range(20):
+        banking_system.deposit_funds(deposit_id, 1.0)
+    return deposit_id
+
+
+def test_malformed_cursor_rejected(any_system):
+    deposit_id = _book(any_system)
+    account_id = any_system.get_deposit(deposit_id).account_id
+    for cursor in ("%%%", encode_cursor(), encode_cursor("x", "y", "z", "w")):
+        with pytest.raises(ValueError):
+            any_system.get_clients_page(cursor, 3)
+        with pytest.raises(ValueError):
+            any_system.get_transactions_page(cursor, 3)
+        with pytest.raises(ValueError):
+            any_system.get_account_transactions_page(account_id, cursor, 3)
+
+
+def test_pages_stable_under_changes(any_system):
+    deposit_id = _book(any_system)
+    account_id = any_system.get_deposit(deposit_id).account_id
+    clients = [c.client_id for c in any_system.get_all_clients()]
+    seen, cursor, step = [], None, 0
+    while True:
+        page = any_system.get_clients_page(cursor, 3)
+        seen += [c.client_id for c in page.items]
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+        # Между запросами удаляются выданный и ещё не выданный клиенты и добавляются новые
+        step += 1
+        if step == 1:
+            any_system.delete_client(seen[-1])
+            any_system.delete_client(clients[-2])
+        any_system.add_client(f"Новый {step}")
+    assert len(seen) == len(set(seen))
+    assert set(clients) - {clients[-2]} <= set(seen)
+
+    # Новые операции между запросами не сдвигают страницы: выдаются ровно записи, бывшие до начала обхода
+    for fetch in (lambda c: any_system.get_transactions_page(c, 4),
+                  lambda c: any_system.get_account_transactions_page(account_id, c, 4)):
+        before = [t.transaction_id for t in any_system.get_account_transactions(account_id)]
+        seen, cursor = [], None
+        while True:
+            page = fetch(cursor)
+            seen += [t.transaction_id for t in page.items]
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+            any_system.deposit_funds(deposit_id, 1.0)
+        assert seen == before
@@ -0,0 +1,57 @@
+import asyncio
+import random
+
+from deposit import DepositType
+from parallelreports import ReportEngine
+
+
+def test_split_keeps_order():
+    engine = ReportEngine(None, workers=4, min_shard_size=10)
+    for count in (0, 1, 9, 10, 39, 40, 41, 1000):
+        rows = [(i,) for i in range(count)]
+        shards = engine._split(rows)
+        assert [row for shard in shards for row in shard] == rows
+        assert len(shards) <= max(1, min(4, count // 10))
+
+
+def test_empty_book(banking_system):
+    engine = ReportEngine(banking_system, workers=3, min_shard_size=5)
+    try:
+        assert asyncio.run(engine.all_clients_report()) == "".join(banking_system.iter_all_clients_report())
+        assert asyncio.run(engine.deposit_type_report(DepositType.TERM)) == \
+               "".join(banking_system.iter_deposit_type_report(DepositType.TERM))
+    finally:
+        engine.close()
+
+
+def test_parallel_reports_match_sequential(banking_system):
+    rng = random.Random(14)
+    for i in range(30):
+        banking_system.add_client(f"Клиент {i}")
+    clients = [c.client_id for c in banking_system.get_all_clients()]
+    for _ in range(90):
+        banking_system.add_deposit(rng.choice(clients), rng.choice(list(DepositType)), float(rng.randint(0, 5000)),
+                                   float(rng.randint(1, 12)))
+    # Маленькие шарды, чтобы отчёт действительно собирался из фрагментов нескольких процессов
+    engine = ReportEngine(banking_system, workers=3, min_shard_size=5)
+    try:
+        async def render() -> tuple:
+            return (await engine.all_clients_report(),
+                    *[await engine.deposit_type_report(dep_type) for dep_type in DepositType],
+                    await engine.system_summary_report())
+
+        reports = asyncio.run(render())
+        assert engine._executor is not None
+        expected = ("".join(banking_system.iter_all_clients_report()),
+                    *["".join(banking_system.iter_deposit_type_report(dep_type)) for dep_type in DepositType],
+                    banking_system.generate_system_summary_report())
+        assert reports == expected
+        # Готовые отчёты берутся из кэша, пока данные не изменились
+        hits = banking_system.report_cache.hits
+        assert asyncio.run(engine.all_clients_report()) == expected[0]
+        assert banking_system.report_cache.hits == hits + 1
+        banking_system.deposit_funds(banking_system.get_all_deposits()[0].deposit_id, 1.0)
+        assert asyncio.run(engine.all_clients_report()) == "".join(banking_system.iter_all_clients_report())
+        assert banking_system.report_cache.hits == hits + 1
+    finally:
+        engine.close()
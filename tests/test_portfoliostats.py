@@ -0,0 +1,98 @@
+import random
+
+import pytest
+
+from deposit import Deposit, DepositType
+from portfoliostats import PortfolioStats
+from reportexport import format_client_line
+
+
+def _snapshot(stats: PortfolioStats) -> tuple:
+    return (stats.deposits, stats.closed, dict(stats.count),
+            {t: round(b, 6) for t, b in stats.balance.items()}, {t: round(r, 6) for t, r in stats.rate_sum.items()},
+            {c: (t.deposits, t.active, round(t.balance, 6)) for c, t in stats.by_client.items()})
+
+
+def test_incremental_stats_match_rebuild():
+    rng = random.Random(7)
+    deposits = [Deposit(f"D{i}", rng.choice(list(DepositType)), 0, float(rng.randint(0, 1000)),
+                        float(rng.randint(1, 10)), False, f"C{rng.randint(1, 20)}", f"A{i}") for i in range(200)]
+    stats = PortfolioStats(deposits)
+    for _ in range(2000):
+        deposit = rng.choice(deposits)
+        r = rng.random()
+        if r < 0.5 and not deposit.closed:
+            delta = float(rng.randint(-50, 50))
+            deposit.balance += delta
+            stats.change_balance(deposit, delta)
+        elif r < 0.9:
+            # Изменение на месте, о котором сводка узнаёт только из update
+            deposit.balance = float(rng.randint(0, 1000))
+            deposit.interest_rate = float(rng.randint(1, 10))
+            deposit.deposit_type = rng.choice(list(DepositType))
+            deposit.client_id = f"C{rng.randint(1, 20)}"
+            stats.update(deposit)
+        elif not deposit.closed:
+            stats.close(deposit)
+            deposit.closed = True
+    assert _snapshot(stats) == _snapshot(PortfolioStats(deposits))
+
+
+def test_update_deposit_in_place(file_system):
+    file_system.add_client("Иванов Иван")
+    client_id = file_system.get_all_clients()[0].client_id
+    file_system.add_deposit(client_id, DepositType.SAVINGS, 100.0, 5.0)
+    deposit = file_system.get_client_deposits(client_id)[0]
+    deposit.balance = 250.0
+    deposit.interest_rate = 7.0
+    assert file_system.db.update_deposit(deposit)
+    stats = file_system.db.portfolio_stats()
+    assert stats.balance[DepositType.SAVINGS] == 250.0
+    assert stats.rate_sum[DepositType.SAVINGS] == 7.0
+    assert file_system.get_client_totals(client_id).balance == 250.0
+
+
+def test_all_clients_report_matches_deposits(banking_system):
+    # Отчёт по всем клиентам строится по итогам клиентов; они должны совпадать с пересчётом по вкладам
+    rng = random.Random(12)
+    for i in range(12):
+        banking_system.add_client(f"Клиент {i}")
+    for _ in range(250):
+        clients = [c.client_id for c in banking_system.get_all_clients()]
+        deposits = banking_system.get_all_deposits()
+        r = rng.random()
+        if r < 0.25 or not deposits:
+            banking_system.add_deposit(rng.choice(clients), rng.choice(list(DepositType)),
+                                       float(rng.randint(0, 1000)), float(rng.randint(1, 10)))
+            continue
+        deposit = rng.choice(deposits)
+        if r < 0.45:
+            banking_system.deposit_funds(deposit.deposit_id, float(rng.randint(1, 300)))
+        elif r < 0.6:
+            banking_system.withdraw_funds(deposit.deposit_id, float(rng.randint(1, 300)))
+        elif r < 0.7:
+            banking_system.transfer(deposit.deposit_id, rng.choice(deposits).deposit_id, float(rng.randint(1, 300)))
+        elif r < 0.78:
+            banking_system.close_deposit(deposit.deposit_id)
+        elif r < 0.84:
+            banking_system.db.update_deposit(Deposit(deposit.deposit_id, deposit.deposit_type, deposit.open_date,
+                                                     deposit.balance, deposit.interest_rate, deposit.closed,
+                                                     rng.choice(clients), deposit.account_id))
+        elif r < 0.9:
+            banking_system.delete_client(rng.choice(clients))
+        elif r < 0.95:
+            banking_system.update_client(rng.choice(clients), f"Клиент {rng.randint(100, 999)}")
+        else:
+            banking_system.accrue_interest(deposit.open_date + 86400 * 30)
+
+    clients = banking_system.get_all_clients()
+    expected = []
+    for client in clients:
+        active = [d for d in banking_system.get_client_deposits(client.client_id) if not d.closed]
+        expected.append((client.client_id, client.full_name, len(active), sum(d.balance for d in active)))
+    rows = list(banking_system.all_clients_rows())
+    assert [(r["client_id"], r["full_name"], r["active_deposits"]) for r in rows] == [e[:3] for e in expected]
+    assert [r["active_balance"] for r in rows] == pytest.approx([e[3] for e in expected])
+    report = banking_system.generate_all_clients_report()
+    assert report.startswith(f"ОТЧЕТ ПО ВСЕМ КЛИЕНТАМ\n=====================\nВсего клиентов: {len(clients)}\n")
+    assert report.endswith("".join(format_client_line(*fields) for fields in expected))
@@ -0,0 +1,94 @@
+import pytest
+
+import bankingsystem
+from bankingsystem import BankingSystem
+from deposit import DepositType
+
+
+def _statement_account(banking_system, operations: int) -> str:
+    banking_system.add_client("Иванов Иван")
+    client_id = banking_system.get_all_clients()[0].client_id
+    banking_system.add_deposit(client_id, DepositType.DEMAND, 100.0, 1.0)
+    deposit = banking_system.get_client_deposits(client_id)[0]
+    with banking_system.batch():
+        for _ in range(operations):
+            banking_system.deposit_funds(deposit.deposit_id, 1.0)
+    return deposit.account_id
+
+
+def test_large_statement_streamed_past_cache(banking_system, monkeypatch):
+    monkeypatch.setattr(bankingsystem, "MAX_CACHED_STATEMENT_ROWS", 10)
+    account_id = _statement_account(banking_system, 30)
+    lines = banking_system.transaction_report_lines(account_id, 0, 4e9)
+    # Большая выписка — построчно, по строке на операцию, и в кэш не попадает
+    assert not isinstance(lines, tuple)
+    lines = list(lines)
+    assert len(lines) > 31
+    assert banking_system.generate_transaction_report(account_id, 0, 4e9) == "".join(lines)
+    assert banking_system.report_cache.size == 0
+
+    monkeypatch.setattr(bankingsystem, "MAX_CACHED_STATEMENT_ROWS", 100)
+    report = banking_system.generate_transaction_report(account_id, 0, 4e9)
+    assert banking_system.transaction_report_lines(account_id, 0, 4e9) == (report,)
+    assert banking_system.report_cache.hits == 1
+
+
+@pytest.fixture(params=["file", "sqlite", "sharded"])
+def any_system(request, tmp_path):
+    banking_system = BankingSystem(request.param, str(tmp_path / "data"))
+    yield banking_system
+    banking_system.close()
+
+
+def test_reports_rebuilt_after_writes(any_system):
+    banking_system = any_system
+    for name in ("Иванов Иван", "Петров Пётр"):
+        banking_system.add_client(name)
+    first, second = [c.client_id for c in banking_system.get_all_clients()]
+    for client_id in (first, second):
+        banking_system.add_deposit(client_id, DepositType.SAVINGS, 100.0, 5.0)
+    deposit_id = banking_system.get_client_deposits(first)[0].deposit_id
+    other_id = banking_system.get_client_deposits(second)[0].deposit_id
+    account_id = banking_system.get_deposit(deposit_id).account_id
+    # Отчёт (из кэша), тот же отчёт без кэша и запись, которая его меняет
+    cases = [
+        (lambda: banking_system.generate_client_report(first),
+         lambda: "".join(banking_system.iter_client_report(first)),
+         lambda: banking_system.deposit_funds(deposit_id, 5.0)),
+        (banking_system.generate_all_clients_report,
+         lambda: "".join(banking_system.iter_all_clients_report()),
+         lambda: banking_system.update_client(second, "Сидоров Сидор")),
+        (lambda: banking_system.generate_deposit_type_report(DepositType.SAVINGS),
+         lambda: "".join(banking_system.iter_deposit_type_report(DepositType.SAVINGS)),
+         lambda: banking_system.withdraw_funds(other_id, 30.0)),
+        (lambda: banking_system.generate_top_deposits_report(DepositType.SAVINGS, 1),
+         lambda: "".join(banking_system.iter_top_deposits_report(DepositType.SAVINGS, 1)),
+         lambda: banking_system.transfer(deposit_id, other_id, 80.0)),
+        (lambda: banking_system.generate_transaction_report(account_id, 0, 4e9),
+         lambda: "".join(banking_system.iter_transaction_report(account_id, 0, 4e9)),
+         lambda: banking_system.deposit_funds(deposit_id, 7.0)),
+        (lambda: banking_system.generate_balance_as_of_report(4e9),
+         lambda: "".join(banking_system.iter_balance_as_of_report(4e9)),
+         lambda: banking_system.accrue_interest(4e9)),
+        (banking_system.generate_system_summary_report,
+         lambda: "".join(banking_system.iter_system_summary_report()),
+         lambda: banking_system.close_deposit(other_id)),
+    ]
+    for cached, fresh, write in cases:
+        before = cached()
+        hits = banking_system.report_cache.hits
+        assert cached() == before == fresh()
+        assert banking_system.report_cache.hits == hits + 1
+        write()
+        after = cached()
+        assert after != before
+        assert after == fresh()
+
+    # Запись в таблицы, от которых отчёт не зависит, не сбрасывает его
+    statement = banking_system.generate_transaction_report(account_id, 0, 4e9)
+    hits = banking_system.report_cache.hits
+    banking_system.update_client(first, "Иванов Иван Иванович")
+    with banking_system.batch():
+        banking_system.add_client("Новый клиент")
+    assert banking_system.generate_transaction_report(account_id, 0, 4e9) == statement
+    assert banking_system.report_cache.hits == hits + 1
@@ -0,0 +1,55 @@
+import math
+import tracemalloc
+
+import reportexport
+from deposit import DepositType
+from reportexport import write_report
+
+
+class _CountingSink:
+    def __init__(self):
+        self.writes = 0
+        self.size = 0
+        self.largest = 0
+
+    def write(self, text: str):
+        self.writes += 1
+        self.size += len(text)
+        self.largest = max(self.largest, len(text))
+
+
+def _statement_account(banking_system, operations: int) -> str:
+    banking_system.add_client("Иванов Иван")
+    client_id = banking_system.get_all_clients()[0].client_id
+    banking_system.add_deposit(client_id, DepositType.DEMAND, 100.0, 1.0)
+    deposit = banking_system.get_client_deposits(client_id)[0]
+    with banking_system.batch():
+        for _ in range(operations):
+            banking_system.deposit_funds(deposit.deposit_id, 1.0)
+    return deposit.account_id
+
+
+def test_statement_written_in_chunks(banking_system, monkeypatch):
+    monkeypatch.setattr(reportexport, "WRITE_CHUNK_LINES", 100)
+    account_id = _statement_account(banking_system, 1000)
+    sink = _CountingSink()
+    written = write_report(banking_system.iter_transaction_report(account_id, 0, 4e9), sink)
+    # По строке на операцию; в файл уходят куски по WRITE_CHUNK_LINES строк
+    assert written > 1000
+    assert sink.writes == math.ceil(written / 100)
+    assert sink.size == len(banking_system.generate_transaction_report(account_id, 0, 4e9))
+
+
+def test_large_statement_streamed_in_bounded_memory(banking_system, monkeypatch):
+    monkeypatch.setattr(reportexport, "WRITE_CHUNK_LINES", 200)
+    account_id = _statement_account(banking_system, 20000)
+    sink = _CountingSink()
+    tracemalloc.start()
+    try:
+        write_report(banking_system.transaction_report_lines(account_id, 0, 4e9), sink)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # Выписка не собирается целиком: в памяти одновременно не больше нескольких кусков текста
+    assert sink.writes > 100
+    assert peak < sink.size / 10, (peak, sink.size)
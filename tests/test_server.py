@@ -0,0 +1,106 @@
+import asyncio
+import json
+import math
+
+from deposit import DepositType
+from server import BankingServer
+
+
+def _run(server: BankingServer, requests: list) -> list:
+    lines = [json.dumps(request, ensure_ascii=False).encode() for request in requests]
+    return [json.loads(response) for response in asyncio.run(server.execute(lines))]
+
+
+def test_failing_request_does_not_break_batch(banking_system, monkeypatch):
+    def broken(client_id):
+        raise RuntimeError("сбой")
+    monkeypatch.setattr(banking_system, "get_client", broken)
+    responses = _run(BankingServer(banking_system), [
+        {"id": 1, "op": "add_client", "params": {"full_name": "Иванов Иван"}},
+        {"id": 2, "op": "get_client", "params": {"client_id": "C1"}},
+        {"id": 3, "op": "unknown"},
+        {"id": 4, "op": "count_clients"},
+    ])
+    assert [response["id"] for response in responses] == [1, 2, 3, 4]
+    assert "result" in responses[0]
+    assert responses[1]["error"] == "Внутренняя ошибка: RuntimeError: сбой"
+    assert responses[2]["error"] == "Неизвестная операция: unknown"
+    assert responses[3]["result"] == 1
+
+
+def _execute(server: BankingServer, lines: list) -> list:
+    return [json.loads(response) for response in asyncio.run(server.execute(lines))]
+
+
+def test_malformed_lines_get_errors_in_order(banking_system):
+    responses = _execute(BankingServer(banking_system), [
+        b'{"id": "a", "op": "add_client", "params": {"full_name": "\xd0\x98\xd0\xb2\xd0\xb0\xd0\xbd\xd0\xbe\xd0\xb2"}}',
+        b"{not json",
+        b"   ",
+        b"[1, 2]",
+        b'{"id": 7, "op": "count_clients", "params": [1]}',
+        b'{"id": 8}',
+        b'{"id": {"n": 1}, "op": "count_clients"}',
+    ])
+    # Пустые строки пропускаются, на каждую остальную — ровно один ответ
+    assert len(responses) == 6
+    assert responses[0]["id"] == "a" and "result" in responses[0]
+    assert responses[1]["id"] is None and "error" in responses[1]
+    assert responses[2] == {"id": None, "error": "Запрос должен быть объектом JSON"}
+    assert responses[3] == {"id": 7, "error": "Параметры запроса должны быть объектом JSON"}
+    assert responses[4] == {"id": 8, "error": "Неизвестная операция: None"}
+    assert responses[5] == {"id": {"n": 1}, "result": 1}
+
+
+def test_non_finite_amounts_rejected(banking_system):
+    banking_system.add_client("Иванов Иван")
+    client_id = banking_system.get_all_clients()[0].client_id
+    banking_system.add_deposit(client_id, DepositType.DEMAND, 100.0, 1.0)
+    deposit_id = banking_system.get_client_deposits(client_id)[0].deposit_id
+    responses = _execute(BankingServer(banking_system), [
+        f'{{"id": {i}, "op": "deposit_funds", "params": {{"deposit_id": "{deposit_id}", "amount": {amount}}}}}'.encode()
+        for i, amount in enumerate(("NaN", "Infinity", "-Infinity", "1e999"))
+    ])
+    assert [response["id"] for response in responses] == [None] * 4
+    assert all(response["error"].startswith("Недопустимое число") for response in responses)
+    # Бэкенды не принимают такие суммы и в обход протокола
+    for amount in (math.nan, math.inf):
+        assert not banking_system.db.deposit_funds(deposit_id, amount)
+        assert not banking_system.db.withdraw_funds(deposit_id, amount)
+    assert not banking_system.db.add_deposit(client_id, DepositType.DEMAND, math.nan, 1.0)
+    assert not banking_system.db.add_deposit(client_id, DepositType.DEMAND, 1.0, math.inf)
+    assert banking_system.get_deposit(deposit_id).balance == 100.0
+    assert len(banking_system.get_client_deposits(client_id)) == 1
+
+
+async def _pipeline(server: BankingServer, requests: list) -> list:
+    await server.start()
+    port = server._server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = b"".join(json.dumps(request, ensure_ascii=False).encode() + b"\n" for request in requests)
+    # Запросы отправляются без ожидания ответов, одна строка разрезана между двумя отправками
+    middle = len(data) // 2 + 3
+    writer.write(data[:middle])
+    await writer.drain()
+    await asyncio.sleep(0.05)
+    writer.write(data[middle:])
+    await writer.drain()
+    responses = [json.loads(await reader.readline()) for _ in requests]
+    writer.close()
+    await writer.wait_closed()
+    while server.connections:
+        await asyncio.sleep(0.01)
+    server.close()
+    return responses
+
+
+def test_pipelined_requests_answered_in_order(banking_system):
+    server = BankingServer(banking_system, port=0)
+    requests = [{"id": i, "op": "add_client", "params": {"full_name": f"Клиент {i}"}} for i in range(20)]
+    requests += [{"id": "bad", "op": "drop_tables"}, {"id": "count", "op": "count_clients"}]
+    responses = asyncio.run(_pipeline(server, requests))
+    assert [response["id"] for response in responses] == [request["id"] for request in requests]
+    assert [response["result"] for response in responses[:20]] == [True] * 20
+    assert responses[20] == {"id": "bad", "error": "Неизвестная операция: drop_tables"}
+    assert responses[21] == {"id": "count", "result": 20}
+    assert [client.full_name for client in banking_system.get_all_clients()] == [f"Клиент {i}" for i in range(20)]
@@ -0,0 +1,97 @@
+import pytest
+
+import durability
+from bankingsystem import BankingSystem
+from deposit import DepositType
+from durabilitybench import sync_counts
+from transaction import TransactionType
+from utils import read_file
+
+
+def _deposits_in_two_shards(banking_system) -> tuple[str, str]:
+    db = banking_system.db
+    shards = {}
+    while len(shards) < 2:
+        banking_system.add_client(f"Клиент {banking_system.count_clients()}")
+        client_id = banking_system.get_all_clients()[-1].client_id
+        shards.setdefault(id(db.shard_of_client(client_id)), client_id)
+    deposit_ids = []
+    for client_id in shards.values():
+        banking_system.add_deposit(client_id, DepositType.DEMAND, 100.0, 1.0)
+        deposit_ids.append(banking_system.get_client_deposits(client_id)[0].deposit_id)
+    return deposit_ids[0], deposit_ids[1]
+
+
+def test_cross_shard_transfer(tmp_path):
+    data_dir = str(tmp_path / "data")
+    banking_system = BankingSystem("sharded", data_dir)
+    source, target = _deposits_in_two_shards(banking_system)
+    assert banking_system.transfer(source, target, 30.0)
+    # Коммиты обеих частей на диске — журнал переводов больше не нужен
+    assert read_file(banking_system.db.transfers_file) == []
+    assert len(sync_counts(banking_system.db)) == banking_system.db.count
+    banking_system.close()
+
+    banking_system = BankingSystem("sharded", data_dir)
+    assert banking_system.get_deposit(source).balance == 70.0
+    assert banking_system.get_deposit(target).balance == 130.0
+    banking_system.close()
+
+
+def test_missing_side_replayed_after_crash(tmp_path, monkeypatch):
+    data_dir = str(tmp_path / "data")
+    banking_system = BankingSystem("sharded", data_dir)
+    source, target = _deposits_in_two_shards(banking_system)
+    target_account = banking_system.get_deposit(target).account_id
+
+    # Сбой после коммита части вклада-источника, до записи стороны получателя
+    def crash(transactions, balances):
+        raise RuntimeError("сбой")
+    monkeypatch.setattr(banking_system.db.shard_of_id(target), "post_transactions", crash)
+    with pytest.raises(RuntimeError):
+        banking_system.transfer(source, target, 30.0)
+    # Хранилище не закрывается: так журнал переводов остаётся на диске, как после падения процесса
+
+    banking_system = BankingSystem("sharded", data_dir)
+    assert banking_system.get_deposit(source).balance == 70.0
+    assert banking_system.get_deposit(target).balance == 130.0
+    deposits = [(t.transaction_type, t.amount) for t in banking_system.get_account_transactions(target_account)]
+    assert sorted(deposits) == [(TransactionType.DEPOSIT, 30.0), (TransactionType.DEPOSIT, 100.0)]
+    assert read_file(banking_system.db.transfers_file) == []
+    banking_system.close()
+
+    # Повторное открытие ничего не дописывает второй раз
+    banking_system = BankingSystem("sharded", data_dir)
+    assert banking_system.get_deposit(target).balance == 130.0
+    assert len(banking_system.get_account_transactions(target_account)) == 2
+    banking_system.close()
+
+
+def test_lost_balances_restored_after_crash(tmp_path, monkeypatch):
+    data_dir = str(tmp_path / "data")
+    banking_system = BankingSystem("sharded", data_dir)
+    source, target = _deposits_in_two_shards(banking_system)
+    target_account = banking_system.get_deposit(target).account_id
+    deposits_file = banking_system.db.shard_of_id(target).deposits_file
+
+    # Сбой внутри коммита части получателя: транзакции дописаны в журнал, deposits.csv не переписан
+    write_to_file = durability.write_to_file
+
+    def crash(file_path, rows, **options):
+        if file_path == deposits_file:
+            raise RuntimeError("сбой")
+        write_to_file(file_path, rows, **options)
+    monkeypatch.setattr(durability, "write_to_file", crash)
+    with pytest.raises(RuntimeError):
+        with banking_system.batch():
+            banking_system.transfer(source, target, 30.0)
+            banking_system.deposit_funds(target, 5.0)
+    monkeypatch.undo()
+
+    banking_system = BankingSystem("sharded", data_dir)
+    assert banking_system.get_deposit(source).balance == 70.0
+    # Баланс по журналу переводов плюс пополнение, проведённое после перевода
+    assert banking_system.get_deposit(target).balance == 135.0
+    assert len(banking_system.get_account_transactions(target_account)) == 3
+    assert read_file(banking_system.db.transfers_file) == []
+    banking_system.close()
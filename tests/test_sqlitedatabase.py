@@ -0,0 +1,92 @@
+import random
+import sqlite3
+import time
+
+from account import AccountCategory
+from bankingsystem import BankingSystem
+from deposit import DepositType
+from sqlitedatabase import SqliteDatabase
+
+
+def _run(banking_system: BankingSystem, seed: int):
+    rng = random.Random(seed)
+    for i in range(8):
+        banking_system.add_client(f"Клиент {i}")
+    for _ in range(300):
+        clients = [c.client_id for c in banking_system.get_all_clients()]
+        deposits = [d.deposit_id for d in banking_system.get_all_deposits()]
+        r = rng.random()
+        if r < 0.15 or not deposits:
+            banking_system.add_deposit(rng.choice(clients), rng.choice(list(DepositType)),
+                                       float(rng.randint(0, 1000)), float(rng.randint(1, 12)))
+        elif r < 0.45:
+            banking_system.deposit_funds(rng.choice(deposits), float(rng.randint(1, 300)))
+        elif r < 0.7:
+            banking_system.withdraw_funds(rng.choice(deposits), float(rng.randint(1, 300)))
+        elif r < 0.8:
+            banking_system.transfer(rng.choice(deposits), rng.choice(deposits), float(rng.randint(1, 300)))
+        elif r < 0.85:
+            banking_system.close_deposit(rng.choice(deposits))
+        elif r < 0.9:
+            banking_system.db.add_account(rng.choice(deposits), AccountCategory.PREFERENTIAL)
+        elif r < 0.95:
+            banking_system.update_client(rng.choice(clients), f"Клиент {rng.randint(100, 999)}")
+        else:
+            banking_system.delete_client(rng.choice(clients))
+    banking_system.accrue_interest(time.time() + 86400 * 90)
+
+
+def _row(item) -> list[str]:
+    # Через разбор строки: файловое хранилище держит даты открытия целыми числами, SQLite — float
+    return type(item).deserialize(item.serialize()).serialize()
+
+
+def _state(banking_system: BankingSystem) -> tuple:
+    deposits = banking_system.get_all_deposits()
+    return ([_row(c) for c in banking_system.get_all_clients()],
+            [_row(d) for d in deposits],
+            [_row(banking_system.get_account(d.account_id)) for d in deposits],
+            {d.deposit_id: [(t.transaction_id, t.transaction_type, t.amount)
+                            for t in banking_system.get_account_transactions(d.account_id)] for d in deposits},
+            banking_system.generate_all_clients_report(),
+            banking_system.generate_system_summary_report())
+
+
+def test_same_results_as_file_backend(tmp_path, monkeypatch):
+    # Одна и та же последовательность операций даёт одинаковые данные и отчёты в обоих хранилищах
+    states = {}
+    for backend in ("file", "sqlite"):
+        monkeypatch.setattr(time, "time", lambda: 1_790_000_000.0)
+        banking_system = BankingSystem(backend, str(tmp_path / backend))
+        _run(banking_system, 9)
+        states[backend] = _state(banking_system)
+        banking_system.close()
+        # И после повторного открытия
+        banking_system = BankingSystem(backend, str(tmp_path / backend))
+        assert _state(banking_system) == states[backend]
+        banking_system.close()
+    assert states["sqlite"] == states["file"]
+
+
+def test_group_commit(tmp_path):
+    db = SqliteDatabase(str(tmp_path / "data"), flush_every=3)
+    reader = sqlite3.connect(db.db_file)
+
+    def committed() -> int:
+        return reader.execute("SELECT COUNT(*) FROM clients").fetchone()[0]
+
+    db.add_client("Иванов Иван")
+    db.add_client("Петров Пётр")
+    # Другое соединение видит только завершённые транзакции: две операции ещё не зафиксированы
+    assert committed() == 0
+    db.add_client("Сидоров Сидор")
+    assert committed() == 3
+    with db.batch():
+        for i in range(10):
+            db.add_client(f"Клиент {i}")
+        assert committed() == 3
+    assert committed() == 13
+    db.add_client("Последний")
+    db.close()
+    assert committed() == 14
+    reader.close()
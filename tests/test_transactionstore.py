@@ -0,0 +1,45 @@
+import pickle
+import random
+
+from transaction import Transaction, TransactionType
+from transactionstore import TransactionStore
+
+
+def _fields(transaction: Transaction) -> tuple:
+    return (transaction.transaction_id, transaction.date, transaction.transaction_type, transaction.amount,
+            transaction.account_id)
+
+
+def test_store_returns_what_was_appended():
+    rng = random.Random(7)
+    # ID не вида "T<цифры>" (или с ведущими нулями, или слишком длинные) хранятся отдельно, но возвращаются как есть
+    ids = ["T1", "T0", "T007", "T", "X15", "T" + "9" * 19, "T123456789012345678", "Т5"]
+    transactions = [Transaction(ids[i] if i < len(ids) else f"T{i * 3}", float(rng.randint(0, 10 ** 9)),
+                                rng.choice(list(TransactionType)), rng.randint(1, 10 ** 6) / 100, f"A{rng.randint(1, 50)}")
+                    for i in range(500)]
+    store = TransactionStore()
+    store.extend(transactions)
+    assert len(store) == len(transactions)
+    assert [_fields(t) for t in store] == [_fields(t) for t in transactions]
+    assert _fields(store[-1]) == _fields(transactions[-1])
+    assert store.odd_ids == {2: "T007", 3: "T", 4: "X15", 5: "T" + "9" * 19, 7: "Т5"}
+    # Записи счёта — в порядке дат
+    for account_id in {t.account_id for t in transactions}:
+        dates = [store.dates[row] for row in store.rows_for_account(account_id)]
+        assert dates == sorted(t.date for t in transactions if t.account_id == account_id)
+    assert len(store.rows_for_account("A999")) == 0
+
+    restored = pickle.loads(pickle.dumps(store, protocol=5))
+    assert [_fields(t) for t in restored] == [_fields(t) for t in transactions]
+
+
+def test_store_is_compact():
+    store = TransactionStore()
+    for i in range(1000):
+        store.append_fields(f"T{i}", 1_790_000_000.0 + i, TransactionType.DEPOSIT, 10.0, f"A{i % 10}")
+    # Поля — типизированные массивы, ID счёта хранится один раз на счёт
+    assert (store.ids.itemsize, store.dates.itemsize, store.types.itemsize, store.amounts.itemsize,
+            store.accounts.itemsize) == (8, 8, 1, 8, 4)
+    assert store.account_ids == [f"A{i}" for i in range(10)]
+    assert all(rows.itemsize == 4 for rows in store.account_rows)
+    assert not store.odd_ids
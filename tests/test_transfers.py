@@ -0,0 +1,17 @@
+from deposit import DepositType
+
+
+def test_non_finite_amounts_rejected(banking_system):
+    banking_system.add_client("Иванов Иван")
+    client_id = banking_system.get_all_clients()[0].client_id
+    banking_system.add_deposit(client_id, DepositType.DEMAND, 100.0, 1.0)
+    banking_system.add_deposit(client_id, DepositType.DEMAND, 50.0, 1.0)
+    source, target = sorted((d.deposit_id for d in banking_system.get_client_deposits(client_id)),
+                            key=lambda deposit_id: -banking_system.get_deposit(deposit_id).balance)
+    amounts = [float("nan"), float("inf"), float("-inf"), "nan", "inf", 30.0]
+    report = banking_system.apply_transfers([(source, target, amount) for amount in amounts])
+    assert [r.ok for r in report.results] == [False] * 5 + [True]
+    assert {r.error for r in report.errors()} == {"Некорректная сумма"}
+    assert report.totals["TRANSFER"] == (1, 30.0)
+    assert banking_system.get_deposit(source).balance == 70.0
+    assert banking_system.get_deposit(target).balance == 80.0
@@ -8,7 +8,18 @@ class TransactionType(MyEnum):
     CLOSE = 3
 
 
+# Знак, с которым сумма операции входит в баланс счёта (при закрытии снимается весь остаток)
+BALANCE_SIGN = {
+    TransactionType.DEPOSIT: 1,
+    TransactionType.WITHDRAW: -1,
+    TransactionType.INTEREST: 1,
+    TransactionType.CLOSE: -1,
+}
+
+
 class Transaction:
+    __slots__ = ("transaction_id", "date", "transaction_type", "amount", "account_id")
+
     def __init__(self,
                  transaction_id: str,
                  date: float,
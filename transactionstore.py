@@ -0,0 +1,159 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterator
+
+from transaction import BALANCE_SIGN, Transaction, TransactionType
+
+
+# Код типа транзакции (значение перечисления) -> элемент перечисления и обратно
+_TYPES = {item.value: item for item in TransactionType}
+_CODES = {item: item.value for item in TransactionType}
+# Максимальная длина числовой части ID, которая гарантированно помещается в 64-битное целое
+_MAX_ID_DIGITS = 18
+
+
+class TransactionStore:
+    """
+    Компактное хранилище транзакций: поля лежат в параллельных типизированных массивах,
+    а объекты Transaction создаются только при обращении к конкретной записи.
+    """
+
+    def __init__(self):
+        # Числовая часть ID вида "T<цифры>"; ID другого вида хранятся в odd_ids
+        self.ids = array('q')
+        self.dates = array('d')
+        self.types = array('b')
+        self.amounts = array('d')
+        # Код счёта; сами ID счетов хранятся один раз в account_ids
+        self.accounts = array('i')
+        self.odd_ids: dict[int, str] = {}
+        self.account_ids: list[str] = []
+        self.account_codes: dict[str, int] = {}
+        # Номера записей каждого счёта (по коду счёта), упорядоченные по дате
+        self.account_rows: list[array] = []
+        # Баланс счёта после каждой из его записей (параллельно account_rows): баланс на любую дату —
+        # это последнее значение не позже этой даты, без пересчёта истории
+        self.account_balances: list[array] = []
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __getitem__(self, row: int) -> Transaction:
+        if row < 0:
+            row += len(self.dates)
+        return Transaction(
+            transaction_id=self.transaction_id(row),
+            date=self.dates[row],
+            transaction_type=_TYPES[self.types[row]],
+            amount=self.amounts[row],
+            account_id=self.account_ids[self.accounts[row]]
+        )
+
+    def __iter__(self) -> Iterator[Transaction]:
+        for row in range(len(self.dates)):
+            yield self[row]
+
+    def transaction_id(self, row: int) -> str:
+        odd = self.odd_ids.get(row)
+        return odd if odd is not None else f"T{self.ids[row]}"
+
+    def account_code(self, account_id: str) -> int:
+        code = self.account_codes.get(account_id)
+        if code is None:
+            code = self.account_codes[account_id] = len(self.account_ids)
+            self.account_ids.append(account_id)
+            self.account_rows.append(array('i'))
+            self.account_balances.append(array('d'))
+        return code
+
+    def append(self, transaction: Transaction):
+        self.append_fields(transaction.transaction_id, transaction.date, transaction.transaction_type,
+                           transaction.amount, transaction.account_id)
+
+    def append_fields(self,
+                      transaction_id: str,
+                      date: float,
+                      transaction_type: TransactionType,
+                      amount: float,
+                      account_id: str):
+        row = len(self.dates)
+        digits = transaction_id[1:]
+        if transaction_id[:1] == "T" and 0 < len(digits) <= _MAX_ID_DIGITS and digits.isdigit() \
+                and (digits[0] != "0" or digits == "0"):
+            self.ids.append(int(digits))
+        else:
+            self.ids.append(0)
+            self.odd_ids[row] = transaction_id
+        self.dates.append(date)
+        self.types.append(_CODES[transaction_type])
+        self.amounts.append(amount)
+        code = self.account_code(account_id)
+        self.accounts.append(code)
+        self._index_row(row, code, BALANCE_SIGN[transaction_type] * amount)
+
+    def _index_row(self, row: int, code: int, signed: float):
+        rows = self.account_rows[code]
+        balances = self.account_balances[code]
+        date = self.dates[row]
+        # Обычно транзакции приходят в порядке времени — тогда достаточно дописать запись в конец
+        if not rows or self.dates[rows[-1]] <= date:
+            rows.append(row)
+            balances.append(balances[-1] + signed if balances else signed)
+        else:
+            pos = bisect_right(rows, date, key=self.dates.__getitem__)
+            rows.insert(pos, row)
+            balances.insert(pos, balances[pos - 1] if pos else 0.0)
+            for i in range(pos, len(balances)):
+                balances[i] += signed
+
+    def extend(self, transactions):
+        for transaction in transactions:
+            self.append(transaction)
+
+    def clear(self):
+        self.__init__()
+
+    def copy_columns(self) -> 'TransactionStore':
+        """
+        Копия столбцов без индекса записей по счетам: копируются массивы, а не объекты транзакций.
+        Индекс восстанавливает build_index — позже и, например, в другом потоке.
+        """
+        store = TransactionStore()
+        store.ids, store.dates, store.types = self.ids[:], self.dates[:], self.types[:]
+        store.amounts, store.accounts = self.amounts[:], self.accounts[:]
+        store.odd_ids = dict(self.odd_ids)
+        store.account_ids = list(self.account_ids)
+        store.account_codes = dict(self.account_codes)
+        return store
+
+    def build_index(self):
+        """
+        Заново строит индекс записей каждого счёта по дате и балансы после каждой записи.
+        """
+        self.account_rows = [array('i') for _ in self.account_ids]
+        self.account_balances = [array('d') for _ in self.account_ids]
+        for row, code in enumerate(self.accounts):
+            self._index_row(row, code, BALANCE_SIGN[_TYPES[self.types[row]]] * self.amounts[row])
+
+    def rows_for_account(self, account_id: str) -> array:
+        code = self.account_codes.get(account_id)
+        return self.account_rows[code] if code is not None else array('i')
+
+    def balance_as_of(self, account_id: str, date: float) -> float:
+        """
+        Баланс счёта с учётом всех операций с датой не позже date.
+        """
+        code = self.account_codes.get(account_id)
+        if code is None:
+            return 0.0
+        hi = bisect_right(self.account_rows[code], date, key=self.dates.__getitem__)
+        return self.account_balances[code][hi - 1] if hi else 0.0
+
+    def date_range(self, rows: array, from_date: float | None, to_date: float | None) -> tuple[int, int]:
+        """
+        Границы [lo, hi) записей из упорядоченного по дате списка rows, попадающих в период.
+        """
+        key = self.dates.__getitem__
+        lo = 0 if from_date is None else bisect_left(rows, from_date, key=key)
+        hi = len(rows) if to_date is None else bisect_right(rows, to_date, key=key)
+        return lo, hi
@@ -0,0 +1,58 @@
+import math
+from typing import Iterable
+
+from bulkoperations import BulkReport, OperationResult
+from deposit import Deposit
+
+
+def apply_transfers(db, transfers: Iterable[tuple[str, str, float]]) -> BulkReport:
+    """
+    Проводит переводы (вклад-источник, вклад-получатель, сумма) по порядку одним коммитом.
+    Каждый перевод проверяется по балансам с учётом предыдущих переводов пакета; отклонённые переводы
+    попадают в отчёт и не прерывают обработку. Балансы вкладов меняются один раз — на итоговую (неттированную)
+    сумму всех переводов пакета, а в истории каждого перевода остаются две транзакции: WITHDRAW по счёту
+    источника и следующая за ней DEPOSIT по счёту получателя с той же датой.
+    """
+    results = []
+    # Вклады пакета, их балансы после уже принятых переводов и сами принятые переводы
+    deposits: dict[str, Deposit | None] = {}
+    balances: dict[str, float] = {}
+    legs: list[tuple[Deposit, Deposit, float]] = []
+
+    def deposit_of(deposit_id: str) -> Deposit | None:
+        if deposit_id not in deposits:
+            deposit = db.get_deposit(deposit_id)
+            deposits[deposit_id] = deposit if deposit and not deposit.closed else None
+        return deposits[deposit_id]
+
+    with db.batch():
+        for line, (source_id, target_id, amount) in enumerate(transfers, start=1):
+            name = f"{source_id} -> {target_id}"
+            try:
+                amount = float(amount)
+                # nan и inf проходят сравнения с балансом неверно, поэтому отсекаются до проверок
+                if not math.isfinite(amount):
+                    raise ValueError(amount)
+            except (TypeError, ValueError):
+                results.append(OperationResult(line, "TRANSFER", name, 0.0, False, "Некорректная сумма"))
+                continue
+            source, target = deposit_of(source_id), deposit_of(target_id)
+            if amount <= 0:
+                error = "Некорректная сумма"
+            elif source is None:
+                error = "Вклад-источник не найден или закрыт"
+            elif target is None:
+                error = "Вклад-получатель не найден или закрыт"
+            elif source_id == target_id:
+                error = "Перевод на тот же вклад"
+            elif amount > balances.get(source_id, source.balance):
+                error = "Недостаточно средств"
+            else:
+                error = ""
+                balances[source_id] = balances.get(source_id, source.balance) - amount
+                balances[target_id] = balances.get(target_id, target.balance) + amount
+                legs.append((source, target, amount))
+            results.append(OperationResult(line, "TRANSFER", name, amount, not error, error))
+        if legs:
+            db.post_transfers(legs, balances)
+    return BulkReport(results)
@@ -1,13 +1,16 @@
 import asyncio
+import time
 
 from bankingsystem import BankingSystem
 from deposit import DepositType
+from pagination import PAGE_SIZE
+from reportexport import write_report
 from utils import clear_screen, parse_date
 
 
 class UserInterface:
     def __init__(self):
-        self.banking_system = BankingSystem()
+        self.banking_system = BankingSystem(background_writer=True)
         self.running = True
 
     async def run(self):
@@ -32,6 +35,7 @@ class UserInterface:
             await self.reporting()
         elif choice == 4:
             print("Выход из системы...")
+            self.banking_system.close()
             self.running = False
 
     async def client_management(self):
@@ -73,8 +77,11 @@ class UserInterface:
             print("5. Начислить проценты")
             print("6. Закрыть вклад")
             print("7. Список вкладов клиента")
-            print("8. Назад в главное меню")
-            choice = await self.get_int_input("Выберите пункт (1-8): ", 1, 8)
+            print("8. Начислить проценты по всем вкладам")
+            print("9. История операций по вкладу")
+            print("10. Перевод между вкладами")
+            print("11. Назад в главное меню")
+            choice = await self.get_int_input("Выберите пункт (1-11): ", 1, 11)
             if choice == 1:
                 await self.add_deposit()
             elif choice == 2:
@@ -90,6 +97,12 @@ class UserInterface:
             elif choice == 7:
                 await self.list_client_deposits()
             elif choice == 8:
+                await self.accrue_interest()
+            elif choice == 9:
+                await self.view_deposit_history()
+            elif choice == 10:
+                await self.transfer()
+            elif choice == 11:
                 break
 
     async def reporting(self):
@@ -103,8 +116,10 @@ class UserInterface:
             print("3. Отчет по типу вклада")
             print("4. Отчет по операциям со счетом")
             print("5. Сводный отчет по системе")
-            print("6. Назад в главное меню")
-            choice = await self.get_int_input("Выберите пункт (1-6): ", 1, 6)
+            print("6. Остатки по вкладам на дату")
+            print("7. Крупнейшие вклады по типу")
+            print("8. Назад в главное меню")
+            choice = await self.get_int_input("Выберите пункт (1-8): ", 1, 8)
             if choice == 1:
                 await self.generate_client_report()
             elif choice == 2:
@@ -116,6 +131,10 @@ class UserInterface:
             elif choice == 5:
                 await self.generate_system_summary_report()
             elif choice == 6:
+                await self.generate_balance_as_of_report()
+            elif choice == 7:
+                await self.generate_top_deposits_report()
+            elif choice == 8:
                 break
 
     # --- Клиенты ---
@@ -130,15 +149,11 @@ class UserInterface:
 
     async def view_client(self):
         clear_screen()
-        clients = self.banking_system.get_all_clients()
-        if not clients:
+        if not self.banking_system.count_clients():
             print("В системе нет зарегистрированных клиентов.")
             await self.wait_for_keypress()
             return
-        print("Список клиентов:")
-        for c in clients:
-            print(f"{c.client_id} - {c.full_name}")
-        client_id = await self.get_str_input("Введите ID клиента: ")
+        client_id = await self.select_client_id("Введите ID клиента: ")
         client = self.banking_system.get_client(client_id)
         clear_screen()
         if client:
@@ -149,15 +164,11 @@ class UserInterface:
 
     async def update_client(self):
         clear_screen()
-        clients = self.banking_system.get_all_clients()
-        if not clients:
+        if not self.banking_system.count_clients():
             print("В системе нет зарегистрированных клиентов.")
             await self.wait_for_keypress()
             return
-        print("Список клиентов:")
-        for c in clients:
-            print(f"{c.client_id} - {c.full_name}")
-        client_id = await self.get_str_input("Введите ID клиента: ")
+        client_id = await self.select_client_id("Введите ID клиента: ")
         client = self.banking_system.get_client(client_id)
         clear_screen()
         if client:
@@ -173,15 +184,11 @@ class UserInterface:
 
     async def delete_client(self):
         clear_screen()
-        clients = self.banking_system.get_all_clients()
-        if not clients:
+        if not self.banking_system.count_clients():
             print("В системе нет зарегистрированных клиентов.")
             await self.wait_for_keypress()
             return
-        print("Список клиентов:")
-        for c in clients:
-            print(f"{c.client_id} - {c.full_name}")
-        client_id = await self.get_str_input("Введите ID клиента для удаления: ")
+        client_id = await self.select_client_id("Введите ID клиента для удаления: ")
         deposits = self.banking_system.get_client_deposits(client_id)
         clear_screen()
         if deposits:
@@ -196,29 +203,32 @@ class UserInterface:
 
     async def list_all_clients(self):
         clear_screen()
-        clients = self.banking_system.get_all_clients()
-        if not clients:
+        if not self.banking_system.count_clients():
             print("В системе нет зарегистрированных клиентов.")
-        else:
+            await self.wait_for_keypress()
+            return
+        cursor = None
+        while True:
+            clear_screen()
+            page = self.banking_system.get_clients_page(cursor)
             print("ID    | ФИО                            | Кол-во вкладов")
             print("-"*55)
-            for c in clients:
-                deps = self.banking_system.get_client_deposits(c.client_id)
-                print(f"{c.client_id:5} | {c.full_name:30} | {len(deps):14}")
+            for c in page.items:
+                totals = self.banking_system.get_client_totals(c.client_id)
+                print(f"{c.client_id:5} | {c.full_name:30} | {totals.deposits:14}")
+            cursor = page.next_cursor
+            if not cursor or not await self.get_bool_input("Показать следующую страницу? (д/н): "):
+                break
         await self.wait_for_keypress()
 
     # --- Вклады ---
     async def add_deposit(self):
         clear_screen()
-        clients = self.banking_system.get_all_clients()
-        if not clients:
+        if not self.banking_system.count_clients():
             print("В системе нет зарегистрированных клиентов. Сначала добавьте клиента.")
             await self.wait_for_keypress()
             return
-        print("Список клиентов:")
-        for c in clients:
-            print(f"{c.client_id} - {c.full_name}")
-        client_id = await self.get_str_input("Введите ID клиента: ")
+        client_id = await self.select_client_id("Введите ID клиента: ")
         dep_type = await self.get_deposit_type_input()
         initial_balance = await self.get_float_input("Введите начальную сумму вклада: ", 0.0)
         interest_rate = await self.get_float_input("Введите процентную ставку (% годовых): ", 0.0)
@@ -272,6 +282,30 @@ class UserInterface:
             print("Вклад не найден или закрыт.")
         await self.wait_for_keypress()
 
+    async def transfer(self):
+        clear_screen()
+        from_id = await self.get_str_input("Введите ID вклада, с которого переводятся средства: ")
+        source = self.banking_system.get_deposit(from_id)
+        if not source or source.closed:
+            clear_screen()
+            print("Вклад не найден или закрыт.")
+            await self.wait_for_keypress()
+            return
+        to_id = await self.get_str_input("Введите ID вклада, на который переводятся средства: ")
+        target = self.banking_system.get_deposit(to_id)
+        if not target or target.closed or to_id == from_id:
+            clear_screen()
+            print("Вклад получателя не найден, закрыт или совпадает с вкладом отправителя.")
+            await self.wait_for_keypress()
+            return
+        amount = await self.get_float_input("Введите сумму перевода: ", 0.01, source.balance)
+        clear_screen()
+        if self.banking_system.transfer(from_id, to_id, amount):
+            print("Перевод выполнен.")
+        else:
+            print("Ошибка: Не удалось выполнить перевод.")
+        await self.wait_for_keypress()
+
     async def calculate_interest(self):
         clear_screen()
         deposit_id = await self.get_str_input("Введите ID вклада: ")
@@ -295,6 +329,48 @@ class UserInterface:
             print("Вклад не найден или закрыт.")
         await self.wait_for_keypress()
 
+    async def accrue_interest(self):
+        clear_screen()
+        date_str = await self.get_str_input("Введите дату (дд.мм.гггг): ")
+        try:
+            to_date = parse_date(date_str)
+        except Exception as e:
+            clear_screen()
+            print(str(e))
+            await self.wait_for_keypress()
+            return
+        all_types = await self.get_bool_input("Начислить по всем типам вкладов? (д/н): ")
+        dep_type = None if all_types else await self.get_deposit_type_input()
+        clear_screen()
+        accrued = self.banking_system.accrue_interest(to_date, dep_type)
+        print(f"Проценты начислены по {len(accrued)} вкладам на сумму {sum(accrued.values()):.2f}.")
+        await self.wait_for_keypress()
+
+    async def view_deposit_history(self):
+        clear_screen()
+        deposit_id = await self.get_str_input("Введите ID вклада: ")
+        deposit = self.banking_system.get_deposit(deposit_id)
+        if not deposit:
+            clear_screen()
+            print(f"Вклад с ID {deposit_id} не найден.")
+            await self.wait_for_keypress()
+            return
+        cursor = None
+        while True:
+            clear_screen()
+            page = self.banking_system.get_account_transactions_page(deposit.account_id, cursor)
+            print(f"История операций по вкладу {deposit_id}")
+            if not page.items:
+                print("Операций по вкладу не было.")
+            else:
+                print("ID Транзакции  | Дата       | Операция     | Сумма")
+                for t in page.items:
+                    print(f"{t.transaction_id:14} | {time.strftime('%d.%m.%Y', time.localtime(t.date))} | {t.transaction_type:12} | {t.amount:10.2f}")
+            cursor = page.next_cursor
+            if not cursor or not await self.get_bool_input("Показать следующую страницу? (д/н): "):
+                break
+        await self.wait_for_keypress()
+
     async def close_deposit(self):
         clear_screen()
         deposit_id = await self.get_str_input("Введите ID вклада: ")
@@ -316,15 +392,11 @@ class UserInterface:
 
     async def list_client_deposits(self):
         clear_screen()
-        clients = self.banking_system.get_all_clients()
-        if not clients:
+        if not self.banking_system.count_clients():
             print("В системе нет зарегистрированных клиентов.")
             await self.wait_for_keypress()
             return
-        print("Список клиентов:")
-        for c in clients:
-            print(f"{c.client_id} - {c.full_name}")
-        client_id = await self.get_str_input("Введите ID клиента: ")
+        client_id = await self.select_client_id("Введите ID клиента: ")
         client = self.banking_system.get_client(client_id)
         clear_screen()
         if client:
@@ -352,14 +424,22 @@ class UserInterface:
 
     async def generate_all_clients_report(self):
         clear_screen()
-        print(self.banking_system.generate_all_clients_report())
+        print(await self.banking_system.reports.all_clients_report())
         await self.wait_for_keypress()
 
     async def generate_deposit_type_report(self):
         clear_screen()
         dep_type = await self.get_deposit_type_input()
         clear_screen()
-        print(self.banking_system.generate_deposit_type_report(dep_type))
+        print(await self.banking_system.reports.deposit_type_report(dep_type))
+        await self.wait_for_keypress()
+
+    async def generate_top_deposits_report(self):
+        clear_screen()
+        dep_type = await self.get_deposit_type_input()
+        limit = await self.get_int_input("Сколько вкладов показать (1-1000): ", 1, 1000)
+        clear_screen()
+        print(self.banking_system.generate_top_deposits_report(dep_type, limit))
         await self.wait_for_keypress()
 
     async def generate_transaction_report(self):
@@ -383,15 +463,62 @@ class UserInterface:
             await self.wait_for_keypress()
             return
         clear_screen()
-        print(self.banking_system.generate_transaction_report(account_id, from_date, to_date))
+        self.print_report(self.banking_system.transaction_report_lines(account_id, from_date, to_date))
         await self.wait_for_keypress()
 
     async def generate_system_summary_report(self):
         clear_screen()
-        print(self.banking_system.generate_system_summary_report())
+        print(await self.banking_system.reports.system_summary_report())
+        await self.wait_for_keypress()
+
+    async def generate_balance_as_of_report(self):
+        clear_screen()
+        date_str = await self.get_str_input("Введите дату (дд.мм.гггг): ")
+        try:
+            # Остаток на конец указанного дня
+            date = parse_date(date_str) + 86400 - 1
+        except Exception as e:
+            clear_screen()
+            print(str(e))
+            await self.wait_for_keypress()
+            return
+        clear_screen()
+        print(self.banking_system.generate_balance_as_of_report(date))
         await self.wait_for_keypress()
 
     # --- Вспомогательные методы ---
+    def print_report(self, lines):
+        # Большой отчёт выводится по мере формирования, а не собирается целиком в строку
+        write_report(lines)
+        print()
+
+    async def select_client_id(self, prompt: str) -> str:
+        # Список клиентов выводится постранично: пустой ввод показывает следующую страницу,
+        # ввод, не являющийся ID клиента, ищется как часть ФИО
+        print("Список клиентов:")
+        cursor = None
+        clients = None
+        while True:
+            if clients is None:
+                page = self.banking_system.get_clients_page(cursor)
+                clients, cursor = page.items, page.next_cursor
+            for c in clients:
+                print(f"{c.client_id} - {c.full_name}")
+            print("(Enter — следующая страница, часть ФИО — поиск)" if cursor else "(часть ФИО — поиск)")
+            value = await self.get_str_input(prompt)
+            if not value:
+                if not cursor:
+                    return value
+                clients = None
+                continue
+            if self.banking_system.get_client(value):
+                return value
+            clients = self.banking_system.search_clients(value, PAGE_SIZE)
+            if not clients:
+                return value
+            print(f"Найденные клиенты (не более {PAGE_SIZE}):")
+            cursor = None
+
     async def get_str_input(self, prompt: str) -> str:
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(None, lambda: input(prompt).strip())
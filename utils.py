@@ -1,22 +1,30 @@
 import csv
+import io
 import os
+import pickle
 import sys
 from enum import Enum
-from typing import Iterable
+from typing import Iterable, Iterator
 
-from pystreamapi import Stream
+
+# Кэш «имя в нижнем регистре -> элемент» для каждого перечисления
+_enum_members: dict[type, dict[str, Enum]] = {}
 
 
 class MyEnum(Enum):
     def __str__(self):
-        return self.name
+        # _name_ вместо свойства name: str() перечислений вызывается на каждую сохраняемую запись
+        return self._name_
 
     @classmethod
     def value_of(cls, name: str):
-        return Stream.of(cls) \
-            .filter(lambda item: item.name.lower() == name.lower()) \
-            .find_first() \
-            .get()
+        members = _enum_members.get(cls)
+        if members is None:
+            members = _enum_members[cls] = {item.name.lower(): item for item in cls}
+        try:
+            return members[name.lower()]
+        except KeyError:
+            raise ValueError(f"{name} is not a valid {cls.__name__}") from None
 
 def clear_screen():
     if sys.platform.startswith('win'):
@@ -43,7 +51,134 @@ def read_file(file_path: str) -> list[list[str]]:
     with open(file_path, 'r', encoding='utf-8') as file:
         return list(csv.reader(file))
 
-def write_to_file(file_path: str, rows: Iterable[list[str]]):
-    with open(file_path, 'w+', newline='', encoding='utf-8') as file:
+def write_to_file(file_path: str, rows: Iterable[list[str]], sync: bool = False, sync_dir: bool | None = None):
+    """
+    Атомарно перезаписывает файл: строки пишутся во временный файл, который затем заменяет прежний.
+    Если запись прервётся, на диске останется прежняя версия файла. sync=True — временный файл и каталог
+    синхронизируются с диском (fsync), и новая версия переживёт отключение питания.
+    sync_dir=False — синхронизируется только временный файл (до переименования, чтобы после отключения питания
+    не остался переименованный, но пустой файл), а каталог синхронизирует вызывающий позже; тогда после
+    отключения питания на диске будет прежняя или новая версия целиком.
+    """
+    if sync_dir is None:
+        sync_dir = sync
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as file:
         writer = csv.writer(file)
         writer.writerows(rows)
+        if sync:
+            file.flush()
+            os.fsync(file.fileno())
+    os.replace(tmp_path, file_path)
+    if sync_dir:
+        fsync_dir(os.path.dirname(file_path) or ".")
+
+def append_to_file(file_path: str, rows: Iterable[list[str]], sync: bool = False):
+    with open(file_path, 'a', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerows(rows)
+        if sync:
+            file.flush()
+            os.fsync(file.fileno())
+
+def fsync_file(file_path: str):
+    with open(file_path, 'ab') as file:
+        os.fsync(file.fileno())
+
+def fsync_dir(dir_path: str):
+    """
+    Синхронизирует каталог, чтобы на диске сохранились созданные и переименованные в нём файлы.
+    В Windows каталог открыть нельзя, там это не требуется.
+    """
+    if os.name == 'nt':
+        return
+    fd = os.open(dir_path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def read_journal(file_path: str, offset: int = 0) -> Iterator[list[str]]:
+    """
+    Построчно читает журнал (CSV, открытый на дозапись), не загружая его целиком в память.
+    offset — смещение в байтах, с которого начинается чтение (начало записи).
+    """
+    if not os.path.exists(file_path):
+        return
+    with open(file_path, 'rb') as raw:
+        raw.seek(offset)
+        with io.TextIOWrapper(raw, encoding='utf-8', newline='') as file:
+            yield from csv.reader(file)
+
+def read_file_tail(file_path: str, offset: int, size: int) -> bytes:
+    """
+    Возвращает до size байт файла, предшествующих смещению offset.
+    """
+    if not os.path.exists(file_path):
+        return b''
+    with open(file_path, 'rb') as file:
+        start = max(0, offset - size)
+        file.seek(start)
+        return file.read(offset - start)
+
+def file_stamp(file_path: str) -> tuple[int, int] | None:
+    """
+    Размер и время изменения файла — по ним проверяется, что файл не менялся.
+    """
+    try:
+        st = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+def write_snapshot(file_path: str, state: dict):
+    """
+    Атомарно записывает снимок данных в бинарном формате (pickle, протокол 5).
+    """
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, 'wb') as file:
+        pickle.dump(state, file, protocol=5)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, file_path)
+    fsync_dir(os.path.dirname(file_path) or ".")
+
+def read_snapshot(file_path: str) -> dict | None:
+    """
+    Читает снимок данных. Если снимка нет или он повреждён, возвращает None.
+    """
+    if not os.path.exists(file_path):
+        return None
+    try:
+        with open(file_path, 'rb') as file:
+            return pickle.load(file)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+
+def repair_journal(file_path: str) -> bool:
+    """
+    Отрезает недописанную последнюю запись журнала (например, после аварийного завершения),
+    чтобы следующая дозапись не склеилась с ней.
+    """
+    if not os.path.exists(file_path):
+        return False
+    with open(file_path, 'rb+') as file:
+        size = file.seek(0, os.SEEK_END)
+        if size == 0:
+            return False
+        file.seek(size - 1)
+        if file.read(1) == b'\n':
+            return False
+        # Ищем конец последней целой записи, читая файл с конца блоками
+        pos = size
+        while pos > 0:
+            start = max(0, pos - 4096)
+            file.seek(start)
+            chunk = file.read(pos - start)
+            idx = chunk.rfind(b'\n')
+            if idx != -1:
+                file.truncate(start + idx + 1)
+                return True
+            pos = start
+        file.truncate(0)
+        return True
@@ -0,0 +1,148 @@
+import threading
+from concurrent.futures import Future
+
+from durability import SyncedFiles
+
+
+def done_future(result=None) -> Future:
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def gather_futures(futures: list[Future]) -> Future:
+    """
+    Future, который завершается, когда завершены все futures (с первой из их ошибок, если она была).
+    """
+    combined = Future()
+    pending = len(futures)
+    lock = threading.Lock()
+
+    def done(future: Future):
+        nonlocal pending
+        error = future.exception()
+        with lock:
+            pending -= 1
+            if combined.done() or error is None and pending:
+                return
+            # Пока держим блокировку, другие колбэки не завершат combined
+            if error is not None:
+                combined.set_exception(error)
+            else:
+                combined.set_result(None)
+
+    if not futures:
+        combined.set_result(None)
+    for future in futures:
+        future.add_done_callback(done)
+    return combined
+
+
+class BackgroundWriter:
+    """
+    Поток записи на диск. Хранилище передаёт ему уже сериализованные изменения (submit) и не ждёт записи.
+    Поток забирает все накопившиеся пакеты разом: дозаписи одного файла склеиваются, из нескольких
+    перезаписей файла выполняется только последняя; каждый файл записывается одним вызовом, синхронизация
+    с диском — по политике files (см. Durability). durable() возвращает Future, который завершается, когда всё отправленное до вызова
+    оказалось на диске.
+    """
+
+    def __init__(self, files: SyncedFiles, name: str = "writer"):
+        self.files = files
+        self._cond = threading.Condition()
+        self._jobs: list[tuple[int, list[tuple[str, str, list]]]] = []
+        self._submitted = 0
+        self._durable = 0
+        self._waiters: list[tuple[int, Future]] = []
+        self._error: BaseException | None = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, writes: list[tuple[str, str, list]]) -> int:
+        """
+        writes — список (режим "append" или "rewrite", путь к файлу, строки CSV) в порядке записи.
+        Возвращает номер пакета.
+        """
+        with self._cond:
+            if self._error is not None:
+                raise RuntimeError("Фоновая запись остановлена из-за ошибки") from self._error
+            if self._closed:
+                raise RuntimeError("Фоновая запись остановлена")
+            self._submitted += 1
+            self._jobs.append((self._submitted, writes))
+            self._cond.notify()
+            return self._submitted
+
+    def durable(self, seq: int | None = None) -> Future:
+        future = Future()
+        with self._cond:
+            seq = self._submitted if seq is None else seq
+            if self._error is not None:
+                future.set_exception(self._error)
+            elif seq <= self._durable:
+                future.set_result(seq)
+            else:
+                self._waiters.append((seq, future))
+        return future
+
+    def wait(self):
+        """
+        Ждёт записи всего отправленного; если запись не удалась, поднимает её ошибку.
+        """
+        self.durable().result()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._jobs and not self._closed:
+                    self._cond.wait()
+                if not self._jobs:
+                    return
+                jobs, self._jobs = self._jobs, []
+            try:
+                self._write(jobs)
+            except BaseException as e:
+                with self._cond:
+                    self._error = e
+                    waiters, self._waiters = self._waiters, []
+                for _, future in waiters:
+                    future.set_exception(e)
+                return
+            with self._cond:
+                self._durable = jobs[-1][0]
+                ready = [future for seq, future in self._waiters if seq <= self._durable]
+                self._waiters = [(seq, future) for seq, future in self._waiters if seq > self._durable]
+            for future in ready:
+                future.set_result(self._durable)
+
+    def _write(self, jobs: list[tuple[int, list[tuple[str, str, list]]]]):
+        # Путь -> (строки последней перезаписи или None, строки дозаписи после неё); файлы — в порядке первой записи
+        plan: dict[str, tuple[list | None, list]] = {}
+        for _, writes in jobs:
+            for mode, path, rows in writes:
+                if mode == "rewrite":
+                    plan[path] = (rows, [])
+                else:
+                    plan.setdefault(path, (None, []))[1].extend(rows)
+        self.files.write([("rewrite", path, _rows(rewrite + appends)) if rewrite is not None
+                          else ("append", path, _rows(appends))
+                          for path, (rewrite, appends) in plan.items() if rewrite is not None or appends])
+
+    def close(self):
+        """
+        Дописывает всё отправленное и останавливает поток.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        if self._error is not None:
+            raise RuntimeError("Фоновая запись остановлена из-за ошибки") from self._error
+
+
+def _rows(rows: list):
+    # csv.writerows по списку не отпускает GIL до конца записи, а по генератору поток цикла событий
+    # может перехватить управление между строками
+    for row in rows:
+        yield row